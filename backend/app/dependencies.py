@@ -1,14 +1,113 @@
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Optional
+import multiprocessing
 import os
 from fastapi import Header, Request
 
+from app.services.breakdown_cache import BreakdownCache
+from app.services.lru_cache import LRUCache
+from app.services.estimate_store import EstimateStore
+from app.services.infracost_runner import InfracostRunner
 from app.services.infracost_service import InfracostService
+from app.services.job_service import JobManager
 from app.services.llm_service import LLMService
-from app.services.usage_service import UsageService
+from app.services.price_index import PriceIndex
+from app.services.tree_cache import TreeCache
+from app.services.usage_pipeline import InFlightRuns
+from app.services.usage_service import UsageService, WorkerPool
 
 # Global constants
-UPLOAD_DIR = Path("terraform_projects")
-UPLOAD_DIR.mkdir(exist_ok=True)
+# Point UPLOAD_DIR at a tmpfs mount (e.g. /dev/shm/terraform_projects) to keep
+# extraction off disk
+UPLOAD_DIR = Path(os.environ.get("UPLOAD_DIR", "terraform_projects"))
+UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+
+# Upload ingestion limits
+INGEST_MAX_MB = int(os.environ.get("INGEST_MAX_MB", "200"))
+INGEST_MAX_ENTRIES = int(os.environ.get("INGEST_MAX_ENTRIES", "10000"))
+
+# Infracost execution limits
+INFRACOST_MAX_CONCURRENCY = int(os.environ.get("INFRACOST_MAX_CONCURRENCY", "4"))
+INFRACOST_MAX_QUEUE = int(os.environ.get("INFRACOST_MAX_QUEUE", "16"))
+INFRACOST_TIMEOUT = float(os.environ.get("INFRACOST_TIMEOUT", "300"))
+INFRACOST_PROJECT_WORKERS = int(os.environ.get("INFRACOST_PROJECT_WORKERS", "4"))
+
+# Shared across requests so the concurrency cap applies process-wide
+infracost_runner = InfracostRunner(
+    max_concurrency=INFRACOST_MAX_CONCURRENCY,
+    max_queue=INFRACOST_MAX_QUEUE,
+    timeout=INFRACOST_TIMEOUT
+)
+
+# Content-addressed breakdown cache (set BREAKDOWN_CACHE_MAX_MB=0 to disable)
+BREAKDOWN_CACHE_DIR = Path(os.environ.get("BREAKDOWN_CACHE_DIR", "breakdown_cache"))
+BREAKDOWN_CACHE_MAX_MB = int(os.environ.get("BREAKDOWN_CACHE_MAX_MB", "512"))
+
+breakdown_cache = (
+    BreakdownCache(BREAKDOWN_CACHE_DIR, max_bytes=BREAKDOWN_CACHE_MAX_MB * 1024 * 1024)
+    if BREAKDOWN_CACHE_MAX_MB > 0 else None
+)
+
+# Extracted Terraform trees kept for re-pricing with usage (TREE_CACHE_MAX_MB=0 disables)
+TREE_CACHE_DIR = Path(os.environ.get("TREE_CACHE_DIR", "tree_cache"))
+TREE_CACHE_MAX_MB = int(os.environ.get("TREE_CACHE_MAX_MB", "1024"))
+
+tree_cache = (
+    TreeCache(TREE_CACHE_DIR, max_bytes=TREE_CACHE_MAX_MB * 1024 * 1024)
+    if TREE_CACHE_MAX_MB > 0 else None
+)
+
+# Unit prices learned from Infracost output (PRICE_INDEX_PATH= disables), used
+# to price usage-only re-estimates offline while younger than the max age
+PRICE_INDEX_PATH = os.environ.get("PRICE_INDEX_PATH", "price_index.db")
+PRICE_INDEX_MAX_AGE_DAYS = float(os.environ.get("PRICE_INDEX_MAX_AGE_DAYS", "7"))
+
+price_index = (
+    PriceIndex(Path(PRICE_INDEX_PATH), max_age_seconds=PRICE_INDEX_MAX_AGE_DAYS * 86400)
+    if PRICE_INDEX_PATH else None
+)
+
+# Usage re-pricing runs in progress, shared so identical requests run once
+usage_runs = InFlightRuns()
+
+# Persistent estimate store, kept outside UPLOAD_DIR so that can live on a tmpfs
+ESTIMATE_DB_PATH = Path(os.environ.get("ESTIMATE_DB_PATH", "estimates.db"))
+ESTIMATE_TTL_DAYS = float(os.environ.get("ESTIMATE_TTL_DAYS", "30"))
+
+estimate_store = EstimateStore(
+    ESTIMATE_DB_PATH,
+    ttl_seconds=ESTIMATE_TTL_DAYS * 86400 if ESTIMATE_TTL_DAYS > 0 else None
+)
+
+# Memoized /compare results, shared across requests (COMPARE_CACHE_SIZE=0 disables)
+COMPARE_CACHE_SIZE = int(os.environ.get("COMPARE_CACHE_SIZE", "128"))
+
+comparison_cache = LRUCache(COMPARE_CACHE_SIZE) if COMPARE_CACHE_SIZE > 0 else None
+
+# Pricing models kept in memory for /estimates/{uid}/reprice (PRICING_CACHE_SIZE=0 disables)
+PRICING_CACHE_SIZE = int(os.environ.get("PRICING_CACHE_SIZE", "16"))
+
+pricing_model_cache = LRUCache(PRICING_CACHE_SIZE) if PRICING_CACHE_SIZE > 0 else None
+
+# Process pool for POST /generate-usage/batch (USAGE_BATCH_WORKERS=0 parses in
+# the request's process). Workers are spawned on first use, not forked from
+# the threaded server, and the pool is rebuilt if one of them dies.
+USAGE_BATCH_WORKERS = int(os.environ.get("USAGE_BATCH_WORKERS", str(os.cpu_count() or 1)))
+USAGE_BATCH_MAX_SETS = int(os.environ.get("USAGE_BATCH_MAX_SETS", "10000"))
+
+usage_pool = WorkerPool(
+    lambda: ProcessPoolExecutor(max_workers=USAGE_BATCH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+) if USAGE_BATCH_WORKERS > 0 else None
+
+# Background estimate jobs, keyed by their uid directory. Finished and failed
+# job records are kept for JOB_RETENTION_HOURS (0 keeps them forever).
+JOB_RETENTION_HOURS = float(os.environ.get("JOB_RETENTION_HOURS", "24"))
+
+job_manager = JobManager(
+    UPLOAD_DIR,
+    retention_seconds=JOB_RETENTION_HOURS * 3600 if JOB_RETENTION_HOURS > 0 else None
+)
 
 # Service dependencies
 def get_infracost_service(
@@ -25,7 +124,25 @@ def get_infracost_service(
     # Try to get API key from header first
     api_key = x_infracost_key or os.environ.get("INFRACOST_API_KEY")
     
-    return InfracostService(UPLOAD_DIR, api_key=api_key)
+    return InfracostService(
+        UPLOAD_DIR,
+        api_key=api_key,
+        runner=infracost_runner,
+        cache=breakdown_cache,
+        max_extract_bytes=INGEST_MAX_MB * 1024 * 1024,
+        max_entries=INGEST_MAX_ENTRIES,
+        project_workers=INFRACOST_PROJECT_WORKERS,
+        store=estimate_store,
+        comparisons=comparison_cache,
+        pricing_models=pricing_model_cache,
+        trees=tree_cache,
+        usage_runs=usage_runs,
+        prices=price_index
+    )
+
+def get_job_manager() -> JobManager:
+    """Dependency provider for the shared JobManager"""
+    return job_manager
 
 def get_llm_service(
     request: Request = None,
@@ -50,3 +167,7 @@ def get_llm_service(
 def get_usage_service() -> UsageService:
     """Dependency provider for UsageService"""
     return UsageService()
+
+def get_usage_pool() -> Optional[WorkerPool]:
+    """Dependency provider for the shared usage batch process pool"""
+    return usage_pool
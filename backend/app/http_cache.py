@@ -0,0 +1,39 @@
+import hashlib
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+
+from app.dependencies import ESTIMATE_TTL_DAYS
+
+# Estimates are not modified while stored, but they expire after
+# ESTIMATE_TTL_DAYS and a derived uid (a usage run) can then be saved again,
+# so responses are cached no longer than the TTL and revalidated afterwards
+ONE_YEAR = 365 * 86400
+CACHE_MAX_AGE = int(min(ESTIMATE_TTL_DAYS * 86400, ONE_YEAR)) if ESTIMATE_TTL_DAYS > 0 else ONE_YEAR
+ESTIMATE_CACHE_CONTROL = f"public, max-age={CACHE_MAX_AGE}"
+
+
+def make_etag(*parts) -> str:
+    """
+    Build a strong ETag from the estimate version and the response options
+    """
+    digest = hashlib.sha256("\0".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def cache_headers(etag: str) -> Dict[str, str]:
+    return {"ETag": etag, "Cache-Control": ESTIMATE_CACHE_CONTROL}
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """
+    Return a 304 response if the request's If-None-Match matches etag
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    tags = [tag.strip() for tag in header.split(",")]
+    # If-None-Match uses weak comparison
+    if "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags):
+        return Response(status_code=304, headers=cache_headers(etag))
+    return None
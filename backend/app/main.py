@@ -1,7 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.routers import upload, usage, copilot, templates
+from app.routers import upload, usage, copilot, templates, jobs, estimates, prices
 
 # Load environment variables if dotenv is available
 try:
@@ -32,6 +32,9 @@ app.include_router(upload.router)
 app.include_router(usage.router)
 app.include_router(copilot.router)
 app.include_router(templates.router)
+app.include_router(jobs.router)
+app.include_router(estimates.router)
+app.include_router(prices.router)
 
 # Root endpoint
 @app.get("/")
@@ -41,10 +44,22 @@ async def root():
         "docs": "/docs",
         "endpoints": {
             "upload": "POST /upload",
+            "create-job": "POST /jobs",
+            "job-status": "GET /jobs/{job_id}",
+            "job-events": "GET /jobs/{job_id}/events",
             "download": "GET /download/{uid}",
+            "estimate-summary": "GET /estimates/{uid}/summary",
+            "estimate-resources": "GET /estimates/{uid}/resources",
+            "reprice-estimate": "POST /estimates/{uid}/reprice",
+            "simulate-estimate": "POST /estimates/{uid}/simulate",
+            "price-with-usage": "POST /estimates/{uid}/usage",
+            "price-index-stats": "GET /prices/stats",
+            "refresh-prices": "POST /prices/refresh",
             "compare": "GET /compare",
+            "compare-series": "GET /compare/series",
             "usage-clarify": "POST /usage-clarify",
             "usage-generate": "POST /usage-generate",
+            "generate-usage-batch": "POST /generate-usage/batch",
             "copilot": "POST /copilot",
             "analyze-diff": "POST /analyze-diff",
             "templates": "GET /templates",
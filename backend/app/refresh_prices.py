@@ -0,0 +1,29 @@
+"""
+Refresh stale entries of the local price index in bulk
+
+Re-runs Infracost on the retained Terraform trees that stale prices were
+learned from, with the same configuration as the API. Run from the backend
+directory, e.g. from cron:
+
+    python -m app.refresh_prices --max-trees 50
+"""
+import argparse
+import asyncio
+import json
+
+from app.dependencies import get_infracost_service
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--max-trees", type=int, default=None,
+                        help="Refresh at most this many trees, those with the most stale prices first")
+    args = parser.parse_args()
+
+    service = get_infracost_service(x_infracost_key=None)
+    result = asyncio.run(service.refresh_prices(args.max_trees))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from app.services.estimate_simulation import DEFAULT_SAMPLES
+from app.services.infracost_service import InfracostService
+from app.services.infracost_runner import (
+    InfracostBusyError,
+    InfracostCancelledError,
+    InfracostTimeoutError
+)
+from app.dependencies import get_infracost_service
+from app.http_cache import cache_headers, make_etag, not_modified
+
+# Create router
+router = APIRouter(prefix="/estimates", tags=["estimates"])
+
+# Models
+class UsageOverride(BaseModel):
+    index: Optional[int] = None
+    resource: Optional[str] = None
+    project: Optional[str] = None
+    component: Optional[str] = None
+    usage: Optional[float] = None
+    monthlyQuantity: Optional[float] = None
+
+class RepriceRequest(BaseModel):
+    overrides: List[UsageOverride]
+
+class UsagePricingRequest(BaseModel):
+    usage: Dict[str, Dict[str, Any]]
+
+class SimulateRequest(BaseModel):
+    ranges: Dict[str, Dict[str, Any]]
+    samples: int = DEFAULT_SAMPLES
+    seed: Optional[int] = None
+
+@router.get("/{uid}/summary")
+async def estimate_summary(request: Request,
+                        uid: str,
+                        top: int = 5,
+                        infracost_service: InfracostService = Depends(get_infracost_service)):
+    """Return totals per resource type, provider, module and project"""
+    try:
+        etag = make_etag(infracost_service.estimate_version(uid), "summary", top)
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+
+        result = await asyncio.to_thread(infracost_service.get_estimate_summary, uid, top)
+        return JSONResponse(content=result, headers=cache_headers(etag))
+    except FileNotFoundError:
+        return JSONResponse(status_code=404, content={"error": "Estimate not found"})
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+@router.get("/{uid}/resources")
+async def estimate_resources(request: Request,
+                        uid: str,
+                        resource_type: Optional[str] = None,
+                        name_prefix: Optional[str] = None,
+                        min_cost: Optional[float] = None,
+                        max_cost: Optional[float] = None,
+                        sort: Optional[str] = None,
+                        fields: Optional[str] = None,
+                        limit: int = 100,
+                        cursor: Optional[str] = None,
+                        infracost_service: InfracostService = Depends(get_infracost_service)):
+    """Return one filtered, sorted page of an estimate's resources"""
+    resource_types = [value.strip() for value in resource_type.split(",") if value.strip()] if resource_type else None
+    try:
+        etag = make_etag(
+            infracost_service.estimate_version(uid), "resources",
+            resource_types, name_prefix, min_cost, max_cost, sort, fields, limit, cursor
+        )
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+
+        result = await asyncio.to_thread(
+            infracost_service.list_resources,
+            uid,
+            resource_types=resource_types,
+            name_prefix=name_prefix,
+            min_cost=min_cost,
+            max_cost=max_cost,
+            sort=sort,
+            fields=fields,
+            limit=limit,
+            cursor=cursor
+        )
+        return JSONResponse(content=result, headers=cache_headers(etag))
+    except FileNotFoundError:
+        return JSONResponse(status_code=404, content={"error": "Estimate not found"})
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+@router.post("/{uid}/reprice")
+async def reprice_estimate(uid: str,
+                        data: RepriceRequest,
+                        infracost_service: InfracostService = Depends(get_infracost_service)):
+    """Recompute an estimate's costs with usage overrides"""
+    overrides = [override.model_dump(exclude_none=True) for override in data.overrides]
+    try:
+        return await asyncio.to_thread(infracost_service.reprice, uid, overrides)
+    except FileNotFoundError:
+        return JSONResponse(status_code=404, content={"error": "Estimate not found"})
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+@router.post("/{uid}/simulate")
+async def simulate_estimate(uid: str,
+                        data: SimulateRequest,
+                        infracost_service: InfracostService = Depends(get_infracost_service)):
+    """Simulate an estimate's monthly cost under ranges of usage"""
+    try:
+        return await asyncio.to_thread(
+            infracost_service.simulate, uid, data.ranges, samples=data.samples, seed=data.seed
+        )
+    except FileNotFoundError:
+        return JSONResponse(status_code=404, content={"error": "Estimate not found"})
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+@router.post("/{uid}/usage")
+async def price_with_usage(request: Request,
+                        uid: str,
+                        data: UsagePricingRequest,
+                        infracost_service: InfracostService = Depends(get_infracost_service)):
+    """Price an estimate's Terraform tree again with generated usage"""
+    try:
+        result = await infracost_service.price_with_usage(
+            uid, data.usage, is_disconnected=request.is_disconnected
+        )
+        return {**result, "result_url": f"/download/{result['uid']}"}
+    except FileNotFoundError:
+        return JSONResponse(status_code=404, content={"error": "Estimate not found"})
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except InfracostBusyError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)}, headers={"Retry-After": "5"})
+    except InfracostTimeoutError as e:
+        return JSONResponse(status_code=504, content={"error": str(e)})
+    except InfracostCancelledError as e:
+        return JSONResponse(status_code=499, content={"error": str(e)})
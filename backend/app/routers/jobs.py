@@ -0,0 +1,103 @@
+from fastapi import APIRouter, UploadFile, File, Depends, BackgroundTasks
+from fastapi.responses import JSONResponse, StreamingResponse
+import asyncio
+import json
+import uuid
+import shutil
+from pathlib import Path
+from typing import Optional
+
+from app.services.infracost_service import InfracostService
+from app.services.job_service import JobManager, JobState
+from app.dependencies import get_infracost_service, get_job_manager
+
+# Create router
+router = APIRouter(tags=["jobs"])
+
+async def run_estimate_job(job_id: str,
+                           source: Path,
+                           extract_path: Path,
+                           infracost_service: InfracostService,
+                           job_manager: JobManager,
+                           multi_project: bool = False,
+                           baseline_uid: Optional[str] = None) -> None:
+    """Process a staged upload in the background, recording each stage"""
+    try:
+        resources, _ = await infracost_service.process_terraform_file_async(
+            source,
+            extract_path,
+            on_stage=lambda stage: job_manager.update(job_id, JobState(stage)),
+            multi_project=multi_project,
+            baseline_uid=baseline_uid
+        )
+        fields = {}
+        if baseline_uid is not None:
+            fields["incremental"] = infracost_service.get_estimate_meta(job_id)["meta"].get("incremental")
+        job_manager.update(
+            job_id,
+            JobState.DONE,
+            resource_count=len(resources),
+            projects=InfracostService.summarize_projects(resources),
+            **fields
+        )
+    except Exception as e:
+        job_manager.update(job_id, JobState.FAILED, error=str(e))
+    finally:
+        # The estimate is in the store now; only job.json needs to stay
+        await asyncio.to_thread(job_manager.release, job_id)
+
+@router.post("/jobs", status_code=202)
+async def create_job(background_tasks: BackgroundTasks,
+                     file: UploadFile = File(...),
+                     multi_project: bool = False,
+                     baseline_uid: Optional[str] = None,
+                     infracost_service: InfracostService = Depends(get_infracost_service),
+                     job_manager: JobManager = Depends(get_job_manager)):
+    """Accept a Terraform upload and estimate it in the background"""
+    job_id = str(uuid.uuid4())
+    extract_path = infracost_service.upload_dir / job_id
+    extract_path.mkdir(parents=True, exist_ok=True)
+
+    try:
+        source = await asyncio.to_thread(
+            infracost_service.stage_upload, file.file, file.filename, extract_path
+        )
+    except ValueError as e:
+        shutil.rmtree(extract_path, ignore_errors=True)
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    job = job_manager.create(job_id, file.filename)
+    background_tasks.add_task(
+        run_estimate_job, job_id, source, extract_path, infracost_service, job_manager,
+        multi_project, baseline_uid
+    )
+    return {
+        **job,
+        "status_url": f"/jobs/{job_id}",
+        "events_url": f"/jobs/{job_id}/events",
+        "result_url": f"/download/{job_id}"
+    }
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, job_manager: JobManager = Depends(get_job_manager)):
+    """Return the current state of an estimate job"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+    return job
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, job_manager: JobManager = Depends(get_job_manager)):
+    """Stream stage transitions for a job as server-sent events"""
+    if job_manager.get(job_id) is None:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+
+    async def event_stream():
+        async for job in job_manager.events(job_id):
+            yield f"event: {job['state']}\ndata: {json.dumps(job)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
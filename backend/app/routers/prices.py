@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+from typing import Optional
+
+from app.services.infracost_service import InfracostService
+from app.dependencies import get_infracost_service
+
+# Create router
+router = APIRouter(prefix="/prices", tags=["prices"])
+
+@router.get("/stats")
+async def price_index_stats(infracost_service: InfracostService = Depends(get_infracost_service)):
+    """Return the size and staleness of the local price index"""
+    if infracost_service.prices is None:
+        return {"enabled": False}
+    return {"enabled": True, **infracost_service.prices.stats()}
+
+@router.post("/refresh")
+async def refresh_prices(max_trees: Optional[int] = None,
+                        infracost_service: InfracostService = Depends(get_infracost_service)):
+    """Re-run Infracost on the trees behind stale price index entries"""
+    try:
+        return await infracost_service.refresh_prices(max_trees)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
@@ -17,6 +17,7 @@ class TemplateModel(BaseModel):
 
 class TemplateResponse(BaseModel):
     templates: List[TemplateModel]
+    next_cursor: Optional[str] = None
 
 class TemplateApplyRequest(BaseModel):
     template_id: str
@@ -26,12 +27,22 @@ class UsageResponse(BaseModel):
     usage: Dict[str, Dict[str, Any]]
 
 @router.get("/templates", response_model=TemplateResponse)
-async def get_templates():
+async def get_templates(q: Optional[str] = None,
+                        limit: Optional[int] = None,
+                        cursor: Optional[str] = None):
     """
     Get all available templates (both default and custom).
+    
+    With q, limit or cursor, returns one page of templates in ID order,
+    searching names and descriptions for q.
     """
-    templates = template_service.get_all_templates()
-    return {"templates": templates}
+    if q is None and limit is None and cursor is None:
+        templates = template_service.get_all_templates()
+        return {"templates": templates}
+    try:
+        return template_service.list_templates(q, 100 if limit is None else limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/templates/{template_id}", response_model=TemplateModel)
 async def get_template(template_id: str):
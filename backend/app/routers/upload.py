@@ -1,36 +1,76 @@
-from fastapi import APIRouter, UploadFile, File, Depends
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, File, Depends, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+import asyncio
 import uuid
 import shutil
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 
-from app.services.infracost_service import InfracostService
+from app.services.estimate_export import MEDIA_TYPES, export_estimate, parse_columns
+from app.services.infracost_service import BaselineNotFoundError, InfracostService
+from app.services.infracost_runner import (
+    InfracostBusyError,
+    InfracostCancelledError,
+    InfracostTimeoutError
+)
 from app.dependencies import get_infracost_service
+from app.http_cache import cache_headers, make_etag, not_modified
 
 # Create router
 router = APIRouter(tags=["upload"])
 
+# Models
+class CompareAdjustedRequest(BaseModel):
+    uid: str
+    current: List[Dict[str, Any]]
+
 @router.post("/upload")
-async def upload_terraform(file: UploadFile = File(...), 
+async def upload_terraform(request: Request,
+                         file: UploadFile = File(...), 
+                         multi_project: bool = False,
+                         baseline_uid: Optional[str] = None,
                          infracost_service: InfracostService = Depends(get_infracost_service)):
     """Upload and process a Terraform file to estimate costs"""
     uid = str(uuid.uuid4())
     extract_path = infracost_service.upload_dir / uid
     extract_path.mkdir(parents=True, exist_ok=True)
 
-    zip_path = extract_path / file.filename
     try:
-        # First save the uploaded file
-        with open(zip_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Stream the upload straight into a filtered Terraform tree
+        source = await asyncio.to_thread(
+            infracost_service.stage_upload, file.file, file.filename, extract_path
+        )
             
         # Process the file with the service
-        resources, _ = infracost_service.process_terraform_file(zip_path, extract_path)
-        return {"uid": uid, "cost_breakdown": resources}
+        resources, _ = await infracost_service.process_terraform_file_async(
+            source,
+            extract_path,
+            is_disconnected=request.is_disconnected,
+            multi_project=multi_project,
+            baseline_uid=baseline_uid
+        )
+        result = {
+            "uid": uid,
+            "cost_breakdown": resources,
+            "projects": InfracostService.summarize_projects(resources)
+        }
+        if baseline_uid is not None:
+            # Report what was re-priced and how it moved against the baseline
+            result["incremental"] = infracost_service.get_estimate_meta(uid)["meta"].get("incremental")
+            result["diff"] = infracost_service.compare_estimates(baseline_uid, uid)
+        return result
                 
+    except BaselineNotFoundError:
+        return JSONResponse(status_code=404, content={"error": "Baseline estimate not found"})
     except ValueError as e:
         return JSONResponse(status_code=400, content={"error": str(e)})
+    except InfracostBusyError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)}, headers={"Retry-After": "5"})
+    except InfracostTimeoutError as e:
+        return JSONResponse(status_code=504, content={"error": str(e)})
+    except InfracostCancelledError as e:
+        return JSONResponse(status_code=499, content={"error": str(e)})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": "Unexpected error", "details": str(e)})
     finally:
@@ -38,80 +78,100 @@ async def upload_terraform(file: UploadFile = File(...),
         if extract_path.exists():
             shutil.rmtree(extract_path, ignore_errors=True)
 
+@router.get("/cache/stats")
+async def breakdown_cache_stats(infracost_service: InfracostService = Depends(get_infracost_service)):
+    """Return hit/miss counters for the breakdown cache"""
+    if infracost_service.cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **infracost_service.cache.stats()}
+
 @router.get("/download/{uid}")
-async def download_estimate(uid: str, 
+async def download_estimate(request: Request,
+                         uid: str, 
                          format: str = "json", 
+                         columns: Optional[str] = None,
+                         flatten: bool = False,
                          infracost_service: InfracostService = Depends(get_infracost_service)):
     """Download a saved cost estimate by its UID"""
     try:
-        data = infracost_service.get_estimate(uid)
-        
-        if format == "csv":
-            import csv
-            from io import StringIO
-            output = StringIO()
-            writer = csv.DictWriter(output, fieldnames=["name", "resource_type", "monthlyCost"])
-            writer.writeheader()
-            for r in data:
-                writer.writerow({
-                    "name": r.get("name"), 
-                    "resource_type": r.get("resource_type"), 
-                    "monthlyCost": r.get("monthlyCost")
-                })
-            return JSONResponse(content=output.getvalue(), media_type="text/csv")
+        etag = make_etag(infracost_service.estimate_version(uid), "download", format, columns, flatten)
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+
+        if format == "json" and columns is None and not flatten:
+            data = infracost_service.get_estimate(uid)
+            return JSONResponse(content=data, headers=cache_headers(etag))
 
-        return JSONResponse(content=data)
+        # Stream every other export straight from the store, row by row
+        body = export_estimate(
+            infracost_service.iter_estimate(uid),
+            format,
+            columns=parse_columns(columns, flatten),
+            flatten=flatten
+        )
+        return StreamingResponse(body, headers={
+            "content-type": MEDIA_TYPES[format],
+            "content-disposition": f'attachment; filename="{uid}.{format}"',
+            **cache_headers(etag)
+        })
         
     except FileNotFoundError:
         return JSONResponse(status_code=404, content={"error": "Estimate not found"})
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
 
 @router.get("/compare")
-async def compare_estimates(baseline: str, 
+async def compare_estimates(request: Request,
+                        baseline: str, 
                         proposed: str, 
+                        details: bool = True,
+                        mode: str = "resources",
                         infracost_service: InfracostService = Depends(get_infracost_service)):
     """Compare two cost estimates and return differences"""
+    if mode not in ("resources", "components"):
+        return JSONResponse(status_code=400, content={"error": f"Unsupported compare mode: {mode}"})
     try:
-        return infracost_service.compare_estimates(baseline, proposed)
+        etag = make_etag(infracost_service.estimate_version(baseline, proposed), "compare", mode, details)
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+
+        if mode == "components":
+            result = await asyncio.to_thread(infracost_service.compare_components, baseline, proposed)
+        else:
+            result = await asyncio.to_thread(infracost_service.compare_estimates, baseline, proposed, details)
+        return JSONResponse(content=result, headers=cache_headers(etag))
     except FileNotFoundError:
         return JSONResponse(status_code=404, content={"error": "One or both estimates not found"})
 
-@router.post("/compare-adjusted")
-async def compare_adjusted(uid: str, 
-                        current: list, 
+@router.get("/compare/series")
+async def compare_series(request: Request,
+                        uids: str,
+                        changed_only: bool = False,
                         infracost_service: InfracostService = Depends(get_infracost_service)):
-    """Compare with adjustments applied to the resources"""
+    """Compare an ordered, comma-separated series of estimates"""
+    series = [uid.strip() for uid in uids.split(",") if uid.strip()]
     try:
-        # Get the previous estimate path
-        prev_path = infracost_service.upload_dir / uid / "previous_estimate.json"
-        if not prev_path.exists():
-            return JSONResponse(status_code=404, content={"error": "No previous estimate available"})
+        etag = make_etag(infracost_service.estimate_version(*series), "series", changed_only)
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
 
-        # Load previous data
-        with open(prev_path) as f:
-            import json
-            previous = {r["name"]: r for r in json.load(f)}
-
-        # Process current data
-        current_map = {r["name"]: r for r in current}
-
-        # Calculate differences
-        added = [r for k, r in current_map.items() if k not in previous]
-        removed = [r for k, r in previous.items() if k not in current_map]
-        changed = []
-        for name in current_map:
-            if name in previous:
-                cur_cost = float(current_map[name].get("monthlyCost", 0))
-                prev_cost = float(previous[name].get("monthlyCost", 0))
-                if cur_cost != prev_cost:
-                    changed.append({"name": name, "from": prev_cost, "to": cur_cost})
+        result = await asyncio.to_thread(infracost_service.compare_series, series, changed_only)
+        return JSONResponse(content=result, headers=cache_headers(etag))
+    except FileNotFoundError as e:
+        return JSONResponse(status_code=404, content={"error": str(e)})
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
 
-        # Calculate totals
-        return {
-            "added": added,
-            "removed": removed,
-            "changed": changed,
-            "current_total": sum(float(r.get("monthlyCost", 0)) for r in current_map.values()),
-            "previous_total": sum(float(r.get("monthlyCost", 0)) for r in previous.values())
-        }
+@router.post("/compare-adjusted")
+async def compare_adjusted(data: CompareAdjustedRequest, 
+                        infracost_service: InfracostService = Depends(get_infracost_service)):
+    """Compare with adjustments applied to the resources"""
+    try:
+        return infracost_service.compare_adjusted(data.uid, data.current)
+    except FileNotFoundError:
+        return JSONResponse(status_code=404, content={"error": "No previous estimate available"})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": "Unexpected error", "details": str(e)})
@@ -1,11 +1,13 @@
+import json
+
 from fastapi import APIRouter, Depends
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Dict, List, Any, Optional
 
 from app.services.llm_service import LLMService
-from app.services.usage_service import UsageService
-from app.dependencies import get_llm_service, get_usage_service
+from app.services.usage_service import UsageService, WorkerPool
+from app.dependencies import USAGE_BATCH_MAX_SETS, get_llm_service, get_usage_pool, get_usage_service
 
 # Create router
 router = APIRouter(tags=["usage"])
@@ -22,6 +24,12 @@ class UsageGenerateRequest(BaseModel):
     resources: List[Dict[str, Any]]
     answers: List[str]
 
+class UsageSet(UsageGenerateRequest):
+    id: Optional[str] = None
+
+class UsageBatchRequest(BaseModel):
+    sets: List[UsageSet]
+
 @router.post("/suggest-usage")
 async def suggest_usage(req: UsageRequest, 
                       llm_service: LLMService = Depends(get_llm_service)):
@@ -86,3 +94,23 @@ async def generate_usage(data: UsageGenerateRequest,
         return {"usage": usage}
     except Exception as e:
         return {"error": str(e), "usage": {}}
+
+
+@router.post("/generate-usage/batch")
+async def generate_usage_batch(data: UsageBatchRequest,
+                               usage_service: UsageService = Depends(get_usage_service),
+                               pool: Optional[WorkerPool] = Depends(get_usage_pool)):
+    """Generate usage for many sets of answers, streamed back as NDJSON as each set finishes"""
+    if len(data.sets) > USAGE_BATCH_MAX_SETS:
+        return JSONResponse(
+            status_code=400,
+            content={"error": f"At most {USAGE_BATCH_MAX_SETS} sets per batch"}
+        )
+    sets = [item.model_dump() for item in data.sets]
+
+    async def results():
+        async for index, result in usage_service.stream_usage_batch(sets, pool):
+            line = {"index": index, "id": sets[index]["id"], **result}
+            yield json.dumps(line, separators=(",", ":")).encode() + b"\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.services.zip_ingest import is_terraform_relevant
+
+
+class BreakdownCache:
+    """
+    Content-addressed on-disk cache of extracted Infracost resources
+
+    Entries are keyed on a hash of the Terraform files, the usage file and the
+    Infracost CLI version, and stored as one compact JSON file each so the cache
+    survives restarts. The total size is bounded and the least recently used
+    entries are evicted first.
+    """
+    def __init__(self, cache_dir: Path, max_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_index()
+
+    def _load_index(self) -> None:
+        """
+        Rebuild the LRU order from file modification times
+        """
+        files = []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime_ns, path.stem, stat.st_size))
+
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self.total_bytes += size
+
+    @staticmethod
+    def compute_key(source: Path, usage_file: Optional[Path] = None, version: str = "") -> str:
+        """
+        Hash a Terraform tree (or a single plan file) together with the
+        usage file and Infracost version
+
+        Args:
+            source: Extracted Terraform directory or plan file
+            usage_file: Optional Infracost usage file
+            version: Infracost CLI version string
+
+        Returns:
+            Hex digest identifying the breakdown inputs
+        """
+        digest = hashlib.sha256()
+        digest.update(f"infracost:{version}\0".encode())
+
+        if source.is_dir():
+            files = sorted(
+                p for p in source.rglob("*")
+                if p.is_file() and is_terraform_relevant(p.relative_to(source).as_posix())
+            )
+            for path in files:
+                digest.update(path.relative_to(source).as_posix().encode() + b"\0")
+                digest.update(hashlib.sha256(path.read_bytes()).digest())
+        else:
+            digest.update(b"plan\0")
+            digest.update(hashlib.sha256(source.read_bytes()).digest())
+
+        if usage_file is not None and usage_file.exists():
+            digest.update(b"usage\0")
+            digest.update(hashlib.sha256(usage_file.read_bytes()).digest())
+
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Return cached resources for a key, or None on a miss
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                with open(path) as f:
+                    resources = json.load(f)
+                # Bump the mtime so the LRU order survives a restart
+                os.utime(path)
+            except (OSError, json.JSONDecodeError):
+                self._discard(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return resources
+
+    def put(self, key: str, resources: List[Dict[str, Any]]) -> None:
+        """
+        Store resources under a key, evicting old entries to stay within budget
+        """
+        payload = json.dumps(resources, separators=(",", ":")).encode()
+        if len(payload) > self.max_bytes:
+            return
+
+        with self._lock:
+            path = self._path(key)
+            tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+
+            self.total_bytes -= self._entries.pop(key, 0)
+            self._entries[key] = len(payload)
+            self.total_bytes += len(payload)
+
+            while self.total_bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+
+    def _discard(self, key: str) -> None:
+        self.total_bytes -= self._entries.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return hit/miss counters and current size
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes
+            }
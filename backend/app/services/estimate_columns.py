@@ -0,0 +1,189 @@
+import sys
+from array import array
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.services.estimate_store import monthly_cost_of, resource_type_of
+
+try:
+    import numpy as np
+except ImportError:
+    # Without NumPy the columns fall back to array.array and plain loops
+    np = None
+
+# Columns that are stored as category codes
+CATEGORY_COLUMNS = ("project", "resource_type")
+
+Loader = Callable[[Sequence[int]], List[Dict[str, Any]]]
+
+
+def _float_column(values: Iterable[float]):
+    if np is not None:
+        return np.fromiter(values, dtype=np.float64)
+    return array("d", values)
+
+
+def _code_column(values: Iterable[int]):
+    if np is not None:
+        return np.fromiter(values, dtype=np.int32)
+    return array("i", values)
+
+
+def factorize(values: Iterable[Any]) -> Tuple[List[int], List[Any]]:
+    """
+    Assign integer codes to values in order of first appearance
+
+    Returns:
+        Tuple of (code per value, distinct values)
+    """
+    codes: Dict[Any, int] = {}
+    return [codes.setdefault(value, len(codes)) for value in values], list(codes)
+
+
+class ColumnarEstimate:
+    """
+    Compact column-oriented view of an estimate
+
+    Resource names are interned strings, projects and resource types are
+    category codes and monthly costs are a float64 array (NumPy when it is
+    installed). Totals and group-bys run over the arrays; full resource dicts
+    are only built by materialize(), through the loader the estimate was
+    created with.
+    """
+    def __init__(self,
+                 names: List[str],
+                 projects: Tuple[Any, List[Optional[str]]],
+                 resource_types: Tuple[Any, List[Optional[str]]],
+                 costs: Any,
+                 uid: Optional[str] = None,
+                 loader: Optional[Loader] = None):
+        self.uid = uid
+        self.names = names
+        self.project_codes, self.projects = projects
+        self.type_codes, self.resource_types = resource_types
+        self.costs = costs
+        self._loader = loader
+
+    @classmethod
+    def from_rows(cls,
+                  rows: Iterable[Tuple[Optional[str], Optional[str], Optional[str], Optional[float]]],
+                  uid: Optional[str] = None,
+                  loader: Optional[Loader] = None) -> "ColumnarEstimate":
+        """
+        Build the columns from (project, name, resource_type, monthly_cost) rows
+        """
+        rows = list(rows)
+        projects, names, resource_types, costs = zip(*rows) if rows else ((), (), (), ())
+        project_codes, project_values = factorize(projects)
+        type_codes, type_values = factorize(resource_types)
+
+        return cls(
+            [name if name is None else sys.intern(name) for name in names],
+            (_code_column(project_codes), project_values),
+            (_code_column(type_codes), type_values),
+            _float_column(cost or 0.0 for cost in costs),
+            uid=uid,
+            loader=loader
+        )
+
+    @classmethod
+    def from_resources(cls, resources: List[Dict[str, Any]], uid: Optional[str] = None) -> "ColumnarEstimate":
+        """
+        Build the columns from resource dicts, which remain the details source
+        """
+        rows = (
+            (r.get("project"), r.get("name"), resource_type_of(r), monthly_cost_of(r))
+            for r in resources
+        )
+        return cls.from_rows(rows, uid=uid, loader=lambda indices: [resources[i] for i in indices])
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def project(self, index: int) -> Optional[str]:
+        return self.projects[self.project_codes[index]]
+
+    def resource_type(self, index: int) -> Optional[str]:
+        return self.resource_types[self.type_codes[index]]
+
+    def cost(self, index: int) -> float:
+        return float(self.costs[index])
+
+    def total(self) -> float:
+        """
+        Return the total monthly cost
+        """
+        if np is not None:
+            return float(self.costs.sum())
+        return float(sum(self.costs))
+
+    def group_by(self, column: str) -> Dict[Optional[str], Dict[str, Any]]:
+        """
+        Return resource counts and monthly totals per project or resource type
+        """
+        if column not in CATEGORY_COLUMNS:
+            raise ValueError(f"Cannot group by {column}, expected one of {', '.join(CATEGORY_COLUMNS)}")
+        if column == "project":
+            codes, values = self.project_codes, self.projects
+        else:
+            codes, values = self.type_codes, self.resource_types
+
+        if np is not None:
+            counts = np.bincount(codes, minlength=len(values)).tolist()
+            totals = np.bincount(codes, weights=self.costs, minlength=len(values)).tolist()
+        else:
+            counts = [0] * len(values)
+            totals = [0.0] * len(values)
+            for code, cost in zip(codes, self.costs):
+                counts[code] += 1
+                totals[code] += cost
+
+        return {
+            value: {"resource_count": counts[code], "monthlyCost": totals[code]}
+            for code, value in enumerate(values)
+            if counts[code]
+        }
+
+    def records(self,
+                indices: Optional[Iterable[int]] = None,
+                deltas: Optional[Iterable[float]] = None) -> List[Dict[str, Any]]:
+        """
+        Return lightweight records built from the columns alone, each with
+        a ``delta`` from deltas if given
+        """
+        if indices is None:
+            indices = range(len(self))
+        # Plain lists index much faster than NumPy arrays element by element
+        names, costs = self.names, self.costs.tolist()
+        projects, project_codes = self.projects, self.project_codes.tolist()
+        types, type_codes = self.resource_types, self.type_codes.tolist()
+        if deltas is not None:
+            return [
+                {
+                    "name": names[i],
+                    "project": projects[project_codes[i]],
+                    "resource_type": types[type_codes[i]],
+                    "monthlyCost": costs[i],
+                    "delta": delta
+                }
+                for i, delta in zip(indices, deltas)
+            ]
+        return [
+            {
+                "name": names[i],
+                "project": projects[project_codes[i]],
+                "resource_type": types[type_codes[i]],
+                "monthlyCost": costs[i]
+            }
+            for i in indices
+        ]
+
+    def materialize(self, indices: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+        """
+        Return the full resource dicts for the given rows (all rows by default)
+        """
+        indices = list(range(len(self)) if indices is None else indices)
+        if not indices:
+            return []
+        if self._loader is None:
+            raise ValueError("Estimate columns were built without a details source")
+        return self._loader(indices)
@@ -0,0 +1,159 @@
+from collections import defaultdict, deque
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.services.estimate_columns import ColumnarEstimate
+from app.services.estimate_diff import EstimateDiff
+from app.services.estimate_store import ROW_BATCH_SIZE, resource_type_of
+
+# Decimal places kept in deltas of quantities and prices; costs keep two
+PRECISE_DIGITS = 6
+
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _change(old: Any, new: Any, digits: int) -> Dict[str, Any]:
+    old, new = _number(old), _number(new)
+    return {"base": old, "proposed": new, "delta": round((new or 0.0) - (old or 0.0), digits)}
+
+
+def _status(old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]], changed: bool) -> str:
+    if old is None:
+        return "added"
+    if new is None:
+        return "removed"
+    return "changed" if changed else "unchanged"
+
+
+def _pair(old_items: Sequence[Dict[str, Any]],
+          new_items: Sequence[Dict[str, Any]]) -> Iterator[Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]]:
+    """
+    Pair items on name, in order of appearance, yielding (old, new) with None
+    for an item missing on one side
+    """
+    unmatched = defaultdict(deque)
+    for item in old_items:
+        unmatched[item.get("name")].append(item)
+    for item in new_items:
+        candidates = unmatched.get(item.get("name"))
+        yield (candidates.popleft() if candidates else None), item
+    for item in old_items:
+        candidates = unmatched.get(item.get("name"))
+        if candidates and candidates[0] is item:
+            yield candidates.popleft(), None
+
+
+def _component(old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    either = new if new is not None else old
+    quantity = _change(old and old.get("monthlyQuantity"), new and new.get("monthlyQuantity"), PRECISE_DIGITS)
+    price = _change(old and old.get("price"), new and new.get("price"), PRECISE_DIGITS)
+    cost = _change(old and old.get("monthlyCost"), new and new.get("monthlyCost"), 2)
+
+    changed = quantity["base"] != quantity["proposed"] or price["base"] != price["proposed"] or cost["delta"] != 0
+    node = {
+        "name": either.get("name"),
+        "unit": either.get("unit"),
+        "status": _status(old, new, changed),
+        "monthlyQuantity": quantity,
+        "price": price,
+        "monthlyCost": cost
+    }
+    if old is not None and new is not None and changed:
+        # Tell a price shift apart from a change in usage
+        price_moved = price["base"] != price["proposed"]
+        usage_moved = quantity["base"] != quantity["proposed"]
+        node["cause"] = "both" if price_moved and usage_moved else "price" if price_moved else "usage" if usage_moved else None
+    return node
+
+
+def component_tree(old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Diff one resource (or subresource) and its cost components, recursively
+
+    Components and subresources are paired on name within their parent.
+    Unchanged components and subresources are left out of the tree.
+
+    Args:
+        old: Baseline resource, or None if it was added
+        new: Proposed resource, or None if it was removed
+
+    Returns:
+        Node with the monthly cost change, a status of added, removed,
+        changed or unchanged and the changed costComponents and subresources
+    """
+    either = new if new is not None else old
+    cost = _change(old and old.get("monthlyCost"), new and new.get("monthlyCost"), 2)
+    if old == new:
+        # Identical on both sides, nothing below can have changed
+        return {"name": either.get("name"), "status": "unchanged", "monthlyCost": cost,
+                "costComponents": [], "subresources": []}
+
+    components = [
+        _component(old_component, new_component)
+        for old_component, new_component in _pair(
+            (old or {}).get("costComponents") or [], (new or {}).get("costComponents") or []
+        )
+        if old_component != new_component
+    ]
+    subresources = [
+        component_tree(old_sub, new_sub)
+        for old_sub, new_sub in _pair((old or {}).get("subresources") or [], (new or {}).get("subresources") or [])
+        if old_sub != new_sub
+    ]
+    components = [node for node in components if node["status"] != "unchanged"]
+    subresources = [node for node in subresources if node["status"] != "unchanged"]
+
+    return {
+        "name": either.get("name"),
+        "status": _status(old, new, bool(components or subresources or cost["delta"])),
+        "monthlyCost": cost,
+        "costComponents": components,
+        "subresources": subresources
+    }
+
+
+def _batches(columns: ColumnarEstimate, indices: List[int]) -> Iterator[Dict[str, Any]]:
+    for start in range(0, len(indices), ROW_BATCH_SIZE):
+        yield from columns.materialize(indices[start:start + ROW_BATCH_SIZE])
+
+
+def diff_components(diff: EstimateDiff) -> Dict[str, Any]:
+    """
+    Build the component-level delta tree of a resource diff
+
+    Matched, added and removed resources are loaded batch by batch from both
+    estimates and walked once each, so the work is linear in the number of
+    cost components and only one batch of resources is held at a time.
+
+    Returns:
+        Dictionary with the baseline, proposed and delta totals and a tree per
+        resource that changed
+    """
+    resources = []
+
+    def add(old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        node = component_tree(old, new)
+        if node["status"] != "unchanged":
+            either = new if new is not None else old
+            resources.append({"project": either.get("project"), "resource_type": resource_type_of(either), **node})
+
+    for old, new in zip(_batches(diff.base, diff.matched_base), _batches(diff.proposed, diff.matched_proposed)):
+        add(old, new)
+    for new in _batches(diff.proposed, diff.added):
+        add(None, new)
+    for old in _batches(diff.base, diff.removed):
+        add(old, None)
+
+    base_total, proposed_total = diff.base.total(), diff.proposed.total()
+    return {
+        "totals": {
+            "base": round(base_total, 2),
+            "proposed": round(proposed_total, 2),
+            "delta": round(proposed_total - base_total, 2)
+        },
+        "resources": resources
+    }
@@ -0,0 +1,193 @@
+from collections import defaultdict, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services import estimate_columns
+from app.services.estimate_columns import ColumnarEstimate
+
+DIFF_CATEGORIES = ("increased", "decreased", "unchanged", "added", "removed")
+
+
+class EstimateDiff:
+    """
+    Result of diffing two columnar estimates
+
+    Holds row positions into both estimates and the cost deltas of matched
+    rows; resources are only built when to_dict() is called.
+    """
+    def __init__(self,
+                 base: ColumnarEstimate,
+                 proposed: ColumnarEstimate,
+                 matched_base: List[int],
+                 matched_proposed: List[int],
+                 deltas: List[float],
+                 added: List[int],
+                 removed: List[int]):
+        self.base = base
+        self.proposed = proposed
+        self.matched_base = matched_base
+        self.matched_proposed = matched_proposed
+        self.deltas = deltas
+        self.added = added
+        self.removed = removed
+
+    def to_dict(self, details: bool = True) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Build the increased/decreased/unchanged/added/removed lists
+
+        Each entry is the proposed resource (the baseline one for removed
+        resources) with a ``delta`` in monthly cost. With details=False the
+        entries carry only name, project, resource_type and monthlyCost and
+        are built from the columns in one pass.
+        """
+        proposed_costs = self.proposed.costs.tolist()
+        base_costs = self.base.costs.tolist()
+        matched_deltas = [round(delta, 2) for delta in self.deltas]
+        added_deltas = [proposed_costs[index] for index in self.added]
+        removed_deltas = [-base_costs[index] for index in self.removed]
+
+        if details:
+            # Matched and added rows of the proposed side are read in one pass
+            loaded = self.proposed.materialize(self.matched_proposed + self.added)
+            count = len(self.matched_proposed)
+            matched = [dict(record, delta=delta) for record, delta in zip(loaded[:count], matched_deltas)]
+            added = [dict(record, delta=delta) for record, delta in zip(loaded[count:], added_deltas)]
+            removed = [
+                dict(record, delta=delta)
+                for record, delta in zip(self.base.materialize(self.removed), removed_deltas)
+            ]
+        else:
+            matched = self.proposed.records(self.matched_proposed, matched_deltas)
+            added = self.proposed.records(self.added, added_deltas)
+            removed = self.base.records(self.removed, removed_deltas)
+
+        diff = {category: [] for category in DIFF_CATEGORIES}
+        increased, decreased, unchanged = diff["increased"], diff["decreased"], diff["unchanged"]
+        for record, delta in zip(matched, self.deltas):
+            if delta > 0:
+                increased.append(record)
+            elif delta < 0:
+                decreased.append(record)
+            else:
+                unchanged.append(record)
+        diff["added"] = added
+        diff["removed"] = removed
+        return diff
+
+
+def key_codes(*estimates: ColumnarEstimate) -> Tuple[List[int], ...]:
+    """
+    Assign one integer code per distinct (project, name) across all estimates
+
+    Project names come from the upload (plan file name, zip folder), so two
+    uploads of the same plan under different file names share none. When
+    the estimates have no project name in common, resources are coded by
+    name alone.
+    """
+    shared = set(estimates[0].projects).intersection(*(columns.projects for columns in estimates[1:]))
+    project_ids: Dict[Optional[str], int] = {}
+    name_ids: Dict[Optional[str], int] = {}
+    sides = []
+    for columns in estimates:
+        if shared:
+            projects = [project_ids.setdefault(project, len(project_ids)) for project in columns.projects]
+        else:
+            projects = [0] * len(columns.projects)
+        names = [name_ids.setdefault(name, len(name_ids)) for name in columns.names]
+        sides.append((projects, columns.project_codes, names))
+
+    # Names and projects are coded separately, then combined into one code
+    width = len(name_ids)
+    return tuple(
+        [projects[code] * width + name for code, name in zip(project_codes, names)]
+        for projects, project_codes, names in sides
+    )
+
+
+def occurrence_keys(codes: List[int], stride: int):
+    """
+    Turn (project, name) codes into unique keys, telling duplicate pairs
+    apart by occurrence order; stride must exceed the longest estimate
+    """
+    np = estimate_columns.np
+    codes = np.asarray(codes, dtype=np.int64)
+    count = len(codes)
+    order = np.argsort(codes, kind="stable")
+    ordered = codes[order]
+    starts = np.ones(count, dtype=bool)
+    starts[1:] = ordered[1:] != ordered[:-1]
+    first = np.maximum.accumulate(np.where(starts, np.arange(count), 0))
+    occurrence = np.empty(count, dtype=np.int64)
+    occurrence[order] = np.arange(count) - first
+    return codes * stride + occurrence
+
+
+def _diff_numpy(base: ColumnarEstimate, proposed: ColumnarEstimate) -> EstimateDiff:
+    np = estimate_columns.np
+    base_codes, proposed_codes = key_codes(base, proposed)
+    stride = max(len(base), len(proposed)) + 1
+
+    base_keys = occurrence_keys(base_codes, stride)
+    proposed_keys = occurrence_keys(proposed_codes, stride)
+
+    # Sort-merge both sides on the composite key
+    _, matched_base, matched_proposed = np.intersect1d(
+        base_keys, proposed_keys, assume_unique=True, return_indices=True
+    )
+    order = np.argsort(matched_proposed, kind="stable")
+    matched_base = matched_base[order]
+    matched_proposed = matched_proposed[order]
+
+    base_costs = np.asarray(base.costs, dtype=np.float64)
+    proposed_costs = np.asarray(proposed.costs, dtype=np.float64)
+    deltas = proposed_costs[matched_proposed] - base_costs[matched_base]
+
+    added = np.ones(len(proposed), dtype=bool)
+    added[matched_proposed] = False
+    removed = np.ones(len(base), dtype=bool)
+    removed[matched_base] = False
+
+    return EstimateDiff(
+        base,
+        proposed,
+        matched_base.tolist(),
+        matched_proposed.tolist(),
+        deltas.tolist(),
+        np.flatnonzero(added).tolist(),
+        np.flatnonzero(removed).tolist()
+    )
+
+
+def _diff_python(base: ColumnarEstimate, proposed: ColumnarEstimate) -> EstimateDiff:
+    base_codes, proposed_codes = key_codes(base, proposed)
+
+    unmatched = defaultdict(deque)
+    for index, code in enumerate(base_codes):
+        unmatched[code].append(index)
+
+    matched_base, matched_proposed, deltas, added = [], [], [], []
+    for index, code in enumerate(proposed_codes):
+        candidates = unmatched.get(code)
+        if candidates:
+            base_index = candidates.popleft()
+            matched_base.append(base_index)
+            matched_proposed.append(index)
+            deltas.append(proposed.costs[index] - base.costs[base_index])
+        else:
+            added.append(index)
+
+    removed = sorted(index for indices in unmatched.values() for index in indices)
+    return EstimateDiff(base, proposed, matched_base, matched_proposed, deltas, added, removed)
+
+
+def diff_estimates(base: ColumnarEstimate, proposed: ColumnarEstimate) -> EstimateDiff:
+    """
+    Match resources of two estimates on (project, name) and compute cost deltas
+
+    Resources sharing a (project, name) pair are matched in the order they
+    appear on each side, so duplicates are never collapsed. Estimates with
+    no project in common are matched on name alone. Matched and added
+    resources keep the proposed order, removed resources the baseline order.
+    """
+    if estimate_columns.np is not None:
+        return _diff_numpy(base, proposed)
+    return _diff_python(base, proposed)
@@ -0,0 +1,261 @@
+import csv
+import io
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from app.services.estimate_store import resource_type_of
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    # pyarrow is only needed for Parquet and Arrow exports
+    pa = None
+    pq = None
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream"
+}
+
+EXPORT_FORMATS = tuple(MEDIA_TYPES)
+
+# Columns used when the caller does not choose any
+DEFAULT_COLUMNS = ("name", "resource_type", "monthlyCost")
+
+# Extra columns of flattened rows, one row per cost component
+COMPONENT_COLUMNS = ("subresource", "component", "unit", "monthlyQuantity", "price", "componentMonthlyCost")
+
+# Columns written as float64 in Parquet and Arrow exports
+NUMERIC_COLUMNS = {"monthlyCost", "hourlyCost", "monthlyQuantity", "hourlyQuantity", "price", "componentMonthlyCost"}
+
+# Rows per CSV flush and per Parquet/Arrow record batch
+BATCH_ROWS = 1000
+
+
+def parse_columns(spec: Optional[str], flatten: bool = False) -> Optional[List[str]]:
+    """
+    Parse a comma-separated column list
+
+    Columns are resource keys; dotted paths such as ``tags.team`` read nested
+    values. Returns None when no columns were requested.
+    """
+    if not spec:
+        return None
+    columns = [column.strip() for column in spec.split(",") if column.strip()]
+    if not columns:
+        raise ValueError("No columns requested")
+    if not flatten:
+        flattened = [column for column in columns if column in COMPONENT_COLUMNS]
+        if flattened:
+            raise ValueError(f"Columns {', '.join(flattened)} require flatten=true")
+    return columns
+
+
+def _lookup(resource: Dict[str, Any], column: str) -> Any:
+    if column == "resource_type":
+        return resource_type_of(resource)
+    value = resource
+    for part in column.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _components(resource: Dict[str, Any], prefix: str = "") -> Iterator[Dict[str, Any]]:
+    """
+    Yield the cost components of a resource and its subresources, recursively
+    """
+    for component in resource.get("costComponents") or []:
+        yield {
+            "subresource": prefix,
+            "component": component.get("name"),
+            "unit": component.get("unit"),
+            "monthlyQuantity": component.get("monthlyQuantity"),
+            "price": component.get("price"),
+            "componentMonthlyCost": component.get("monthlyCost")
+        }
+    for subresource in resource.get("subresources") or []:
+        name = subresource.get("name") or ""
+        yield from _components(subresource, f"{prefix}.{name}" if prefix else name)
+
+
+def iter_rows(resources: Iterable[Dict[str, Any]],
+              columns: Optional[List[str]] = None,
+              flatten: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    Turn resources into export rows
+
+    Args:
+        resources: Resources to export
+        columns: Columns to keep; None keeps whole resources
+        flatten: Emit one row per cost component (including those of
+            subresources) instead of one per resource
+
+    Returns:
+        Iterator of row dicts
+    """
+    for resource in resources:
+        base = resource if columns is None else {
+            column: _lookup(resource, column) for column in columns if column not in COMPONENT_COLUMNS
+        }
+        if not flatten:
+            yield base
+            continue
+
+        components = list(_components(resource)) or [dict.fromkeys(COMPONENT_COLUMNS)]
+        for component in components:
+            if columns is not None:
+                component = {column: component[column] for column in columns if column in COMPONENT_COLUMNS}
+            row = dict(base)
+            if columns is None:
+                row.pop("costComponents", None)
+                row.pop("subresources", None)
+            row.update(component)
+            yield row
+
+
+def _cell(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"))
+    return value
+
+
+def _export_csv(rows: Iterator[Dict[str, Any]], columns: List[str]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow([_cell(row.get(column)) for column in columns])
+        count += 1
+        if count % BATCH_ROWS == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def _export_ndjson(rows: Iterator[Dict[str, Any]]) -> Iterator[bytes]:
+    for row in rows:
+        yield json.dumps(row, separators=(",", ":")).encode() + b"\n"
+
+
+def _export_json(rows: Iterator[Dict[str, Any]]) -> Iterator[bytes]:
+    separator = b"["
+    for row in rows:
+        yield separator + json.dumps(row, separators=(",", ":")).encode()
+        separator = b","
+    yield b"[]" if separator == b"[" else b"]"
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only file that hands back whatever was written since the last drain
+    """
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _float(value: Any) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _export_columnar(rows: Iterator[Dict[str, Any]], columns: List[str], fmt: str) -> Iterator[bytes]:
+    schema = pa.schema([
+        (column, pa.float64() if column in NUMERIC_COLUMNS else pa.string()) for column in columns
+    ])
+    sink = _ChunkSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+    else:
+        writer = pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema)
+
+    def convert(column: str, values: List[Any]) -> List[Any]:
+        if column in NUMERIC_COLUMNS:
+            return [_float(value) for value in values]
+        return [None if value is None else str(_cell(value)) for value in values]
+
+    def write(batch: List[Dict[str, Any]]) -> None:
+        arrays = [
+            pa.array(convert(column, [row.get(column) for row in batch]), type=field.type)
+            for column, field in zip(columns, schema)
+        ]
+        writer.write_batch(pa.record_batch(arrays, schema=schema))
+
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_ROWS:
+            write(batch)
+            batch = []
+            yield sink.drain()
+    if batch:
+        write(batch)
+    writer.close()
+    yield sink.drain()
+
+
+def export_estimate(resources: Iterable[Dict[str, Any]],
+                    fmt: str,
+                    columns: Optional[List[str]] = None,
+                    flatten: bool = False) -> Iterator[bytes]:
+    """
+    Stream resources in an export format
+
+    The request is validated up front, so a ValueError is raised before the
+    first byte is produced.
+
+    Args:
+        resources: Resources to export, typically streamed from the store
+        fmt: One of csv, ndjson, json, parquet or arrow
+        columns: Columns to export; CSV, Parquet and Arrow default to
+            name, resource_type and monthlyCost, NDJSON and JSON to the whole
+            resource
+        flatten: Emit one row per cost component
+
+    Returns:
+        Iterator of encoded chunks
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}, expected one of {', '.join(EXPORT_FORMATS)}")
+    if fmt in ("parquet", "arrow") and pa is None:
+        raise ValueError(f"{fmt} export requires pyarrow")
+
+    if columns is None and fmt in ("csv", "parquet", "arrow"):
+        columns = list(DEFAULT_COLUMNS) + (list(COMPONENT_COLUMNS) if flatten else [])
+    rows = iter_rows(resources, columns, flatten)
+
+    if fmt == "csv":
+        return _export_csv(rows, columns)
+    if fmt == "ndjson":
+        return _export_ndjson(rows)
+    if fmt == "json":
+        return _export_json(rows)
+    return _export_columnar(rows, columns, fmt)
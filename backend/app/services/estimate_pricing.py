@@ -0,0 +1,210 @@
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.services import estimate_columns
+from app.services.estimate_store import monthly_cost_of
+
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def is_usage_based(component: Dict[str, Any]) -> bool:
+    """
+    Return whether a cost component scales with usage
+
+    Infracost marks components priced from the usage file with
+    ``usageBased``; time-based components (instance hours and the like) scale
+    with uptime. Anything else, such as provisioned storage or a monthly fee,
+    is fixed.
+    """
+    if component.get("usageBased") is not None:
+        return bool(component["usageBased"])
+    return "hour" in (component.get("unit") or "").lower()
+
+
+def _flatten(resource: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
+    yield from resource.get("costComponents") or []
+    for subresource in resource.get("subresources") or []:
+        yield from _flatten(subresource)
+
+
+class PricingModel:
+    """
+    Cost components of an estimate as unit price and monthly quantity columns
+
+    Every component of every resource (subresources included) is one row,
+    with the rows of a resource kept contiguous. Repricing copies the
+    quantity column, applies the overrides and multiplies by the price
+    column, so it never touches the stored resources or Infracost.
+    """
+    def __init__(self, resources: Iterable[Dict[str, Any]]):
+        names: List[Optional[str]] = []
+        projects: List[Optional[str]] = []
+        costs: List[float] = []
+        bounds: List[Tuple[int, int]] = []
+        owners, prices, quantities, component_costs, usage_based = [], [], [], [], []
+        component_names: List[Optional[str]] = []
+        units: List[Optional[str]] = []
+        self._by_name: Dict[Optional[str], List[int]] = defaultdict(list)
+        self._components: Dict[Tuple[int, Optional[str]], List[int]] = defaultdict(list)
+
+        for idx, resource in enumerate(resources):
+            names.append(resource.get("name"))
+            projects.append(resource.get("project"))
+            costs.append(monthly_cost_of(resource))
+            self._by_name[resource.get("name")].append(idx)
+            start = len(prices)
+            for component in _flatten(resource):
+                self._components[(idx, component.get("name"))].append(len(prices))
+                owners.append(idx)
+                component_names.append(component.get("name"))
+                units.append(component.get("unit"))
+                prices.append(_number(component.get("price")) or 0.0)
+                quantities.append(_number(component.get("monthlyQuantity")) or 0.0)
+                component_costs.append(_number(component.get("monthlyCost")) or 0.0)
+                usage_based.append(is_usage_based(component))
+            bounds.append((start, len(prices)))
+
+        self.names = names
+        self.projects = projects
+        self.bounds = bounds
+        self.component_names = component_names
+        self.units = units
+        np = estimate_columns.np
+        if np is not None:
+            self.costs = np.array(costs, dtype=np.float64)
+            self.owners = np.array(owners, dtype=np.int64)
+            self.prices = np.array(prices, dtype=np.float64)
+            self.quantities = np.array(quantities, dtype=np.float64)
+            self.component_costs = np.array(component_costs, dtype=np.float64)
+            self.usage_based = np.array(usage_based, dtype=bool)
+        else:
+            self.costs = costs
+            self.owners = owners
+            self.prices = prices
+            self.quantities = quantities
+            self.component_costs = component_costs
+            self.usage_based = usage_based
+        self.total = float(sum(costs))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def targets(self, override: Dict[str, Any]) -> List[int]:
+        """
+        Return the resource positions an override selects, by ``index`` or by
+        ``resource`` name and optional ``project``
+        """
+        if override.get("index") is not None:
+            index = override["index"]
+            if not 0 <= index < len(self):
+                raise ValueError(f"No resource at index {index}")
+            return [index]
+        if override.get("resource") is None:
+            raise ValueError("Each override needs an index or a resource name")
+        indices = [
+            idx for idx in self._by_name.get(override["resource"], [])
+            if override.get("project") is None or self.projects[idx] == override["project"]
+        ]
+        if not indices:
+            raise ValueError(f"Resource not found: {override['resource']}")
+        return indices
+
+    def compile(self, overrides: Iterable[Dict[str, Any]]) -> Tuple[Dict[int, float], Dict[int, float]]:
+        """
+        Resolve overrides to component rows
+
+        An override names a resource by ``index`` or by ``resource`` (plus an
+        optional ``project``) and either sets ``usage`` as a percentage of the
+        estimated usage, applied to its usage-based components, or sets the
+        ``monthlyQuantity`` of one ``component``. Later overrides win.
+
+        Returns:
+            Tuple of (component row -> quantity scale, component row -> quantity)
+
+        Raises:
+            ValueError: If an override is malformed or matches nothing
+        """
+        scales: Dict[int, float] = {}
+        quantities: Dict[int, float] = {}
+        for override in overrides:
+            usage, quantity = override.get("usage"), override.get("monthlyQuantity")
+            if (usage is None) == (quantity is None):
+                raise ValueError("Each override needs exactly one of usage or monthlyQuantity")
+            if (usage is not None and usage < 0) or (quantity is not None and quantity < 0):
+                raise ValueError("Overrides cannot be negative")
+
+            for idx in self.targets(override):
+                if quantity is not None:
+                    rows = self._components.get((idx, override.get("component")))
+                    if not override.get("component") or not rows:
+                        raise ValueError(
+                            f"Component not found for {self.names[idx]}: {override.get('component')}"
+                        )
+                    for row in rows:
+                        quantities[row] = quantity
+                        scales.pop(row, None)
+                else:
+                    start, end = self.bounds[idx]
+                    for row in range(start, end):
+                        if self.usage_based[row]:
+                            scales[row] = usage / 100
+                            quantities.pop(row, None)
+        return scales, quantities
+
+    def reprice(self, overrides: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Recompute costs with usage overrides applied
+
+        Only overridden components are recomputed as price x quantity; the
+        rest keep their estimated cost, so fixed components and tiers the
+        overrides do not touch are unaffected.
+
+        Returns:
+            Dictionary with the base and repriced totals and the resources
+            whose cost changed
+        """
+        scales, quantities = self.compile(overrides)
+        np = estimate_columns.np
+        if np is not None:
+            rows = np.fromiter(list(scales) + list(quantities), dtype=np.int64)
+            new_quantities = np.concatenate([
+                self.quantities[list(scales)] * np.fromiter(scales.values(), dtype=np.float64),
+                np.fromiter(quantities.values(), dtype=np.float64)
+            ])
+            deltas = self.prices[rows] * new_quantities - self.component_costs[rows]
+            changed, inverse = np.unique(self.owners[rows], return_inverse=True)
+            resource_deltas = np.bincount(inverse, weights=deltas, minlength=len(changed))
+            changes = zip(changed.tolist(), resource_deltas.tolist())
+        else:
+            by_resource: Dict[int, float] = defaultdict(float)
+            for row, scale in scales.items():
+                by_resource[self.owners[row]] += self.prices[row] * self.quantities[row] * scale - self.component_costs[row]
+            for row, quantity in quantities.items():
+                by_resource[self.owners[row]] += self.prices[row] * quantity - self.component_costs[row]
+            changes = sorted(by_resource.items())
+
+        resources = []
+        delta = 0.0
+        for idx, resource_delta in changes:
+            base = float(self.costs[idx])
+            delta += resource_delta
+            resources.append({
+                "index": idx,
+                "name": self.names[idx],
+                "project": self.projects[idx],
+                "baseMonthlyCost": round(base, 2),
+                "monthlyCost": round(base + resource_delta, 2),
+                "delta": round(resource_delta, 2)
+            })
+
+        return {
+            "base_total": round(self.total, 2),
+            "total": round(self.total + delta, 2),
+            "delta": round(delta, 2),
+            "resources": resources
+        }
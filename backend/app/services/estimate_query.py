@@ -0,0 +1,99 @@
+import base64
+import binascii
+import json
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.services.estimate_export import iter_rows, parse_columns
+from app.services.estimate_store import RESOURCE_ORDERS, EstimateStore
+
+# Resources per page when the caller does not choose
+DEFAULT_PAGE_SIZE = 100
+
+# Largest page a caller may request
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(sort: Optional[str], key: Sequence[Any]) -> str:
+    """
+    Encode the sort key of the last resource of a page as an opaque cursor
+    """
+    payload = json.dumps([sort, list(key)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: Optional[str]) -> List[Any]:
+    """
+    Decode a cursor, checking that it was issued for the same sort order
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, key = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort or not isinstance(key, list) or len(key) != len(RESOURCE_ORDERS[sort]):
+        raise ValueError("Cursor does not match the sort order")
+    return key
+
+
+def page_resources(store: EstimateStore,
+                   uid: str,
+                   resource_types: Optional[Sequence[str]] = None,
+                   name_prefix: Optional[str] = None,
+                   min_cost: Optional[float] = None,
+                   max_cost: Optional[float] = None,
+                   sort: Optional[str] = None,
+                   fields: Optional[str] = None,
+                   limit: int = DEFAULT_PAGE_SIZE,
+                   cursor: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Return one page of an estimate's resources
+
+    Filters and ordering run in SQLite over the indexed resource columns, so
+    only the requested page is decoded whatever the size of the estimate.
+
+    Args:
+        store: Estimate store to read from
+        uid: Estimate identifier
+        resource_types: Only return resources of these types
+        name_prefix: Only return resources whose name starts with this
+        min_cost: Minimum monthly cost (inclusive)
+        max_cost: Maximum monthly cost (inclusive)
+        sort: None for breakdown order, monthlyCost or -monthlyCost
+        fields: Comma-separated fields to keep, dotted paths allowed
+        limit: Page size, up to MAX_PAGE_SIZE
+        cursor: next_cursor of the previous page
+
+    Returns:
+        Dictionary with the page of resources and the cursor of the next page
+        (None on the last page), or None if the estimate is unknown
+    """
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    if sort not in RESOURCE_ORDERS:
+        raise ValueError(f"Cannot sort by {sort}, expected monthlyCost or -monthlyCost")
+    if min_cost is not None and max_cost is not None and min_cost > max_cost:
+        raise ValueError("min_cost cannot be greater than max_cost")
+    columns = parse_columns(fields)
+    after = decode_cursor(cursor, sort) if cursor else None
+
+    # One extra row tells whether another page follows
+    rows = store.query(
+        uid,
+        resource_types=resource_types,
+        name_prefix=name_prefix,
+        min_cost=min_cost,
+        max_cost=max_cost,
+        sort=sort,
+        after=after,
+        limit=limit + 1
+    )
+    if rows is None:
+        return None
+
+    page = rows[:limit]
+    next_cursor = encode_cursor(sort, page[-1][:-1]) if len(rows) > limit else None
+    return {
+        "uid": uid,
+        "resources": list(iter_rows((json.loads(row[-1]) for row in page), columns)),
+        "next_cursor": next_cursor
+    }
@@ -0,0 +1,127 @@
+import heapq
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# Dimensions an estimate is rolled up by, in response order
+ROLLUP_DIMENSIONS = ("resource_type", "provider", "module", "project")
+
+# Most expensive resources kept per group when an estimate is saved
+ROLLUP_TOP_N = 10
+
+# Group key of resources declared in the root module
+ROOT_MODULE = "root"
+
+# Resource type prefixes of the Terraform providers Infracost prices
+PROVIDER_PREFIXES = {
+    "aws": "aws",
+    "azurerm": "azure",
+    "azuread": "azure",
+    "google": "google",
+    "google-beta": "google"
+}
+
+# Leading module path of an address, e.g. module.vpc.module.nat["a"].
+_MODULE_RE = re.compile(r'(?:module\.[^.\[]+(?:\[(?:"[^"]*"|[^\]]*)\])?\.)+')
+
+
+def provider_of(resource_type: Optional[str]) -> Optional[str]:
+    """
+    Return the cloud provider of a resource type, e.g. aws for aws_instance
+    """
+    if not resource_type:
+        return None
+    prefix = resource_type.split("_", 1)[0]
+    return PROVIDER_PREFIXES.get(prefix, prefix)
+
+
+def module_of(name: Optional[str]) -> str:
+    """
+    Return the module path of a resource address, or "root" for resources
+    declared in the root module
+    """
+    match = _MODULE_RE.match(name or "")
+    return match.group()[:-1] if match else ROOT_MODULE
+
+
+class RollupBuilder:
+    """
+    Accumulate per-group totals and top resources while an estimate is saved
+
+    Each group keeps its resource count, monthly total and a bounded heap of
+    its most expensive resources, so a single pass over the resources is
+    enough and memory grows with the number of groups, not resources.
+    """
+    def __init__(self, top_n: int = ROLLUP_TOP_N):
+        self.top_n = top_n
+        self._groups: Dict[Tuple[str, Optional[str]], List[Any]] = {}
+
+    def add(self,
+            idx: int,
+            name: Optional[str],
+            project: Optional[str],
+            resource_type: Optional[str],
+            cost: float) -> None:
+        """
+        Add one resource to every dimension's group
+        """
+        keys = (resource_type, provider_of(resource_type), module_of(name), project)
+        for dimension, key in zip(ROLLUP_DIMENSIONS, keys):
+            group = self._groups.get((dimension, key))
+            if group is None:
+                group = self._groups[(dimension, key)] = [0, 0.0, []]
+            group[0] += 1
+            group[1] += cost
+            # Ties keep the earlier resource: a lower idx ranks higher
+            entry = (cost, -idx, name, project, resource_type)
+            if len(group[2]) < self.top_n:
+                heapq.heappush(group[2], entry)
+            elif entry > group[2][0]:
+                heapq.heapreplace(group[2], entry)
+
+    def rows(self) -> List[Tuple[str, Optional[str], int, float, List[Dict[str, Any]]]]:
+        """
+        Return (dimension, key, resource_count, monthly_cost, top) per group,
+        with top ordered from the most expensive resource down
+        """
+        return [
+            (dimension, key, count, total, [
+                {"idx": -neg_idx, "name": name, "project": project, "resource_type": resource_type, "monthlyCost": cost}
+                for cost, neg_idx, name, project, resource_type in sorted(top, reverse=True)
+            ])
+            for (dimension, key), (count, total, top) in self._groups.items()
+        ]
+
+
+def build_summary(estimate: Dict[str, Any],
+                  rows: List[Tuple[str, Optional[str], int, float, List[Dict[str, Any]]]],
+                  top: int = 5) -> Dict[str, Any]:
+    """
+    Shape stored rollup rows into the summary of an estimate
+
+    Args:
+        estimate: Estimate row as returned by EstimateStore.get_meta
+        rows: (dimension, key, resource_count, monthly_cost, top) rollup rows
+        top: Number of top resources to include per group
+
+    Returns:
+        Dictionary with the totals and, per dimension, groups ordered by
+        monthly cost
+    """
+    groups = {dimension: [] for dimension in ROLLUP_DIMENSIONS}
+    for dimension, key, count, total, top_resources in rows:
+        groups.setdefault(dimension, []).append({
+            "key": key,
+            "resource_count": count,
+            "monthlyCost": round(total, 2),
+            "top": top_resources[:top]
+        })
+    for values in groups.values():
+        values.sort(key=lambda group: (-group["monthlyCost"], str(group["key"])))
+
+    return {
+        "uid": estimate["uid"],
+        "created_at": estimate["created_at"],
+        "resource_count": estimate["resource_count"],
+        "total_monthly_cost": round(estimate["total_monthly_cost"], 2),
+        "groups": groups
+    }
@@ -0,0 +1,147 @@
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.services import estimate_columns
+from app.services.estimate_columns import ColumnarEstimate
+from app.services.estimate_diff import key_codes, occurrence_keys
+
+# Most estimates a single series comparison accepts
+SERIES_MAX_ESTIMATES = 50
+
+
+def _align_numpy(estimates: Sequence[ColumnarEstimate]) -> Tuple[List[Any], List[Tuple[int, int]]]:
+    np = estimate_columns.np
+    stride = max(len(columns) for columns in estimates) + 1
+    keys = np.concatenate([occurrence_keys(codes, stride) for codes in key_codes(*estimates)])
+
+    # Rows are numbered in order of first appearance across the series
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    order = np.argsort(first, kind="stable")
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    rows = rank[inverse.reshape(-1)]
+
+    offsets = np.cumsum([0] + [len(columns) for columns in estimates])
+    owners = np.searchsorted(offsets, first[order], side="right") - 1
+    labels = list(zip(owners.tolist(), (first[order] - offsets[owners]).tolist()))
+    return [rows[offsets[i]:offsets[i + 1]].tolist() for i in range(len(estimates))], labels
+
+
+def _align_python(estimates: Sequence[ColumnarEstimate]) -> Tuple[List[Any], List[Tuple[int, int]]]:
+    ids: Dict[Tuple[int, int], int] = {}
+    labels: List[Tuple[int, int]] = []
+    rows = []
+    for owner, codes in enumerate(key_codes(*estimates)):
+        seen = defaultdict(int)
+        estimate_rows = []
+        for position, code in enumerate(codes):
+            row = ids.setdefault((code, seen[code]), len(ids))
+            seen[code] += 1
+            if row == len(labels):
+                labels.append((owner, position))
+            estimate_rows.append(row)
+        rows.append(estimate_rows)
+    return rows, labels
+
+
+def _matrix_numpy(estimates: Sequence[ColumnarEstimate],
+                  rows: List[List[int]],
+                  size: int) -> Tuple[List[List[Optional[float]]], List[List[float]], List[Dict[str, int]], List[bool]]:
+    np = estimate_columns.np
+    costs = np.zeros((len(estimates), size))
+    present = np.zeros((len(estimates), size), dtype=bool)
+    for column, (columns, estimate_rows) in enumerate(zip(estimates, rows)):
+        costs[column, estimate_rows] = columns.costs
+        present[column, estimate_rows] = True
+
+    before, after = present[:-1], present[1:]
+    both = before & after
+    counts = {
+        "increased": (both & (costs[1:] > costs[:-1])).sum(axis=1).tolist(),
+        "decreased": (both & (costs[1:] < costs[:-1])).sum(axis=1).tolist(),
+        "added": (after & ~before).sum(axis=1).tolist(),
+        "removed": (before & ~after).sum(axis=1).tolist()
+    }
+    steps = [{key: values[step] for key, values in counts.items()} for step in range(len(estimates) - 1)]
+    unchanged = ((present == present[0]).all(axis=0) & (costs == costs[0]).all(axis=0)).tolist()
+
+    deltas = np.round(np.diff(costs, axis=0), 2).T.tolist()
+    values = costs.T.astype(object)
+    values[~present.T] = None
+    return values.tolist(), deltas, steps, unchanged
+
+
+def _matrix_python(estimates: Sequence[ColumnarEstimate],
+                   rows: List[List[int]],
+                   size: int) -> Tuple[List[List[Optional[float]]], List[List[float]], List[Dict[str, int]], List[bool]]:
+    matrix: List[List[Optional[float]]] = [[None] * len(estimates) for _ in range(size)]
+    for column, (columns, estimate_rows) in enumerate(zip(estimates, rows)):
+        for row, cost in zip(estimate_rows, columns.costs):
+            matrix[row][column] = cost
+
+    steps = [{"increased": 0, "decreased": 0, "added": 0, "removed": 0} for _ in range(len(estimates) - 1)]
+    deltas = []
+    for costs in matrix:
+        for step, (old, new) in enumerate(zip(costs, costs[1:])):
+            if old is None and new is not None:
+                steps[step]["added"] += 1
+            elif new is None and old is not None:
+                steps[step]["removed"] += 1
+            elif old is not None and new != old:
+                steps[step]["increased" if new > old else "decreased"] += 1
+        deltas.append([round((new or 0.0) - (old or 0.0), 2) for old, new in zip(costs, costs[1:])])
+    unchanged = [all(cost == costs[0] for cost in costs) for costs in matrix]
+    return matrix, deltas, steps, unchanged
+
+
+def compare_series(estimates: Sequence[ColumnarEstimate], changed_only: bool = False) -> Dict[str, Any]:
+    """
+    Align an ordered series of estimates on (project, name) and build a cost
+    matrix with one row per resource and one column per estimate
+
+    Resources are aligned in a single pass over the columns of every
+    estimate; duplicate (project, name) pairs are paired by occurrence, as in
+    diff_estimates. A resource missing from an estimate has a null cost there.
+
+    Args:
+        estimates: Estimates in series order, each with its uid set
+        changed_only: Leave out resources whose cost never changes
+
+    Returns:
+        Dictionary with the uids, total cost per estimate, a summary per step
+        and the per-resource costs and step deltas
+    """
+    if not 2 <= len(estimates) <= SERIES_MAX_ESTIMATES:
+        raise ValueError(f"A series needs between 2 and {SERIES_MAX_ESTIMATES} estimates")
+    uids = [columns.uid for columns in estimates]
+    totals = [columns.total() for columns in estimates]
+    if any(len(columns) for columns in estimates):
+        use_numpy = estimate_columns.np is not None
+        rows, labels = (_align_numpy if use_numpy else _align_python)(estimates)
+        costs, deltas, steps, unchanged = (_matrix_numpy if use_numpy else _matrix_python)(estimates, rows, len(labels))
+    else:
+        labels, costs, deltas, unchanged = [], [], [], []
+        steps = [{"increased": 0, "decreased": 0, "added": 0, "removed": 0} for _ in range(len(estimates) - 1)]
+
+    resources = []
+    for row, (owner, position) in enumerate(labels):
+        if changed_only and unchanged[row]:
+            continue
+        columns = estimates[owner]
+        resources.append({
+            "name": columns.names[position],
+            "project": columns.project(position),
+            "resource_type": columns.resource_type(position),
+            "costs": costs[row],
+            "deltas": deltas[row]
+        })
+
+    return {
+        "uids": uids,
+        "totals": [round(total, 2) for total in totals],
+        "steps": [
+            {"from": uids[step], "to": uids[step + 1], "delta": round(totals[step + 1] - totals[step], 2), **counts}
+            for step, counts in enumerate(steps)
+        ],
+        "resources": resources
+    }
@@ -0,0 +1,281 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from app.services import estimate_columns
+from app.services.estimate_pricing import PricingModel
+
+# Samples drawn when the caller does not choose, and the most allowed
+DEFAULT_SAMPLES = 10000
+MAX_SAMPLES = 100000
+
+# Resources whose samples are reduced to percentiles at a time
+RESOURCE_BATCH = 256
+
+PERCENTILES = (10, 50, 90)
+
+# Usage file keys and the cost component they drive, matched on a
+# lowercase keyword in the component's name or, for units, the whole unit.
+# A key applies only where it matches exactly one component that is not a
+# price tier. "usage" is a percentage of the estimated quantity of every
+# usage-based component.
+USAGE_KEY_COMPONENTS = {
+    "monthly_hours": ("unit", "hour"),
+    "monthly_requests": ("name", "request"),
+    "monthly_read_request_units": ("name", "read"),
+    "monthly_write_request_units": ("name", "write"),
+    "storage_gb": ("name", "storage")
+}
+
+_UNIT_SCALE_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMB])?\b", re.I)
+_UNIT_MULTIPLIERS = {None: 1, "k": 1e3, "m": 1e6, "b": 1e9}
+
+# Infracost splits tiered prices into one component per tier, such as
+# "Requests (first 1B)", "(next 450 TB)" and "(over 500 TB)"
+_TIER_RE = re.compile(r"\((?:first|next|over)\s", re.I)
+
+Range = Union[float, int, Dict[str, Any]]
+
+
+def drives(key: str, name: Optional[str], unit: Optional[str]) -> bool:
+    """
+    Check whether a usage key matches a cost component
+    """
+    field, keyword = USAGE_KEY_COMPONENTS[key]
+    if field == "unit":
+        # Plain hours only; "vCPU-hours" or "GB-hours" bill other quantities
+        return (unit or "").lower().rstrip("s") == keyword
+    return keyword in (name or "").lower()
+
+
+def tiered(name: Optional[str]) -> bool:
+    """
+    Check whether a cost component is one tier of a tiered price, whose
+    quantity a usage key cannot set on its own
+    """
+    return bool(_TIER_RE.search(name or ""))
+
+
+def unit_scale(unit: Optional[str]) -> float:
+    """
+    Return how many usage units one priced unit holds, e.g. 1e6 for
+    "1M requests" and 1 for "hours"
+    """
+    match = _UNIT_SCALE_RE.match(unit or "")
+    if not match:
+        return 1.0
+    return float(match.group(1)) * _UNIT_MULTIPLIERS[(match.group(2) or "").lower() or None]
+
+
+# Distributions, each drawn for a block of variables at once
+TRIANGULAR, UNIFORM, NORMAL = "triangular", "uniform", "normal"
+
+
+def _distribution(spec: Range, key: str) -> Tuple[str, Tuple[float, ...]]:
+    """
+    Validate a range spec and return its distribution and parameters
+    """
+    if isinstance(spec, (int, float)) and not isinstance(spec, bool):
+        # A fixed value is a uniform range of width zero
+        return UNIFORM, (float(spec), float(spec))
+    if not isinstance(spec, dict):
+        raise ValueError(f"Invalid range for {key}")
+
+    distribution = spec.get("distribution") or (TRIANGULAR if "likely" in spec else UNIFORM)
+    try:
+        if distribution == TRIANGULAR:
+            low, mode, high = float(spec["min"]), float(spec["likely"]), float(spec["max"])
+            if not low <= mode <= high:
+                raise ValueError(f"Range for {key} needs min <= likely <= max")
+            return TRIANGULAR, (low, mode, high)
+        if distribution == UNIFORM:
+            low, high = float(spec["min"]), float(spec["max"])
+            if low > high:
+                raise ValueError(f"Range for {key} needs min <= max")
+            return UNIFORM, (low, high)
+        if distribution == NORMAL:
+            mean, stddev = float(spec["mean"]), float(spec["stddev"])
+            if stddev < 0:
+                raise ValueError(f"Range for {key} needs a non-negative stddev")
+            return NORMAL, (mean, stddev)
+    except KeyError as e:
+        raise ValueError(f"Range for {key} is missing {e.args[0]}")
+    except TypeError:
+        raise ValueError(f"Range for {key} needs numeric values")
+    raise ValueError(f"Unsupported distribution for {key}: {distribution}")
+
+
+def _draw(rng, distributions: List[str], params: List[Tuple[float, ...]], samples: int):
+    """
+    Draw samples for a block of variables, one row each, with every
+    distribution sampled as a single array operation
+    """
+    np = estimate_columns.np
+    values = np.empty((len(distributions), samples))
+    kinds = np.array(distributions)
+    for kind in (TRIANGULAR, UNIFORM, NORMAL):
+        rows = np.flatnonzero(kinds == kind)
+        if not len(rows):
+            continue
+        columns = np.array([params[row] for row in rows]).T[:, :, None]
+        if kind == UNIFORM:
+            values[rows] = rng.uniform(columns[0], columns[1], (len(rows), samples))
+        elif kind == NORMAL:
+            # Usage cannot go below zero
+            values[rows] = np.maximum(rng.normal(columns[0], columns[1], (len(rows), samples)), 0.0)
+        else:
+            low, mode, high = columns
+            ranged = (high > low)[:, 0]
+            # Generator.triangular needs min < max; the rest are fixed values
+            values[rows[~ranged]] = low[~ranged]
+            if ranged.any():
+                values[rows[ranged]] = rng.triangular(
+                    low[ranged], mode[ranged], high[ranged], (int(ranged.sum()), samples)
+                )
+    return values
+
+
+def _percentiles(costs):
+    """
+    Linear-interpolated PERCENTILES of every row, sorting in place; a full
+    sort is several times faster than the selection np.percentile runs
+    """
+    costs.sort(axis=1)
+    last = costs.shape[1] - 1
+    result = []
+    for percentile in PERCENTILES:
+        position = last * percentile / 100
+        below = int(position)
+        above = min(below + 1, last)
+        fraction = position - below
+        result.append(costs[:, below] * (1 - fraction) + costs[:, above] * fraction)
+    return result
+
+
+def _driven_rows(model: PricingModel, idx: int, key: str) -> List[Tuple[int, float]]:
+    """
+    Return (component row, quantity per usage unit) for the components a
+    usage key drives on one resource; a usage key other than "usage"
+    drives at most one
+    """
+    start, end = model.bounds[idx]
+    if key == "usage":
+        # Percent of the estimated quantity
+        return [(row, model.quantities[row] / 100) for row in range(start, end) if model.usage_based[row]]
+    if key not in USAGE_KEY_COMPONENTS:
+        raise ValueError(f"Unsupported usage key: {key}, expected usage or one of {', '.join(USAGE_KEY_COMPONENTS)}")
+    rows = [row for row in range(start, end) if drives(key, model.component_names[row], model.units[row])]
+    if len(rows) > 1:
+        raise ValueError(f"{key} matches {len(rows)} cost components of {model.names[idx]}, use the usage key instead")
+    if rows and tiered(model.component_names[rows[0]]):
+        raise ValueError(f"{key} matches a tiered cost component of {model.names[idx]}, use the usage key instead")
+    return [(row, 1 / unit_scale(model.units[row])) for row in rows]
+
+
+def simulate(model: PricingModel,
+             ranges: Dict[str, Dict[str, Range]],
+             samples: int = DEFAULT_SAMPLES,
+             seed: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Monte Carlo distribution of monthly cost under uncertain usage
+
+    Each (resource, usage key) range is sampled once per draw and drives the
+    quantity of the matching cost components, which are repriced as unit
+    price x quantity. Samples are drawn and reduced with NumPy a batch of
+    resources at a time, so memory stays at batch x samples floats.
+
+    Args:
+        model: Pricing model of the estimate
+        ranges: Resource name -> usage key -> range, where a range is a number
+            or a dict with min/likely/max (triangular), min/max (uniform) or
+            mean/stddev (normal, clipped at zero) and an optional
+            ``distribution``
+        samples: Number of draws
+        seed: Optional seed for reproducible results
+
+    Returns:
+        Dictionary with base cost, mean and P10/P50/P90 monthly totals overall
+        and for every simulated resource
+    """
+    np = estimate_columns.np
+    if np is None:
+        raise ValueError("Simulation requires numpy")
+    if not 1 <= samples <= MAX_SAMPLES:
+        raise ValueError(f"samples must be between 1 and {MAX_SAMPLES}")
+
+    # Resolve ranges to variables: one per (resource, usage key), carrying
+    # the price of the components it drives. A component driven by several
+    # keys follows the last one.
+    drivers: Dict[int, Dict[str, Tuple[str, Tuple[float, ...]]]] = {}
+    driven: Dict[int, Dict[int, Tuple[str, float]]] = {}
+    for name, keys in ranges.items():
+        for idx in model.targets({"resource": name}):
+            for key, spec in keys.items():
+                rows = _driven_rows(model, idx, key)
+                if not rows:
+                    raise ValueError(f"No cost components of {name} are driven by {key}")
+                drivers.setdefault(idx, {})[key] = _distribution(spec, key)
+                for row, per_unit in rows:
+                    driven.setdefault(idx, {})[row] = (key, per_unit)
+
+    rng = np.random.default_rng(seed)
+    totals = np.full(samples, model.total)
+    resources = []
+    indices = list(drivers)
+    for start in range(0, len(indices), RESOURCE_BATCH):
+        batch = indices[start:start + RESOURCE_BATCH]
+        distributions, params, coefficients, owners, layers = [], [], [], [], []
+        fixed = model.costs[batch].copy()
+        for position, idx in enumerate(batch):
+            keys = list(drivers[idx])
+            slope = dict.fromkeys(keys, 0.0)
+            for row, (key, per_unit) in driven[idx].items():
+                slope[key] += float(model.prices[row]) * per_unit
+                fixed[position] -= model.component_costs[row]
+            # Keys whose components were all taken over by a later key
+            # drive nothing and are not drawn
+            for layer, key in enumerate(key for key in keys if slope[key]):
+                distribution, values = drivers[idx][key]
+                distributions.append(distribution)
+                params.append(values)
+                coefficients.append(slope[key])
+                owners.append(position)
+                layers.append(layer)
+
+        # Cost is linear in usage: fixed part plus price x sampled quantity,
+        # summed one layer (nth variable of each resource) at a time
+        contributions = _draw(rng, distributions, params, samples)
+        contributions *= np.array(coefficients)[:, None]
+        costs = np.repeat(fixed[:, None], samples, axis=1)
+        depth = max(layers, default=-1) + 1
+        owners, layers = np.array(owners, dtype=np.int64), np.array(layers, dtype=np.int64)
+        for layer in range(depth):
+            selected = layers == layer
+            costs[owners[selected]] += contributions[selected]
+        totals += costs.sum(axis=0) - model.costs[batch].sum()
+
+        means = costs.mean(axis=1)
+        low, mid, high = _percentiles(costs)
+        for position, idx in enumerate(batch):
+            resources.append({
+                "index": idx,
+                "name": model.names[idx],
+                "project": model.projects[idx],
+                "base": round(float(model.costs[idx]), 2),
+                "mean": round(float(means[position]), 2),
+                "p10": round(float(low[position]), 2),
+                "p50": round(float(mid[position]), 2),
+                "p90": round(float(high[position]), 2)
+            })
+
+    low, mid, high = np.percentile(totals, PERCENTILES)
+    return {
+        "samples": samples,
+        "total": {
+            "base": round(model.total, 2),
+            "mean": round(float(totals.mean()), 2),
+            "p10": round(float(low), 2),
+            "p50": round(float(mid), 2),
+            "p90": round(float(high), 2)
+        },
+        "resources": resources
+    }
@@ -0,0 +1,495 @@
+import json
+import sqlite3
+import threading
+import time
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from app.services.estimate_rollups import RollupBuilder
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS estimates (
+    uid TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    expires_at REAL,
+    parent_uid TEXT,
+    resource_count INTEGER NOT NULL,
+    total_monthly_cost REAL NOT NULL,
+    meta TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_estimates_created_at ON estimates(created_at);
+CREATE INDEX IF NOT EXISTS idx_estimates_expires_at ON estimates(expires_at);
+CREATE INDEX IF NOT EXISTS idx_estimates_parent_uid ON estimates(parent_uid);
+
+CREATE TABLE IF NOT EXISTS resources (
+    uid TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    project TEXT,
+    name TEXT,
+    resource_type TEXT,
+    monthly_cost REAL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (uid, idx)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_resources_type ON resources(resource_type, uid);
+CREATE INDEX IF NOT EXISTS idx_resources_project ON resources(uid, project);
+CREATE INDEX IF NOT EXISTS idx_resources_cost ON resources(uid, monthly_cost, idx);
+CREATE INDEX IF NOT EXISTS idx_resources_name ON resources(uid, name);
+
+CREATE TABLE IF NOT EXISTS rollups (
+    uid TEXT NOT NULL,
+    dimension TEXT NOT NULL,
+    key TEXT,
+    resource_count INTEGER NOT NULL,
+    monthly_cost REAL NOT NULL,
+    top TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_rollups_uid ON rollups(uid, dimension);
+"""
+
+# Rows fetched per query when reading resources by position
+ROW_BATCH_SIZE = 500
+
+# Resources written per transaction when saving an estimate
+SAVE_BATCH_SIZE = 1000
+
+# Orders resources can be queried in, mapped to their sort columns
+RESOURCE_ORDERS = {
+    None: ("idx",),
+    "monthlyCost": ("monthly_cost", "idx"),
+    "-monthlyCost": ("monthly_cost", "idx")
+}
+
+# Suffix for the baseline estimate shipped inside an upload as estimate.json
+PREVIOUS_SUFFIX = ".previous"
+
+
+def resource_type_of(resource: Dict[str, Any]) -> Optional[str]:
+    """
+    Return the resource type, accepting both our and Infracost's key names
+    """
+    return resource.get("resource_type") or resource.get("resourceType")
+
+
+def monthly_cost_of(resource: Dict[str, Any]) -> float:
+    """
+    Return the monthly cost of a resource as a float (0 when unpriced)
+    """
+    try:
+        return float(resource.get("monthlyCost") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class EstimateStore:
+    """
+    SQLite-backed store for cost estimates
+
+    Each estimate is a row in ``estimates`` plus one row per resource in
+    ``resources``. Resources are kept as compact JSON next to the indexed
+    columns (project, name, type and monthly cost) that queries filter on.
+    Totals per resource type, provider, module and project are rolled up into
+    ``rollups`` as the estimate is written.
+    """
+    def __init__(self, db_path: Path, ttl_seconds: Optional[float] = None, purge_interval: float = 60.0):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.purge_interval = purge_interval
+        self._last_purge = 0.0
+        self._lock = threading.RLock()
+
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def save(self,
+             uid: str,
+             resources: Iterable[Dict[str, Any]],
+             parent_uid: Optional[str] = None,
+             meta: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Store an estimate, replacing any earlier estimate with the same uid
+
+        Resources are serialised and inserted SAVE_BATCH_SIZE at a time, each
+        batch in its own short transaction, so neither a full row list nor
+        the store's lock is held while a streamed estimate is parsed. The
+        estimate row and its rollups are written last: until then readers do
+        not see the estimate, and a failed save leaves nothing behind. An
+        estimate being replaced is gone from the start of the save.
+
+        Args:
+            uid: Estimate identifier
+            resources: Resources as extracted from Infracost output
+            parent_uid: Optional estimate this one was derived from
+            meta: Optional JSON-serialisable metadata
+
+        Returns:
+            The stored estimate row, with the ``rollups`` rows computed while
+            saving (see EstimateStore.get_rollups)
+        """
+        now = time.time()
+        expires_at = now + self.ttl_seconds if self.ttl_seconds else None
+
+        count = 0
+        total = 0.0
+        rollups = RollupBuilder()
+
+        def rows() -> Iterator[Tuple[Any, ...]]:
+            nonlocal count, total
+            for idx, resource in enumerate(resources):
+                cost = monthly_cost_of(resource)
+                count += 1
+                total += cost
+                row = (
+                    uid,
+                    idx,
+                    resource.get("project"),
+                    resource.get("name"),
+                    resource_type_of(resource),
+                    cost,
+                    json.dumps(resource, separators=(",", ":"))
+                )
+                rollups.add(idx, row[3], row[2], row[4], cost)
+                yield row
+
+        self._write(self._delete, uid)
+        try:
+            pending = rows()
+            while True:
+                # Serialise the batch before taking the lock
+                batch = list(islice(pending, SAVE_BATCH_SIZE))
+                if not batch:
+                    break
+                self._write(
+                    self._conn.executemany,
+                    "INSERT INTO resources (uid, idx, project, name, resource_type, monthly_cost, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    batch
+                )
+
+            def finish() -> None:
+                self._conn.execute(
+                    "INSERT INTO estimates (uid, created_at, expires_at, parent_uid, resource_count, "
+                    "total_monthly_cost, meta) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (uid, now, expires_at, parent_uid, count, total, json.dumps(meta or {}))
+                )
+                self._insert_rollups(uid, rollups)
+
+            self._write(finish)
+        except BaseException:
+            self._write(self._conn.execute, "DELETE FROM resources WHERE uid = ?", (uid,))
+            raise
+
+        return {
+            "uid": uid,
+            "created_at": now,
+            "expires_at": expires_at,
+            "parent_uid": parent_uid,
+            "resource_count": count,
+            "total_monthly_cost": total,
+            "meta": meta or {},
+            "rollups": rollups.rows()
+        }
+
+    def _write(self, write: Callable[..., Any], *args: Any) -> None:
+        """
+        Run a write in its own transaction
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                write(*args)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _insert_rollups(self, uid: str, rollups: RollupBuilder) -> None:
+        self._conn.executemany(
+            "INSERT INTO rollups (uid, dimension, key, resource_count, monthly_cost, top) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (uid, dimension, key, count, total, json.dumps(top, separators=(",", ":")))
+                for dimension, key, count, total, top in rollups.rows()
+            ]
+        )
+
+    def exists(self, uid: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM estimates WHERE uid = ?", (uid,)).fetchone()
+        return row is not None
+
+    def get_meta(self, uid: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the estimate row (without resources), or None if unknown
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT uid, created_at, expires_at, parent_uid, resource_count, total_monthly_cost, meta "
+                "FROM estimates WHERE uid = ?",
+                (uid,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "uid": row[0],
+            "created_at": row[1],
+            "expires_at": row[2],
+            "parent_uid": row[3],
+            "resource_count": row[4],
+            "total_monthly_cost": row[5],
+            "meta": json.loads(row[6] or "{}")
+        }
+
+    def link(self, uid: str, parent_uid: str, meta: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Record the estimate an existing estimate was derived from, merging
+        any metadata into what is already stored
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT meta FROM estimates WHERE uid = ?", (uid,)).fetchone()
+                if row is not None:
+                    merged = dict(json.loads(row[0] or "{}"), **(meta or {}))
+                    self._conn.execute(
+                        "UPDATE estimates SET parent_uid = ?, meta = ? WHERE uid = ?",
+                        (parent_uid, json.dumps(merged), uid)
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def get(self, uid: str, projects: Optional[Iterable[str]] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Return the resources of an estimate in their original order,
+        optionally only those of the given projects
+        """
+        raw = self.get_raw(uid, projects)
+        if raw is None:
+            return None
+        return [json.loads(data) for data in raw]
+
+    def get_raw(self, uid: str, projects: Optional[Iterable[str]] = None) -> Optional[List[str]]:
+        """
+        Return the stored JSON of each resource without decoding it
+        """
+        query = "SELECT data FROM resources WHERE uid = ?"
+        params = [uid]
+        if projects is not None:
+            projects = list(projects)
+            query += f" AND project IN ({','.join('?' * len(projects))})"
+            params += projects
+
+        with self._lock:
+            if not self.exists(uid):
+                return None
+            if projects is not None and not projects:
+                return []
+            rows = self._conn.execute(query + " ORDER BY idx", params).fetchall()
+        return [row[0] for row in rows]
+
+    def iter_raw(self, uid: str, batch_size: int = ROW_BATCH_SIZE) -> Iterator[str]:
+        """
+        Yield the stored JSON of each resource in order, reading in batches
+        so the store is never locked for the whole estimate
+        """
+        last_idx = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT idx, data FROM resources WHERE uid = ? AND idx > ? ORDER BY idx LIMIT ?",
+                    (uid, last_idx, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for _, data in rows:
+                yield data
+            last_idx = rows[-1][0]
+
+    def get_columns(self, uid: str) -> Optional[List[Tuple[Optional[str], Optional[str], Optional[str], float]]]:
+        """
+        Return (project, name, resource_type, monthly_cost) for every resource
+        without reading the stored JSON
+        """
+        with self._lock:
+            if not self.exists(uid):
+                return None
+            return self._conn.execute(
+                "SELECT project, name, resource_type, monthly_cost FROM resources WHERE uid = ? ORDER BY idx",
+                (uid,)
+            ).fetchall()
+
+    def get_rollups(self, uid: str) -> Optional[List[Tuple[str, Optional[str], int, float, List[Dict[str, Any]]]]]:
+        """
+        Return the (dimension, key, resource_count, monthly_cost, top) rollups
+        computed when the estimate was saved
+
+        Estimates stored before rollups existed are rolled up from their
+        resource columns on first access.
+        """
+        with self._lock:
+            meta = self.get_meta(uid)
+            if meta is None:
+                return None
+            rows = self._conn.execute(
+                "SELECT dimension, key, resource_count, monthly_cost, top FROM rollups WHERE uid = ?", (uid,)
+            ).fetchall()
+            if not rows and meta["resource_count"]:
+                rollups = RollupBuilder()
+                for idx, (project, name, resource_type, cost) in enumerate(self.get_columns(uid)):
+                    rollups.add(idx, name, project, resource_type, cost or 0.0)
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    self._insert_rollups(uid, rollups)
+                    self._conn.execute("COMMIT")
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+                return rollups.rows()
+        return [(dimension, key, count, total, json.loads(top)) for dimension, key, count, total, top in rows]
+
+    def query(self,
+              uid: str,
+              resource_types: Optional[Sequence[str]] = None,
+              name_prefix: Optional[str] = None,
+              min_cost: Optional[float] = None,
+              max_cost: Optional[float] = None,
+              sort: Optional[str] = None,
+              after: Optional[Sequence[Any]] = None,
+              limit: int = ROW_BATCH_SIZE) -> Optional[List[Tuple[Any, ...]]]:
+        """
+        Return one page of resources matching the filters, using the indexes
+        on type, name and cost
+
+        Args:
+            uid: Estimate identifier
+            resource_types: Only return resources of these types
+            name_prefix: Only return resources whose name starts with this
+            min_cost: Minimum monthly cost (inclusive)
+            max_cost: Maximum monthly cost (inclusive)
+            sort: None for breakdown order, monthlyCost or -monthlyCost
+            after: Sort key of the last row of the previous page, as returned
+                in the first columns of each row
+            limit: Maximum number of rows
+
+        Returns:
+            Rows of the sort key columns followed by the stored JSON, or None
+            if the estimate is unknown
+        """
+        if sort not in RESOURCE_ORDERS:
+            raise ValueError(f"Cannot sort by {sort}, expected monthlyCost or -monthlyCost")
+        keys = RESOURCE_ORDERS[sort]
+        descending = sort is not None and sort.startswith("-")
+
+        clauses = ["uid = ?"]
+        params: List[Any] = [uid]
+        if resource_types is not None:
+            if not resource_types:
+                return [] if self.exists(uid) else None
+            clauses.append(f"resource_type IN ({','.join('?' * len(resource_types))})")
+            params += resource_types
+        if name_prefix:
+            # A range rather than LIKE so the name index is used
+            clauses.append("name >= ? AND name < ?")
+            params += [name_prefix, name_prefix + "\U0010ffff"]
+        if min_cost is not None:
+            clauses.append("monthly_cost >= ?")
+            params.append(min_cost)
+        if max_cost is not None:
+            clauses.append("monthly_cost <= ?")
+            params.append(max_cost)
+        if after is not None:
+            if len(after) != len(keys):
+                raise ValueError("Cursor does not match the sort order")
+            clauses.append(f"({', '.join(keys)}) {'<' if descending else '>'} ({', '.join('?' * len(keys))})")
+            params += after
+
+        direction = " DESC" if descending else ""
+        query = (
+            f"SELECT {', '.join(keys)}, data FROM resources WHERE {' AND '.join(clauses)} "
+            f"ORDER BY {', '.join(key + direction for key in keys)} LIMIT ?"
+        )
+        with self._lock:
+            if not self.exists(uid):
+                return None
+            return self._conn.execute(query, params + [limit]).fetchall()
+
+    def get_rows(self, uid: str, indices: Sequence[int]) -> List[Dict[str, Any]]:
+        """
+        Return the resources at the given positions, in the order requested
+        """
+        if not indices:
+            return []
+        found = {}
+        low, high = min(indices), max(indices)
+        with self._lock:
+            if len(indices) * 2 > high - low:
+                # Mostly contiguous: one range scan beats many IN lookups
+                found.update(self._conn.execute(
+                    "SELECT idx, data FROM resources WHERE uid = ? AND idx BETWEEN ? AND ?", (uid, low, high)
+                ))
+            else:
+                for start in range(0, len(indices), ROW_BATCH_SIZE):
+                    batch = list(indices[start:start + ROW_BATCH_SIZE])
+                    rows = self._conn.execute(
+                        f"SELECT idx, data FROM resources WHERE uid = ? AND idx IN ({','.join('?' * len(batch))})",
+                        [uid, *batch]
+                    )
+                    found.update(rows)
+        # One decode of the spliced array is much cheaper than one per row
+        return json.loads("[" + ",".join(found[idx] for idx in indices if idx in found) + "]")
+
+    def delete(self, uid: str) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._delete(uid)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _delete(self, uid: str) -> None:
+        self._conn.execute("DELETE FROM resources WHERE uid = ?", (uid,))
+        self._conn.execute("DELETE FROM rollups WHERE uid = ?", (uid,))
+        self._conn.execute("DELETE FROM estimates WHERE uid = ?", (uid,))
+
+    def purge_expired(self, now: Optional[float] = None) -> List[str]:
+        """
+        Delete every estimate whose TTL has passed
+
+        Returns:
+            The uids that were removed
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                uids = [row[0] for row in self._conn.execute(
+                    "SELECT uid FROM estimates WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+                )]
+                for uid in uids:
+                    self._delete(uid)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._last_purge = now
+        return uids
+
+    def maybe_purge(self) -> List[str]:
+        """
+        Run purge_expired at most once per purge_interval
+        """
+        if not self.ttl_seconds or time.time() - self._last_purge < self.purge_interval:
+            return []
+        return self.purge_expired()
@@ -0,0 +1,274 @@
+import asyncio
+import subprocess
+import threading
+import weakref
+from collections import deque
+from typing import Any, Awaitable, Callable, Iterator, List, Optional
+
+# stdout is handed to stream consumers in chunks of this size, with at most
+# STREAM_MAX_CHUNKS buffered before reading the pipe pauses
+STREAM_CHUNK_SIZE = 256 * 1024
+STREAM_MAX_CHUNKS = 8
+
+
+class InfracostBusyError(RuntimeError):
+    """Raised when the Infracost wait queue is full"""
+
+
+class InfracostTimeoutError(RuntimeError):
+    """Raised when an Infracost run exceeds its timeout"""
+
+
+class InfracostCancelledError(RuntimeError):
+    """Raised when a run is abandoned because the client disconnected"""
+
+
+class _ChunkPipe:
+    """
+    Bounded hand-off of stdout chunks from the event loop to a worker thread
+    """
+    def __init__(self, max_chunks: int):
+        self._chunks = deque()
+        self._max_chunks = max_chunks
+        self._closed = False
+        self._aborted = False
+        self._cond = threading.Condition()
+
+    def offer(self, chunk: bytes) -> bool:
+        """
+        Queue a chunk if there is room, without blocking
+        """
+        with self._cond:
+            if self._aborted:
+                return True
+            if len(self._chunks) >= self._max_chunks:
+                return False
+            self._chunks.append(chunk)
+            self._cond.notify_all()
+            return True
+
+    def put(self, chunk: bytes) -> None:
+        """
+        Queue a chunk, blocking until the consumer makes room
+        """
+        with self._cond:
+            while len(self._chunks) >= self._max_chunks and not self._aborted:
+                self._cond.wait()
+            if not self._aborted:
+                self._chunks.append(chunk)
+                self._cond.notify_all()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def abort(self) -> None:
+        with self._cond:
+            self._aborted = True
+            self._chunks.clear()
+            self._cond.notify_all()
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            with self._cond:
+                while not self._chunks and not self._closed and not self._aborted:
+                    self._cond.wait()
+                if self._aborted:
+                    raise InfracostCancelledError("Infracost output stream was abandoned")
+                if not self._chunks:
+                    return
+                chunk = self._chunks.popleft()
+                self._cond.notify_all()
+            yield chunk
+
+
+class InfracostRunner:
+    """
+    Runs Infracost CLI commands as asyncio subprocesses so a slow breakdown
+    never blocks the event loop.
+
+    At most ``max_concurrency`` processes run at once; up to ``max_queue``
+    further callers wait for a slot and anything beyond that is rejected
+    with InfracostBusyError.
+    """
+    def __init__(self,
+                 max_concurrency: int = 4,
+                 max_queue: int = 16,
+                 timeout: float = 300.0,
+                 poll_interval: float = 0.5):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.waiting = 0
+        self._version = None
+        # asyncio primitives are bound to a loop, so keep one semaphore per loop
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def run(self,
+                  cmd: List[str],
+                  timeout: Optional[float] = None,
+                  is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+                  consume: Optional[Callable[[Iterator[bytes]], Any]] = None) -> Any:
+        """
+        Run a command and return its stdout
+
+        Args:
+            cmd: Command line to execute
+            timeout: Seconds the process may run for (defaults to the runner timeout)
+            is_disconnected: Optional coroutine function polled while the run is
+                queued or executing; the run is cancelled once it returns True
+            consume: Optional function that reads stdout as an iterator of chunks
+                while the process runs. It is called in a worker thread and
+                stdout is never buffered whole.
+
+        Returns:
+            The raw stdout of the process, or the return value of consume
+        """
+        task = asyncio.ensure_future(self._run(cmd, timeout or self.timeout, consume))
+        if is_disconnected is None:
+            return await task
+
+        watcher = asyncio.ensure_future(self._watch(task, is_disconnected))
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if watcher.done() and not watcher.cancelled() and watcher.result():
+                raise InfracostCancelledError("Client disconnected before Infracost finished")
+            raise
+        finally:
+            watcher.cancel()
+            if not task.done():
+                task.cancel()
+
+    async def version(self) -> str:
+        """
+        Return the Infracost CLI version, memoized after the first success
+        """
+        if self._version is None:
+            try:
+                output = await self.run(["infracost", "--version"], timeout=30)
+            except (OSError, subprocess.CalledProcessError, InfracostTimeoutError):
+                return "unknown"
+            self._version = output.decode().strip()
+        return self._version
+
+    async def _watch(self,
+                     task: "asyncio.Future[bytes]",
+                     is_disconnected: Callable[[], Awaitable[bool]]) -> bool:
+        """
+        Cancel the task when the client goes away
+        """
+        while not task.done():
+            if await is_disconnected():
+                task.cancel()
+                return True
+            await asyncio.sleep(self.poll_interval)
+        return False
+
+    async def _run(self,
+                   cmd: List[str],
+                   timeout: float,
+                   consume: Optional[Callable[[Iterator[bytes]], Any]] = None) -> Any:
+        semaphore = self._semaphore()
+        if semaphore.locked():
+            if self.waiting >= self.max_queue:
+                raise InfracostBusyError("Infracost queue is full, retry later")
+            self.waiting += 1
+            try:
+                await semaphore.acquire()
+            finally:
+                self.waiting -= 1
+        else:
+            await semaphore.acquire()
+
+        try:
+            return await self._execute(cmd, timeout, consume)
+        finally:
+            semaphore.release()
+
+    async def _execute(self,
+                       cmd: List[str],
+                       timeout: float,
+                       consume: Optional[Callable[[Iterator[bytes]], Any]] = None) -> Any:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            if consume is None:
+                stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+            else:
+                consumer, stderr = await asyncio.wait_for(self._stream(proc, consume), timeout)
+        except asyncio.TimeoutError:
+            await self._kill(proc)
+            raise InfracostTimeoutError(f"Infracost did not finish within {timeout:g}s")
+        except asyncio.CancelledError:
+            await self._kill(proc)
+            raise
+
+        if consume is not None:
+            if proc.returncode != 0:
+                raise subprocess.CalledProcessError(proc.returncode, cmd, None, stderr)
+            return consumer.result()
+
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, cmd, stdout, stderr)
+        return stdout
+
+    @staticmethod
+    async def _stream(proc: asyncio.subprocess.Process,
+                      consume: Callable[[Iterator[bytes]], Any]) -> tuple:
+        """
+        Pump stdout into consume running in a worker thread
+
+        Returns:
+            The finished consumer future and the stderr output
+        """
+        pipe = _ChunkPipe(STREAM_MAX_CHUNKS)
+
+        def drain() -> Any:
+            try:
+                return consume(iter(pipe))
+            finally:
+                # Stop accepting chunks once the consumer is done, even on error
+                pipe.abort()
+
+        consumer = asyncio.ensure_future(asyncio.to_thread(drain))
+        # Retrieve the outcome even when the run is abandoned
+        consumer.add_done_callback(lambda future: future.cancelled() or future.exception())
+        stderr = asyncio.ensure_future(proc.stderr.read())
+        try:
+            while True:
+                chunk = await proc.stdout.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if not pipe.offer(chunk):
+                    await asyncio.to_thread(pipe.put, chunk)
+            pipe.close()
+            await proc.wait()
+            await asyncio.wait([consumer])
+            return consumer, await stderr
+        except BaseException:
+            pipe.abort()
+            stderr.cancel()
+            raise
+
+    @staticmethod
+    async def _kill(proc: asyncio.subprocess.Process) -> None:
+        if proc.returncode is None:
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+            await proc.wait()
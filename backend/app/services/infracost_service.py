@@ -1,18 +1,104 @@
+import asyncio
+import shutil
 import subprocess
 import json
-import os
-import zipfile
+import logging
 from pathlib import Path
-from typing import Dict, List, Any, Tuple, Optional
+from typing import Awaitable, BinaryIO, Callable, Dict, Iterable, Iterator, List, Any, Tuple, Optional
+
+from app.services.breakdown_cache import BreakdownCache
+from app.services.lru_cache import LRUCache
+from app.services.estimate_columns import ColumnarEstimate
+from app.services.estimate_component_diff import diff_components
+from app.services.estimate_diff import diff_estimates
+from app.services.estimate_pricing import PricingModel
+from app.services.estimate_query import DEFAULT_PAGE_SIZE, page_resources
+from app.services.estimate_rollups import ROLLUP_TOP_N, build_summary
+from app.services.estimate_series import compare_series
+from app.services.estimate_simulation import DEFAULT_SAMPLES, simulate
+from app.services.estimate_store import PREVIOUS_SUFFIX, EstimateStore
+from app.services.infracost_runner import InfracostBusyError, InfracostRunner, InfracostTimeoutError
+from app.services.infracost_stream import iter_resources
+from app.services.price_index import PriceIndex
+from app.services.terraform_projects import find_projects, fingerprint_project
+from app.services.tree_cache import TreeCache
+from app.services.usage_pipeline import USAGE_FILE_NAME, InFlightRuns, render_usage_file, usage_run_uid
+from app.services.zip_ingest import (
+    BASELINE_TARGET,
+    DEFAULT_MAX_ENTRIES,
+    DEFAULT_MAX_EXTRACT_BYTES,
+    ingest_zip,
+    save_stream
+)
+
+ZIP_SUFFIXES = [".zip"]
+PLAN_SUFFIXES = [".json", ".tfplan"]
+
+logger = logging.getLogger(__name__)
+
+class BaselineNotFoundError(FileNotFoundError):
+    """Raised when the baseline estimate of an incremental upload is unknown"""
+
 
 class InfracostService:
     """
     Service for handling Infracost operations and Terraform cost estimations
     """
-    def __init__(self, upload_dir: Path, api_key: str = None):
+    def __init__(self,
+                 upload_dir: Path,
+                 api_key: str = None,
+                 runner: Optional[InfracostRunner] = None,
+                 cache: Optional[BreakdownCache] = None,
+                 max_extract_bytes: int = DEFAULT_MAX_EXTRACT_BYTES,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 project_workers: int = 4,
+                 store: Optional[EstimateStore] = None,
+                 comparisons: Optional[LRUCache] = None,
+                 pricing_models: Optional[LRUCache] = None,
+                 trees: Optional[TreeCache] = None,
+                 usage_runs: Optional[InFlightRuns] = None,
+                 prices: Optional[PriceIndex] = None):
         self.upload_dir = upload_dir
         self.upload_dir.mkdir(exist_ok=True)
+        self.store = store or EstimateStore(upload_dir / "estimates.db")
         self.api_key = api_key
+        self.runner = runner or InfracostRunner()
+        self.cache = cache
+        self.max_extract_bytes = max_extract_bytes
+        self.max_entries = max_entries
+        self.project_workers = project_workers
+        self.comparisons = comparisons
+        self.pricing_models = pricing_models
+        self.trees = trees
+        self.usage_runs = usage_runs or InFlightRuns()
+        self.prices = prices
+
+    def stage_upload(self, fileobj: BinaryIO, filename: str, extract_path: Path) -> Path:
+        """
+        Write an uploaded file into its uid directory without a staging copy
+
+        Zip archives are streamed straight from the upload into a filtered
+        Terraform tree; plan files are copied as-is.
+
+        Args:
+            fileobj: Seekable file object holding the upload
+            filename: Original file name, used to detect the upload type
+            extract_path: The uid directory for this upload
+
+        Returns:
+            The path to pass to process_terraform_file: the extracted tree for
+            zip archives, the saved plan file otherwise
+        """
+        suffix = Path(filename).suffix
+        if suffix in ZIP_SUFFIXES:
+            ingest_zip(fileobj, extract_path,
+                       max_bytes=self.max_extract_bytes, max_entries=self.max_entries)
+            return extract_path
+        if suffix in PLAN_SUFFIXES:
+            plan_path = extract_path / Path(filename).name
+            save_stream(fileobj, plan_path, max_bytes=self.max_extract_bytes)
+            return plan_path
+        raise ValueError(f"Unsupported file type: {suffix}")
     
     def process_terraform_file(self, 
                              file_path: Path, 
@@ -21,128 +107,827 @@ class InfracostService:
         Process a terraform file (zip or plan) and return the cost breakdown
         
         Args:
-            file_path: Path to the uploaded file
+            file_path: Path to the uploaded file, or an already extracted tree
             extract_path: Path where to extract contents (for zip files)
             
         Returns:
             Tuple of (resources list, uid string)
         """
-        is_zip = file_path.suffix == ".zip"
-        is_plan = file_path.suffix in [".json", ".tfplan"]
+        cmd = self._prepare_command(file_path, extract_path)
+
+        # Run infracost command
+        output = subprocess.check_output(cmd)
+        return self._finish(output, extract_path)
+
+    async def process_terraform_file_async(self,
+                                           file_path: Path,
+                                           extract_path: Path,
+                                           usage_file: Optional[Path] = None,
+                                           is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+                                           on_stage: Optional[Callable[[str], None]] = None,
+                                           multi_project: bool = False,
+                                           baseline_uid: Optional[str] = None
+                                           ) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Async variant of process_terraform_file for use inside request handlers
+
+        Extraction runs in a worker thread and Infracost runs through the shared
+        runner, so the event loop stays free while the breakdown is computed.
+        When a breakdown cache is configured, identical inputs skip Infracost.
+
+        Args:
+            file_path: Path to the uploaded file, or an already extracted tree
+            extract_path: Path where to extract contents (for zip files)
+            usage_file: Optional Infracost usage file
+            is_disconnected: Optional coroutine function reporting client disconnects
+            on_stage: Optional callback invoked with "extracting", "running_infracost"
+                and "parsing" as processing moves through each stage
+            multi_project: Price every root module (or infracost.yml project)
+                of a Terraform tree as a separate project, in parallel
+            baseline_uid: Optional multi-project estimate of an earlier version
+                of the tree. Only projects whose fingerprint changed are priced;
+                the rest are copied from the baseline. Implies multi_project.
+
+        Returns:
+            Tuple of (resources list, uid string)
+        """
+        report = on_stage or (lambda stage: None)
 
-        if not (is_zip or is_plan):
+        report("extracting")
+        cmd = await asyncio.to_thread(self._prepare_command, file_path, extract_path, usage_file)
+
+        source = extract_path if file_path.suffix in ZIP_SUFFIXES else file_path
+        if baseline_uid is not None and not source.is_dir():
+            raise ValueError("Incremental estimates need a Terraform tree, not a plan file")
+        multi_project = (multi_project or baseline_uid is not None) and source.is_dir()
+
+        # Per-project fingerprints let a later upload re-price only what changed
+        projects = meta = None
+        if multi_project:
+            projects = await asyncio.to_thread(find_projects, source)
+            version = await self.runner.version()
+            fingerprints = await asyncio.to_thread(
+                self._fingerprint_projects, source, projects, usage_file, version
+            )
+            meta = {"fingerprints": fingerprints}
+
+        # Keep the tree so the estimate can be priced again without a re-upload
+        if self.trees is not None and source.is_dir():
+            tree_hash = await asyncio.to_thread(self.trees.retain, source)
+            meta = dict(meta or {}, tree=tree_hash)
+
+        if baseline_uid is not None:
+            return await self._run_incremental(
+                source, extract_path, baseline_uid, projects, meta, usage_file, is_disconnected, report
+            )
+
+        cache_key = None
+        if self.cache is not None:
+            version = await self.runner.version()
+            if multi_project:
+                version += ":multi-project"
+            cache_key = await asyncio.to_thread(self.cache.compute_key, source, usage_file, version)
+            resources = await asyncio.to_thread(self.cache.get, cache_key)
+            if resources is not None:
+                report("parsing")
+                # Cached prices were not just seen by Infracost, so they are not learned
+                await asyncio.to_thread(self._save_estimate, extract_path, resources, None, meta, False)
+                return resources, extract_path.name
+
+        report("running_infracost")
+        if multi_project:
+            data = await self._run_projects(source, usage_file, is_disconnected, projects)
+            report("parsing")
+            resources, uid = await asyncio.to_thread(self._finish_data, data, extract_path, meta)
+        else:
+            # Resources are parsed and stored as Infracost writes them out
+            resources, uid = await self.runner.run(
+                cmd,
+                is_disconnected=is_disconnected,
+                consume=lambda chunks: self._finish_stream(chunks, extract_path, meta)
+            )
+            report("parsing")
+
+        if cache_key is not None:
+            await asyncio.to_thread(self.cache.put, cache_key, resources)
+        return resources, uid
+
+    async def price_with_usage(self,
+                               uid: str,
+                               usage: Dict[str, Dict[str, Any]],
+                               is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None
+                               ) -> Dict[str, Any]:
+        """
+        Price an estimate's Terraform tree again with a usage file
+
+        The usage is rendered into an infracost-usage.yml and the breakdown is
+        re-run with --usage-file against the tree retained at upload, giving a
+        new estimate whose parent is ``uid``. The new uid is derived from the
+        tree hash, the usage file and the Infracost version, so identical
+        usage for the same tree is priced once: repeats return the stored
+        estimate and concurrent requests share the run in progress.
+
+        Args:
+            uid: Estimate whose Terraform tree to price
+            usage: Resource address -> usage parameters
+            is_disconnected: Optional coroutine function reporting client disconnects
+
+        Returns:
+            Dictionary with the new estimate's uid, its parent and whether an
+            earlier or concurrent run was reused
+        """
+        estimate = self.store.get_meta(uid)
+        if estimate is None:
+            raise FileNotFoundError(f"Estimate not found for uid: {uid}")
+        if self.trees is None:
+            raise ValueError("Terraform trees are not retained on this server")
+        tree_hash = estimate["meta"].get("tree")
+        if tree_hash is None:
+            raise ValueError(f"Estimate {uid} has no Terraform tree to price again")
+
+        body = render_usage_file(usage)
+        multi_project = "fingerprints" in estimate["meta"] or estimate["meta"].get("multi_project", False)
+        version = await self.runner.version()
+        usage_uid = usage_run_uid(tree_hash, body, salt=f"infracost:{version}:{multi_project}")
+
+        async def run(all_disconnected: Callable[[], Awaitable[bool]]) -> bool:
+            if await asyncio.to_thread(self.store.exists, usage_uid):
+                return False
+            if await asyncio.to_thread(self._price_usage_offline, uid, usage_uid, estimate, usage, multi_project):
+                return True
+            work_path = self.upload_dir / usage_uid
+            usage_file = self.upload_dir / f"{usage_uid}-{USAGE_FILE_NAME}"
+            try:
+                if not await asyncio.to_thread(self.trees.checkout, tree_hash, work_path):
+                    raise ValueError(f"The Terraform tree of estimate {uid} has expired, upload it again")
+                await asyncio.to_thread(usage_file.write_text, body)
+                await self.process_terraform_file_async(
+                    work_path,
+                    work_path,
+                    usage_file=usage_file,
+                    # Shared by every caller of this usage; cancel only once all have gone
+                    is_disconnected=all_disconnected,
+                    multi_project=multi_project
+                )
+                await asyncio.to_thread(self.store.link, usage_uid, uid, {"usage": usage})
+            finally:
+                shutil.rmtree(work_path, ignore_errors=True)
+                usage_file.unlink(missing_ok=True)
+            return True
+
+        ran, joined = await self.usage_runs.run(usage_uid, run, is_disconnected)
+        result = self.store.get_meta(usage_uid)
+        return {
+            "uid": usage_uid,
+            "parent_uid": result["parent_uid"],
+            "deduplicated": joined or not ran,
+            "offline": bool(result["meta"].get("offline")),
+            "resource_count": result["resource_count"],
+            "total_monthly_cost": result["total_monthly_cost"]
+        }
+
+    def _price_usage_offline(self,
+                             uid: str,
+                             usage_uid: str,
+                             estimate: Dict[str, Any],
+                             usage: Dict[str, Dict[str, Any]],
+                             multi_project: bool) -> bool:
+        """
+        Store the usage estimate priced from the price index alone, if every
+        component the usage drives has a fresh indexed price
+
+        Only estimates priced without usage qualify, or those whose usage is
+        fully restated by the new usage, since keys the new usage drops would
+        fall back to Infracost's defaults.
+        """
+        if self.prices is None:
+            return False
+        previous = estimate["meta"].get("usage") or {}
+        if any(not set(params) <= set(usage.get(name) or {}) for name, params in previous.items()):
+            return False
+        tree_hash = estimate["meta"]["tree"]
+        resources = self.prices.price_usage(self.iter_estimate(uid), usage, tree_hash)
+        if resources is None:
+            return False
+        self.store.save(usage_uid, resources, parent_uid=uid, meta={
+            "tree": tree_hash,
+            "usage": usage,
+            "offline": True,
+            "multi_project": multi_project
+        })
+        return True
+
+    async def refresh_prices(self, max_trees: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Re-run Infracost on the Terraform trees behind stale price index
+        entries, at most project_workers at a time, so their prices are seen
+        (and updated) again
+
+        Args:
+            max_trees: Optional cap on the trees re-run, those with the most
+                stale entries first
+
+        Returns:
+            Dictionary with the trees refreshed, those no longer cached and
+            those whose run failed, and the index stats afterwards
+        """
+        if self.prices is None:
+            raise ValueError("The price index is disabled on this server")
+        if self.trees is None:
+            raise ValueError("Terraform trees are not retained on this server")
+
+        trees = await asyncio.to_thread(self.prices.stale_trees, max_trees)
+        semaphore = asyncio.Semaphore(self.project_workers)
+        outcome = {"refreshed": [], "missing": [], "failed": []}
+
+        async def refresh(tree_hash: str) -> None:
+            work_path = self.upload_dir / f"refresh-{tree_hash}"
+            try:
+                if not await asyncio.to_thread(self.trees.checkout, tree_hash, work_path):
+                    outcome["missing"].append(tree_hash)
+                    return
+                cmd = ["infracost", "breakdown", "--path", str(work_path), "--format", "json"]
+                async with semaphore:
+                    output = await self.runner.run(cmd)
+                data = await asyncio.to_thread(json.loads, output)
+                await asyncio.to_thread(self.prices.learn, self._extract_resources(data), tree_hash)
+                outcome["refreshed"].append(tree_hash)
+            except (OSError, ValueError, subprocess.CalledProcessError,
+                    InfracostBusyError, InfracostTimeoutError) as e:
+                outcome["failed"].append({"tree": tree_hash, "error": str(e)})
+            finally:
+                shutil.rmtree(work_path, ignore_errors=True)
+
+        await asyncio.gather(*(refresh(tree_hash) for tree_hash in trees))
+        return {**outcome, "stats": await asyncio.to_thread(self.prices.stats)}
+
+    async def _run_incremental(self,
+                               tree: Path,
+                               extract_path: Path,
+                               baseline_uid: str,
+                               projects: List[Dict[str, Any]],
+                               meta: Dict[str, Any],
+                               usage_file: Optional[Path],
+                               is_disconnected: Optional[Callable[[], Awaitable[bool]]],
+                               report: Callable[[str], None]) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Price only the projects whose fingerprint differs from the baseline
+        and splice the baseline resources of the others into the new estimate
+        """
+        baseline = self.store.get_meta(baseline_uid)
+        if baseline is None:
+            raise BaselineNotFoundError(f"Estimate not found for uid: {baseline_uid}")
+        previous = baseline["meta"].get("fingerprints")
+        if not previous:
+            raise ValueError(
+                f"Estimate {baseline_uid} has no module fingerprints, upload it with multi_project=true"
+            )
+
+        fingerprints = meta["fingerprints"]
+        changed = [p for p in projects if previous.get(p["name"]) != fingerprints[p["name"]]]
+        changed_names = {p["name"] for p in changed}
+        reused = [p["name"] for p in projects if p["name"] not in changed_names]
+
+        fresh = []
+        if changed:
+            report("running_infracost")
+            data = await self._run_projects(tree, usage_file, is_disconnected, changed)
+            report("parsing")
+            self._relativize_project_names(data, extract_path)
+            fresh = self._extract_resources(data)
+            if self.prices is not None:
+                await asyncio.to_thread(self.prices.learn, fresh, meta.get("tree"))
+        else:
+            report("parsing")
+        kept = await asyncio.to_thread(self.store.get, baseline_uid, reused)
+
+        # Keep the resources grouped in project order
+        by_project = {}
+        for resource in kept + fresh:
+            by_project.setdefault(resource.get("project"), []).append(resource)
+        resources = [r for p in projects for r in by_project.get(p["name"], [])]
+
+        meta = dict(meta, incremental={
+            "rerun": [p["name"] for p in changed],
+            "reused": reused,
+            "removed": sorted(set(previous) - set(fingerprints))
+        })
+        await asyncio.to_thread(self._save_estimate, extract_path, resources, baseline_uid, meta, False)
+        return resources, extract_path.name
+
+    async def _run_projects(self,
+                            tree: Path,
+                            usage_file: Optional[Path] = None,
+                            is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+                            projects: Optional[List[Dict[str, Any]]] = None
+                            ) -> Dict[str, Any]:
+        """
+        Run one breakdown per project, at most project_workers at a time,
+        and merge them into a single Infracost output document
+        """
+        if projects is None:
+            projects = await asyncio.to_thread(find_projects, tree)
+        semaphore = asyncio.Semaphore(self.project_workers)
+
+        async def run_project(project: Dict[str, Any]) -> List[Dict[str, Any]]:
+            cmd = ["infracost", "breakdown", "--path", str(tree / project["path"]), "--format", "json"]
+            if project.get("usage_file"):
+                cmd += ["--usage-file", str(tree / project["usage_file"])]
+            elif usage_file is not None:
+                cmd += ["--usage-file", str(usage_file)]
+            for var_file in project.get("terraform_var_files", []):
+                cmd += ["--terraform-var-file", var_file]
+
+            async with semaphore:
+                output = await self.runner.run(cmd, is_disconnected=is_disconnected)
+            data = await asyncio.to_thread(json.loads, output)
+
+            results = data.get("projects") or []
+            for result in results:
+                result["name"] = project["name"]
+            return results
+
+        tasks = [asyncio.ensure_future(run_project(project)) for project in projects]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        return {"projects": [result for project_results in results for result in project_results]}
+
+    def _prepare_command(self,
+                         file_path: Path,
+                         extract_path: Path,
+                         usage_file: Optional[Path] = None) -> List[str]:
+        """
+        Validate the upload, extract zip archives and build the infracost command
+        """
+        is_tree = file_path.is_dir()
+        is_zip = file_path.suffix in ZIP_SUFFIXES
+        is_plan = file_path.suffix in PLAN_SUFFIXES
+
+        if not (is_tree or is_zip or is_plan):
             raise ValueError(f"Unsupported file type: {file_path.suffix}")
 
         if is_zip:
             self._extract_zip(file_path, extract_path)
-            cmd = ["infracost", "breakdown", "--path", str(extract_path), "--format", "json"]
+
+        if is_tree or is_zip:
+            tree_path = file_path if is_tree else extract_path
+            cmd = ["infracost", "breakdown", "--path", str(tree_path), "--format", "json"]
         else:  # is_plan
-            cmd = ["infracost", "breakdown", "--path", str(file_path), 
-                  "--terraform-plan-flags=--json", "--format", "json"]
+            cmd = ["infracost", "breakdown", "--path", str(file_path),
+                   "--terraform-plan-flags=--json", "--format", "json"]
 
-        # Run infracost command
-        output = subprocess.check_output(cmd)
+        if usage_file is not None:
+            cmd += ["--usage-file", str(usage_file)]
+        return cmd
+
+    def _finish(self, output: bytes, extract_path: Path) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Parse infracost output, then save and return the resources
+        """
         data = json.loads(output)
+        return self._finish_data(data, extract_path)
 
+    def _finish_data(self,
+                     data: Dict[str, Any],
+                     extract_path: Path,
+                     meta: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Extract, save and return the resources of parsed infracost output
+        """
         # Validate and extract resources
+        self._relativize_project_names(data, extract_path)
         resources = self._extract_resources(data)
-        
+
         # Save resources for future reference
-        self._save_estimate(extract_path, resources)
-        
+        self._save_estimate(extract_path, resources, meta=meta)
+
         return resources, extract_path.name
-    
+
+    def _finish_stream(self,
+                       chunks: Iterator[bytes],
+                       extract_path: Path,
+                       meta: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Parse streamed infracost output straight into the estimate store,
+        one resource at a time, and return the resources as they were saved
+        """
+        resources = []
+
+        def tagged() -> Iterator[Dict[str, Any]]:
+            for resource in iter_resources(chunks):
+                if "project" in resource:
+                    resource["project"] = self._relative_name(resource["project"], extract_path)
+                resources.append(resource)
+                yield resource
+
+        self._save_estimate(extract_path, tagged(), meta=meta)
+        return resources, extract_path.name
+
     def _extract_zip(self, zip_path: Path, extract_path: Path) -> None:
         """
-        Extract zip file and handle baseline estimates if present
+        Extract the Terraform files of a zip, keeping any estimate.json as the baseline
         """
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(extract_path)
-            # Check for existing estimate.json inside the ZIP and treat it as a baseline
-            if 'estimate.json' in zip_ref.namelist():
-                zip_ref.extract('estimate.json', extract_path)
-                os.rename(extract_path / 'estimate.json', extract_path / 'previous_estimate.json')
+        ingest_zip(zip_path, extract_path,
+                   max_bytes=self.max_extract_bytes, max_entries=self.max_entries)
     
     def _extract_resources(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
-        Extract resources from infracost output data
+        Extract resources from every project in infracost output data,
+        tagging each resource with the name of its project
         """
         projects = data.get("projects")
         if not projects:
             raise ValueError("No projects found in Infracost output")
 
-        breakdown = projects[0].get("breakdown")
-        if not breakdown:
+        resources = []
+        found_breakdown = False
+        for project in projects:
+            breakdown = project.get("breakdown")
+            if not breakdown:
+                continue
+            found_breakdown = True
+            name = project.get("name")
+            for resource in breakdown.get("resources") or []:
+                if name is not None:
+                    resource["project"] = name
+                resources.append(resource)
+
+        if not found_breakdown:
             raise ValueError("No cost breakdown found for the project")
 
-        return breakdown.get("resources", [])
+        return resources
+
+    @staticmethod
+    def _relativize_project_names(data: Dict[str, Any], extract_path: Path) -> None:
+        """
+        Rename projects named after the upload's working directory to their
+        path relative to it, so the same module matches across uploads
+        """
+        for project in data.get("projects") or []:
+            if project.get("name"):
+                project["name"] = InfracostService._relative_name(project["name"], extract_path)
+
+    @staticmethod
+    def _relative_name(name: str, extract_path: Path) -> str:
+        """
+        Strip the upload's working directory from a project name, if the
+        name is a path inside it
+        """
+        for prefix in (extract_path, extract_path.resolve()):
+            try:
+                return Path(name).relative_to(prefix).as_posix()
+            except ValueError:
+                continue
+        return name
+
+    @staticmethod
+    def _fingerprint_projects(tree: Path,
+                              projects: List[Dict[str, Any]],
+                              usage_file: Optional[Path],
+                              version: str) -> Dict[str, str]:
+        """
+        Fingerprint every project of a tree, keyed on project name
+        """
+        return {
+            project["name"]: fingerprint_project(tree, project, usage_file, salt=f"infracost:{version}")
+            for project in projects
+        }
+
+    @staticmethod
+    def summarize_projects(resources: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Compute per-project resource counts and monthly totals
+        """
+        groups = ColumnarEstimate.from_resources(resources).group_by("project")
+        return [
+            {"name": name, "resource_count": group["resource_count"], "monthlyCost": round(group["monthlyCost"], 2)}
+            for name, group in groups.items()
+        ]
     
-    def _save_estimate(self, path: Path, resources: List[Dict[str, Any]]) -> None:
+    def _save_estimate(self,
+                       path: Path,
+                       resources: Iterable[Dict[str, Any]],
+                       parent_uid: Optional[str] = None,
+                       meta: Optional[Dict[str, Any]] = None,
+                       learn_prices: bool = True) -> Dict[str, Any]:
         """
-        Save resources to estimate.json file
+        Save resources to the estimate store under the uid of their directory,
+        along with any baseline estimate.json that came with the upload.
+        Unless told otherwise, the prices are learned into the price index
+        as the resources stream past.
+
+        Returns:
+            The stored estimate row with its rollups, see EstimateStore.save
         """
-        with open(path / "estimate.json", "w") as f:
-            json.dump(resources, f, indent=2)
+        uid = path.name
+        observed = {}
+        if self.prices is not None and learn_prices:
+            resources = self.prices.observe(resources, observed)
+        saved = self.store.save(uid, resources, parent_uid=parent_uid, meta=meta)
+        if observed:
+            self.prices.record(observed, tree=(meta or {}).get("tree"))
+
+        previous_path = path / BASELINE_TARGET
+        if previous_path.exists():
+            self._save_baseline(uid, previous_path)
+
+        # Expired estimates take any leftover working directory with them
+        for expired_uid in self.store.maybe_purge():
+            if not expired_uid.endswith(PREVIOUS_SUFFIX):
+                shutil.rmtree(self.upload_dir / expired_uid, ignore_errors=True)
+        return saved
     
+    def _save_baseline(self, uid: str, previous_path: Path) -> None:
+        """
+        Save the estimate.json of an upload as its baseline estimate, taking
+        either a list of resources or Infracost output. A baseline that is
+        neither is skipped with a warning and never fails the upload.
+        """
+        try:
+            with open(previous_path) as f:
+                previous = json.load(f)
+            if isinstance(previous, dict):
+                previous = self._extract_resources(previous)
+            if not isinstance(previous, list) or not all(isinstance(r, dict) for r in previous):
+                raise ValueError("expected a list of resources or Infracost output")
+            self.store.save(uid + PREVIOUS_SUFFIX, previous, parent_uid=uid, meta={"kind": "baseline"})
+        except (OSError, ValueError) as e:
+            logger.warning("Skipping baseline estimate of %s: %s", uid, e)
+
     def get_estimate(self, uid: str) -> List[Dict[str, Any]]:
         """
         Get saved estimate by uid
         """
-        path = self.upload_dir / uid / "estimate.json"
-        if not path.exists():
+        resources = self.store.get(uid)
+        if resources is None:
             raise FileNotFoundError(f"Estimate not found for uid: {uid}")
-            
-        with open(path) as f:
-            return json.load(f)
-    
-    def compare_estimates(self, 
-                        baseline_uid: str, 
-                        proposed_uid: str) -> Dict[str, List[Dict[str, Any]]]:
+        return resources
+
+    def iter_estimate(self, uid: str) -> Iterator[Dict[str, Any]]:
         """
-        Compare two estimates and return the differences
+        Stream a saved estimate's resources without loading them all at once
         """
-        base_path = self.upload_dir / baseline_uid / "estimate.json"
-        prop_path = self.upload_dir / proposed_uid / "estimate.json"
-        
-        if not base_path.exists() or not prop_path.exists():
-            raise FileNotFoundError("One or both estimates not found")
-
-        with open(base_path) as f:
-            base_data = {r["name"]: r for r in json.load(f)}
-        with open(prop_path) as f:
-            prop_data = {r["name"]: r for r in json.load(f)}
-
-        diff = {
-            "increased": [],
-            "decreased": [],
-            "unchanged": [],
-            "added": [],
-            "removed": []
+        if not self.store.exists(uid):
+            raise FileNotFoundError(f"Estimate not found for uid: {uid}")
+        return (json.loads(raw) for raw in self.store.iter_raw(uid))
+
+    def get_estimate_columns(self, uid: str) -> ColumnarEstimate:
+        """
+        Get a saved estimate in columnar form; details are loaded on demand
+        """
+        rows = self.store.get_columns(uid)
+        if rows is None:
+            raise FileNotFoundError(f"Estimate not found for uid: {uid}")
+        return ColumnarEstimate.from_rows(rows, uid=uid, loader=lambda indices: self.store.get_rows(uid, indices))
+
+    def get_estimate_meta(self, uid: str) -> Dict[str, Any]:
+        """
+        Get the stored metadata of an estimate by uid
+        """
+        meta = self.store.get_meta(uid)
+        if meta is None:
+            raise FileNotFoundError(f"Estimate not found for uid: {uid}")
+        return meta
+
+    def estimate_version(self, *uids: str) -> str:
+        """
+        Identify the stored version of one or more estimates
+
+        Estimates are not modified once saved; the version changes when a
+        uid is saved again, which happens to derived estimates (usage runs)
+        saved anew after they expired.
+
+        Raises:
+            FileNotFoundError: If any of the estimates is unknown
+        """
+        versions = []
+        for uid in uids:
+            meta = self.store.get_meta(uid)
+            if meta is None:
+                raise FileNotFoundError(f"Estimate not found for uid: {uid}")
+            versions.append(f"{uid}@{meta['created_at']!r}")
+        return ",".join(versions)
+
+    def _memoized(self, kind: str, uids: List[str], options: Tuple[Any, ...], compute: Callable[[], Any]) -> Any:
+        """
+        Run a comparison through the comparison cache, keyed on the versions
+        of the compared estimates
+        """
+        if self.comparisons is None:
+            return compute()
+        try:
+            version = self.estimate_version(*uids)
+        except FileNotFoundError:
+            # Let the comparison report the missing estimate
+            return compute()
+        return self.comparisons.get_or_compute((kind, version, options), compute)
+
+    def get_estimate_summary(self, uid: str, top: int = 5) -> Dict[str, Any]:
+        """
+        Get the totals of an estimate per resource type, provider, module and
+        project, as rolled up when it was saved
+
+        Args:
+            uid: Estimate identifier
+            top: Number of most expensive resources to list per group
+
+        Returns:
+            Dictionary with the estimate totals and its groups
+        """
+        if not 0 <= top <= ROLLUP_TOP_N:
+            raise ValueError(f"top must be between 0 and {ROLLUP_TOP_N}")
+        estimate = self.store.get_meta(uid)
+        rows = self.store.get_rollups(uid)
+        if estimate is None or rows is None:
+            raise FileNotFoundError(f"Estimate not found for uid: {uid}")
+        return build_summary(estimate, rows, top)
+
+    def list_resources(self,
+                       uid: str,
+                       resource_types: Optional[List[str]] = None,
+                       name_prefix: Optional[str] = None,
+                       min_cost: Optional[float] = None,
+                       max_cost: Optional[float] = None,
+                       sort: Optional[str] = None,
+                       fields: Optional[str] = None,
+                       limit: int = DEFAULT_PAGE_SIZE,
+                       cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get one filtered, sorted page of an estimate's resources
+
+        See estimate_query.page_resources for the arguments.
+        """
+        page = page_resources(
+            self.store,
+            uid,
+            resource_types=resource_types,
+            name_prefix=name_prefix,
+            min_cost=min_cost,
+            max_cost=max_cost,
+            sort=sort,
+            fields=fields,
+            limit=limit,
+            cursor=cursor
+        )
+        if page is None:
+            raise FileNotFoundError(f"Estimate not found for uid: {uid}")
+        return page
+
+    def get_pricing_model(self, uid: str) -> PricingModel:
+        """
+        Get the cost components of an estimate as a pricing model, kept in
+        memory between calls when a model cache is configured
+        """
+        version = self.estimate_version(uid)
+
+        def build() -> PricingModel:
+            return PricingModel(self.iter_estimate(uid))
+
+        if self.pricing_models is None:
+            return build()
+        return self.pricing_models.get_or_compute(("pricing", version), build)
+
+    def reprice(self, uid: str, overrides: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Recompute an estimate's costs with usage overrides, without Infracost
+
+        Args:
+            uid: Estimate identifier
+            overrides: Usage overrides, see PricingModel.compile
+
+        Returns:
+            Dictionary with the base and repriced totals and the resources
+            whose cost changed
+        """
+        return {"uid": uid, **self.get_pricing_model(uid).reprice(overrides)}
+
+    def simulate(self,
+                 uid: str,
+                 ranges: Dict[str, Dict[str, Any]],
+                 samples: int = DEFAULT_SAMPLES,
+                 seed: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Simulate an estimate's monthly cost under ranges of usage
+
+        Args:
+            uid: Estimate identifier
+            ranges: Resource name -> usage key -> range, in the shape
+                UsageService.generate_usage_from_answers returns point values
+            samples: Number of draws
+            seed: Optional seed for reproducible results
+
+        Returns:
+            Dictionary with P10/P50/P90 monthly totals overall and per
+            simulated resource
+        """
+        return {"uid": uid, **simulate(self.get_pricing_model(uid), ranges, samples=samples, seed=seed)}
+
+    def compare_adjusted(self, uid: str, current: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Compare client-adjusted resources with the baseline uploaded alongside
+        an estimate, matching resources by name
+
+        Only the baseline's name and cost columns are read; full baseline
+        resources are loaded just for the ones that were removed.
+        """
+        previous_uid = uid + PREVIOUS_SUFFIX
+        rows = self.store.get_columns(previous_uid)
+        if rows is None:
+            raise FileNotFoundError(f"No previous estimate for uid: {uid}")
+        previous = ColumnarEstimate.from_rows(
+            rows, uid=previous_uid, loader=lambda indices: self.store.get_rows(previous_uid, indices)
+        )
+        adjusted = ColumnarEstimate.from_resources(current)
+
+        previous_index = {name: i for i, name in enumerate(previous.names)}
+        current_index = {name: i for i, name in enumerate(adjusted.names)}
+
+        changed = []
+        for name, i in current_index.items():
+            j = previous_index.get(name)
+            if j is not None and adjusted.cost(i) != previous.cost(j):
+                changed.append({"name": name, "from": previous.cost(j), "to": adjusted.cost(i)})
+
+        return {
+            "added": [current[i] for name, i in current_index.items() if name not in previous_index],
+            "removed": previous.materialize(
+                i for name, i in previous_index.items() if name not in current_index
+            ),
+            "changed": changed,
+            "current_total": adjusted.total(),
+            "previous_total": previous.total()
         }
 
-        # Find changes in proposed compared to baseline
-        for name, r in prop_data.items():
-            old = base_data.get(name)
-            new_cost = float(r.get("monthlyCost") or 0)
-            if old:
-                old_cost = float(old.get("monthlyCost") or 0)
-                delta = new_cost - old_cost
-                r["delta"] = round(delta, 2)
-                if delta > 0:
-                    diff["increased"].append(r)
-                elif delta < 0:
-                    diff["decreased"].append(r)
-                else:
-                    diff["unchanged"].append(r)
-            else:
-                r["delta"] = new_cost
-                diff["added"].append(r)
-
-        # Find removed resources
-        for name, r in base_data.items():
-            if name not in prop_data:
-                removed = r.copy()
-                removed["delta"] = -float(r.get("monthlyCost") or 0)
-                diff["removed"].append(removed)
-
-        return diff
+    def compare_estimates(self,
+                          baseline_uid: str,
+                          proposed_uid: str,
+                          details: bool = True) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Compare two estimates and return the differences
+
+        Resources are matched on (project, name), so identically named
+        resources in different projects or repeated within one are kept apart.
+
+        Args:
+            baseline_uid: Estimate to compare against
+            proposed_uid: Estimate to compare
+            details: Return full resources rather than name, project, type and cost
+
+        Returns:
+            Resources grouped into increased, decreased, unchanged, added and
+            removed, each with a monthly cost ``delta``
+        """
+        def compute() -> Dict[str, List[Dict[str, Any]]]:
+            try:
+                base = self.get_estimate_columns(baseline_uid)
+                proposed = self.get_estimate_columns(proposed_uid)
+            except FileNotFoundError:
+                raise FileNotFoundError("One or both estimates not found")
+            return diff_estimates(base, proposed).to_dict(details=details)
+
+        return self._memoized("resources", [baseline_uid, proposed_uid], (details,), compute)
+
+    def compare_components(self, baseline_uid: str, proposed_uid: str) -> Dict[str, Any]:
+        """
+        Compare two estimates down to their cost components
+
+        Resources are matched as in compare_estimates, then their cost
+        components and subresources are paired on name, so price changes can
+        be told apart from usage changes.
+
+        Returns:
+            Dictionary with the totals and a delta tree per changed resource
+        """
+        def compute() -> Dict[str, Any]:
+            try:
+                base = self.get_estimate_columns(baseline_uid)
+                proposed = self.get_estimate_columns(proposed_uid)
+            except FileNotFoundError:
+                raise FileNotFoundError("One or both estimates not found")
+            return diff_components(diff_estimates(base, proposed))
+
+        return self._memoized("components", [baseline_uid, proposed_uid], (), compute)
+
+    def compare_series(self, uids: List[str], changed_only: bool = False) -> Dict[str, Any]:
+        """
+        Compare an ordered series of estimates, e.g. one per commit
+
+        Args:
+            uids: Estimate identifiers in series order
+            changed_only: Leave out resources whose cost never changes
+
+        Returns:
+            Dictionary with the total per estimate, a summary per step and a
+            cost matrix with one row per resource
+        """
+        missing = [uid for uid in uids if not self.store.exists(uid)]
+        if missing:
+            raise FileNotFoundError(f"Estimates not found: {', '.join(missing)}")
+        return self._memoized("series", uids, (changed_only,), lambda: compare_series(
+            [self.get_estimate_columns(uid) for uid in uids], changed_only=changed_only
+        ))
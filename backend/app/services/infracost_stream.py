@@ -0,0 +1,292 @@
+import codecs
+import json
+import re
+from json.decoder import scanstring
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+_WHITESPACE_RE = re.compile(r"[ \t\n\r]*")
+_STRING_RE = re.compile(r'"(?:[^"\\]|\\.)*"', re.S)
+_SCALAR_RE = re.compile(r"-?[0-9][0-9.eE+\-]*|true|false|null")
+_STRUCTURE_RE = re.compile(r'["{}\[\]]')
+
+# Container frames on the parser stack
+_OBJECT = "{"
+_ARRAY = "["
+
+
+class ResourceStreamParser:
+    """
+    Incremental parser for ``infracost breakdown --format json`` output
+
+    Only ``projects[].name`` and ``projects[].breakdown.resources[]`` are
+    decoded; each resource is decoded on its own as soon as it is complete and
+    everything else is skipped, so memory stays bounded by the largest single
+    resource rather than the whole document. Feed it chunks of stdout as they
+    arrive and call close() once the stream ends.
+    """
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        # Each frame is [kind, key or index, state]
+        self._stack: List[List[Any]] = []
+        self._skip_depth = 0
+        self._started = False
+        self._done = False
+        self._projects = 0
+        self._found_breakdown = False
+        self._project_named = False
+        self._project_name: Optional[str] = None
+        self._pending: List[Dict[str, Any]] = []
+
+    def feed(self, data: bytes) -> List[Dict[str, Any]]:
+        """
+        Consume a chunk of output and return the resources it completed
+        """
+        return self._consume(self._decoder.decode(data), final=False)
+
+    def close(self) -> List[Dict[str, Any]]:
+        """
+        Finish the stream, returning any remaining resources
+
+        Raises:
+            ValueError: If the output is truncated or has no priced project,
+                with the same messages as the in-memory extraction
+        """
+        resources = self._consume(self._decoder.decode(b"", final=True), final=True)
+        if not self._done:
+            raise ValueError("Infracost output ended unexpectedly")
+        if not self._projects:
+            raise ValueError("No projects found in Infracost output")
+        if not self._found_breakdown:
+            raise ValueError("No cost breakdown found for the project")
+        return resources
+
+    def _consume(self, text: str, final: bool) -> List[Dict[str, Any]]:
+        self._buf = self._buf[self._pos:] + text
+        self._pos = 0
+        out = []
+        while self._step(out, final):
+            pass
+        return out
+
+    def _path(self) -> tuple:
+        return tuple(frame[1] for frame in self._stack)
+
+    def _step(self, out: List[Dict[str, Any]], final: bool) -> bool:
+        """
+        Advance past one token, returning False when more input is needed
+        """
+        if self._skip_depth:
+            return self._skip_container()
+
+        buf = self._buf
+        pos = _WHITESPACE_RE.match(buf, self._pos).end()
+        self._pos = pos
+        if pos >= len(buf) or self._done:
+            return False
+        char = buf[pos]
+
+        if not self._stack:
+            if self._started:
+                return False
+            self._started = True
+            return self._value(out, final)
+
+        frame = self._stack[-1]
+        kind, state = frame[0], frame[2]
+
+        if state in ("first", "comma") and char in "}]":
+            if char != ("}" if kind == _OBJECT else "]"):
+                raise json.JSONDecodeError("Mismatched closing bracket", buf, pos)
+            self._pos = pos + 1
+            self._close_container(out)
+            return True
+
+        if state == "comma":
+            if char != ",":
+                raise json.JSONDecodeError("Expecting ',' delimiter", buf, pos)
+            self._pos = pos + 1
+            frame[2] = "key" if kind == _OBJECT else "value"
+            if kind == _ARRAY:
+                frame[1] += 1
+            return True
+
+        if kind == _ARRAY:
+            if state == "first":
+                frame[1] = 0
+                frame[2] = "value"
+            return self._value(out, final)
+
+        if state in ("first", "key"):
+            if char != '"':
+                raise json.JSONDecodeError("Expecting property name enclosed in double quotes", buf, pos)
+            if not _STRING_RE.match(buf, pos):
+                return self._need_more(final)
+            key, self._pos = scanstring(buf, pos + 1)
+            frame[1] = key
+            frame[2] = "colon"
+            if len(self._stack) == 4 and self._stack[0][1] == "projects" and self._stack[2][1] == "breakdown":
+                self._found_breakdown = True
+            return True
+
+        if state == "colon":
+            if char != ":":
+                raise json.JSONDecodeError("Expecting ':' delimiter", buf, pos)
+            self._pos = pos + 1
+            frame[2] = "value"
+            return True
+
+        return self._value(out, final)
+
+    def _value(self, out: List[Dict[str, Any]], final: bool) -> bool:
+        """
+        Handle the value starting at the current position
+        """
+        buf, pos = self._buf, self._pos
+        char = buf[pos]
+        path = self._path()
+        depth = len(path)
+
+        if depth == 5 and path[0] == "projects" and path[2:4] == ("breakdown", "resources"):
+            try:
+                resource, end = self._json.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                return self._need_more(final)
+            self._pos = end
+            self._emit(resource, out)
+            self._value_done()
+            return True
+
+        if depth == 3 and path[0] == "projects" and path[2] == "name":
+            if char == '"':
+                if not _STRING_RE.match(buf, pos):
+                    return self._need_more(final)
+                name, self._pos = scanstring(buf, pos + 1)
+            else:
+                if not self._skip_scalar(final):
+                    return False
+                name = None
+            self._name_project(name, out)
+            self._value_done()
+            return True
+
+        interesting = (
+            depth == 0
+            or path == ("projects",)
+            or (depth == 2 and path[0] == "projects")
+            or (depth == 3 and path[0] == "projects" and path[2] == "breakdown")
+            or (depth == 4 and path[0] == "projects" and path[2:] == ("breakdown", "resources"))
+        )
+        if interesting and char in "{[":
+            kind = _OBJECT if char == "{" else _ARRAY
+            self._pos = pos + 1
+            self._stack.append([kind, None, "first"])
+            if depth == 2:
+                self._projects += 1
+                self._project_named = False
+                self._project_name = None
+            return True
+
+        return self._skip_value(final)
+
+    def _skip_value(self, final: bool) -> bool:
+        buf, pos = self._buf, self._pos
+        char = buf[pos]
+        if char in "{[":
+            self._pos = pos + 1
+            self._skip_depth = 1
+            return True
+        if char == '"':
+            match = _STRING_RE.match(buf, pos)
+            if not match:
+                return self._need_more(final)
+            self._pos = match.end()
+        elif not self._skip_scalar(final):
+            return False
+        self._value_done()
+        return True
+
+    def _skip_scalar(self, final: bool) -> bool:
+        match = _SCALAR_RE.match(self._buf, self._pos)
+        if not match:
+            if not final and len(self._buf) - self._pos < 5:
+                return False
+            raise json.JSONDecodeError("Expecting value", self._buf, self._pos)
+        if match.end() == len(self._buf) and not final:
+            # The number (or literal) may continue in the next chunk
+            return False
+        self._pos = match.end()
+        return True
+
+    def _skip_container(self) -> bool:
+        """
+        Skip the rest of an uninteresting object or array
+        """
+        buf = self._buf
+        while self._skip_depth:
+            match = _STRUCTURE_RE.search(buf, self._pos)
+            if not match:
+                self._pos = len(buf)
+                return False
+            char = match.group()
+            if char == '"':
+                string = _STRING_RE.match(buf, match.start())
+                if not string:
+                    self._pos = match.start()
+                    return False
+                self._pos = string.end()
+                continue
+            self._pos = match.end()
+            self._skip_depth += 1 if char in "{[" else -1
+        self._value_done()
+        return True
+
+    def _close_container(self, out: List[Dict[str, Any]]) -> None:
+        self._stack.pop()
+        if len(self._stack) == 2 and self._stack[0][1] == "projects" and not self._project_named:
+            # End of a project without a name: release its resources untagged
+            out.extend(self._pending)
+            self._pending.clear()
+        self._value_done()
+
+    def _value_done(self) -> None:
+        if self._stack:
+            self._stack[-1][2] = "comma"
+        else:
+            self._done = True
+
+    def _emit(self, resource: Dict[str, Any], out: List[Dict[str, Any]]) -> None:
+        if self._project_named:
+            if self._project_name is not None:
+                resource["project"] = self._project_name
+            out.append(resource)
+        else:
+            # Hold back resources until the project name is known
+            self._pending.append(resource)
+
+    def _name_project(self, name: Optional[str], out: List[Dict[str, Any]]) -> None:
+        self._project_named = True
+        self._project_name = name
+        for resource in self._pending:
+            if name is not None:
+                resource["project"] = name
+            out.append(resource)
+        self._pending.clear()
+
+    def _need_more(self, final: bool) -> bool:
+        if final:
+            raise ValueError("Infracost output ended unexpectedly")
+        return False
+
+
+def iter_resources(chunks: Iterable[bytes]) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the resources of every project from chunks of Infracost JSON output,
+    tagging each with the name of its project
+    """
+    parser = ResourceStreamParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
@@ -0,0 +1,223 @@
+import asyncio
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from enum import Enum
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+
+class JobState(str, Enum):
+    """
+    Stages an estimate job moves through
+    """
+    QUEUED = "queued"
+    EXTRACTING = "extracting"
+    RUNNING_INFRACOST = "running_infracost"
+    PARSING = "parsing"
+    DONE = "done"
+    FAILED = "failed"
+
+
+TERMINAL_STATES = {JobState.DONE, JobState.FAILED}
+
+
+class JobManager:
+    """
+    Tracks long-running estimate jobs and fans out stage transitions
+
+    Job ids are the uid directories under the upload dir. Each update is also
+    written to ``job.json`` in that directory so the state can be read by
+    other workers and after a restart. Once a job has run, release() leaves
+    only ``job.json`` in its directory; with ``retention_seconds`` set, the
+    directory of a finished or failed job is removed that long after its
+    last update.
+    """
+    def __init__(self,
+                 upload_dir: Path,
+                 max_jobs: int = 1000,
+                 poll_interval: float = 1.0,
+                 retention_seconds: Optional[float] = None,
+                 purge_interval: float = 60.0):
+        self.upload_dir = upload_dir
+        self.max_jobs = max_jobs
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self.purge_interval = purge_interval
+        self._last_purge = 0.0
+        self._jobs = OrderedDict()
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id: str, filename: str) -> Dict[str, Any]:
+        """
+        Register a new job in the queued state
+        """
+        now = time.time()
+        job = {
+            "id": job_id,
+            "filename": filename,
+            "state": JobState.QUEUED.value,
+            "created_at": now,
+            "updated_at": now,
+            "error": None,
+            "resource_count": None
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._trim()
+        self._persist(job)
+        self.maybe_purge()
+        return dict(job)
+
+    def update(self, job_id: str, state: JobState, **fields: Any) -> Dict[str, Any]:
+        """
+        Move a job to a new state and notify subscribers
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                job = self._load(job_id) or {"id": job_id}
+                self._jobs[job_id] = job
+            job.update(fields)
+            job["state"] = JobState(state).value
+            job["updated_at"] = time.time()
+            snapshot = dict(job)
+            queues = list(self._subscribers.get(job_id, []))
+
+        self._persist(snapshot)
+        for queue in queues:
+            queue.put_nowait(snapshot)
+        return snapshot
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the current job state, falling back to the persisted copy
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job)
+        return self._load(job_id)
+
+    async def events(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield the current state and every later transition until the job
+        reaches a terminal state
+        """
+        queue = asyncio.Queue()
+        with self._lock:
+            local = job_id in self._jobs
+            if local:
+                self._subscribers.setdefault(job_id, []).append(queue)
+
+        try:
+            job = self.get(job_id)
+            if job is None:
+                return
+            yield job
+            last_state = job["state"]
+
+            while JobState(last_state) not in TERMINAL_STATES:
+                if local:
+                    job = await queue.get()
+                else:
+                    # Job is owned by another worker, follow its job.json
+                    await asyncio.sleep(self.poll_interval)
+                    job = self._load(job_id)
+                    if job is None or job["state"] == last_state:
+                        continue
+                yield job
+                last_state = job["state"]
+        finally:
+            with self._lock:
+                queues = self._subscribers.get(job_id, [])
+                if queue in queues:
+                    queues.remove(queue)
+                if not queues:
+                    self._subscribers.pop(job_id, None)
+
+    def release(self, job_id: str) -> None:
+        """
+        Remove the files a job ran on, keeping its job.json
+        """
+        job_dir = self._job_path(job_id).parent
+        if job_dir.parent != self.upload_dir or not job_dir.is_dir():
+            return
+        for path in job_dir.iterdir():
+            if path.name == "job.json":
+                continue
+            if path.is_dir() and not path.is_symlink():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+
+    def purge_expired(self, now: Optional[float] = None) -> List[str]:
+        """
+        Delete the directories of finished and failed jobs last updated more
+        than retention_seconds ago
+
+        Returns:
+            The job ids that were removed
+        """
+        now = time.time() if now is None else now
+        self._last_purge = now
+        if not self.retention_seconds:
+            return []
+        removed = []
+        for path in self.upload_dir.glob("*/job.json"):
+            job = self._load(path.parent.name)
+            if job is None or job.get("state") not in {state.value for state in TERMINAL_STATES}:
+                continue
+            if now - job.get("updated_at", now) < self.retention_seconds:
+                continue
+            shutil.rmtree(path.parent, ignore_errors=True)
+            with self._lock:
+                self._jobs.pop(job["id"], None)
+            removed.append(job["id"])
+        return removed
+
+    def maybe_purge(self) -> List[str]:
+        """
+        Run purge_expired at most once per purge_interval
+        """
+        if not self.retention_seconds or time.time() - self._last_purge < self.purge_interval:
+            return []
+        return self.purge_expired()
+
+    def _trim(self) -> None:
+        """
+        Drop the oldest finished jobs from memory once over capacity
+        """
+        if len(self._jobs) <= self.max_jobs:
+            return
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.max_jobs:
+                break
+            if JobState(self._jobs[job_id]["state"]) in TERMINAL_STATES:
+                del self._jobs[job_id]
+
+    def _job_path(self, job_id: str) -> Path:
+        return self.upload_dir / job_id / "job.json"
+
+    def _persist(self, job: Dict[str, Any]) -> None:
+        path = self._job_path(job["id"])
+        if not path.parent.exists():
+            return
+        tmp_path = path.with_suffix(".json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(job, f)
+        os.replace(tmp_path, path)
+
+    def _load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        path = self._job_path(job_id)
+        if path.parent.parent != self.upload_dir or not path.exists():
+            return None
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
@@ -0,0 +1,287 @@
+import copy
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.services.estimate_simulation import USAGE_KEY_COMPONENTS, drives, tiered, unit_scale
+from app.services.estimate_store import monthly_cost_of, resource_type_of
+from app.services.usage_parser import HOURS_PER_MONTH
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prices (
+    resource_type TEXT NOT NULL,
+    fingerprint BLOB NOT NULL,
+    unit TEXT,
+    price REAL NOT NULL,
+    observed_at REAL NOT NULL,
+    changed_at REAL NOT NULL,
+    tree TEXT,
+    PRIMARY KEY (resource_type, fingerprint)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_prices_observed_at ON prices(observed_at);
+"""
+
+# Prices not seen in an Infracost run for this long are stale
+DEFAULT_MAX_AGE_SECONDS = 7 * 86400
+
+PriceKey = Tuple[str, bytes]
+
+
+def component_fingerprint(path: str, component: Dict[str, Any], region: Optional[str]) -> bytes:
+    """
+    Fingerprint the attributes a cost component's unit price depends on
+
+    Infracost spells the priced attributes (operating system, purchase option,
+    instance type and so on) into the component name, so the name, unit,
+    subresource path and region identify the price within a resource type.
+
+    Returns:
+        8-byte digest
+    """
+    parts = (path, component.get("name") or "", component.get("unit") or "", region or "")
+    return hashlib.blake2b("\0".join(parts).encode(), digest_size=8).digest()
+
+
+def _region(resource: Dict[str, Any]) -> Optional[str]:
+    return (resource.get("metadata") or {}).get("region")
+
+
+def _components(resource: Dict[str, Any], path: str = "") -> Iterator[Tuple[str, Dict[str, Any]]]:
+    for component in resource.get("costComponents") or []:
+        yield path, component
+    for subresource in resource.get("subresources") or []:
+        yield from _components(subresource, f"{path}/{subresource.get('name') or ''}")
+
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _decimal(value: float) -> str:
+    # Infracost writes quantities and costs as decimal strings
+    return format(value, ".10g")
+
+
+class PriceIndex:
+    """
+    Local index of unit prices learned from Infracost output
+
+    Every priced cost component of every estimate is recorded under its
+    resource type and an 8-byte attribute fingerprint, with the time it was
+    last seen and the Terraform tree it was seen in. Entries older than
+    ``max_age_seconds`` are stale: they are not used for pricing until a
+    refresh sees them again.
+
+    When the region of a resource is unknown the fingerprint cannot tell
+    regions apart, so such entries are only trusted for the tree that
+    produced them.
+    """
+    def __init__(self, db_path: Path, max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS):
+        self.db_path = db_path
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def observe(resources: Iterable[Dict[str, Any]],
+                observed: Dict[PriceKey, Tuple[Optional[str], float]]) -> Iterator[Dict[str, Any]]:
+        """
+        Pass resources through unchanged, collecting the price of every
+        priced component into ``observed`` on the way
+
+        This lets prices be learned while an estimate streams into the store,
+        without a second pass over the resources.
+        """
+        # Large estimates repeat the same few components many times over
+        fingerprints: Dict[Tuple[str, Any, Any, Optional[str]], bytes] = {}
+        for resource in resources:
+            resource_type = resource_type_of(resource)
+            if resource_type is not None:
+                region = _region(resource)
+                for path, component in _components(resource):
+                    price = _number(component.get("price"))
+                    if price is None:
+                        continue
+                    attributes = (path, component.get("name"), component.get("unit"), region)
+                    fingerprint = fingerprints.get(attributes)
+                    if fingerprint is None:
+                        fingerprint = fingerprints[attributes] = component_fingerprint(path, component, region)
+                    observed[(resource_type, fingerprint)] = (component.get("unit"), price)
+            yield resource
+
+    def record(self,
+               observed: Dict[PriceKey, Tuple[Optional[str], float]],
+               tree: Optional[str] = None,
+               observed_at: Optional[float] = None) -> int:
+        """
+        Upsert observed prices, tracking when each price last changed
+
+        Args:
+            observed: (resource type, fingerprint) -> (unit, price)
+            tree: Hash of the Terraform tree the prices were seen in
+            observed_at: Observation time, defaults to now
+
+        Returns:
+            Number of entries written
+        """
+        now = time.time() if observed_at is None else observed_at
+        rows = [
+            (resource_type, fingerprint, unit, price, now, now, tree)
+            for (resource_type, fingerprint), (unit, price) in observed.items()
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO prices (resource_type, fingerprint, unit, price, observed_at, changed_at, tree) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (resource_type, fingerprint) DO UPDATE SET "
+                    "unit = excluded.unit, "
+                    "changed_at = CASE WHEN price = excluded.price THEN changed_at ELSE excluded.observed_at END, "
+                    "price = excluded.price, "
+                    "observed_at = excluded.observed_at, "
+                    "tree = COALESCE(excluded.tree, tree)",
+                    rows
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def learn(self, resources: Iterable[Dict[str, Any]], tree: Optional[str] = None) -> int:
+        """
+        Record the prices of a list of resources
+        """
+        observed: Dict[PriceKey, Tuple[Optional[str], float]] = {}
+        for _ in self.observe(resources, observed):
+            pass
+        return self.record(observed, tree)
+
+    def lookup(self, resource_type: str, fingerprint: bytes, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Return the indexed price of a component, or None if it was never seen
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT unit, price, observed_at, changed_at, tree FROM prices "
+                "WHERE resource_type = ? AND fingerprint = ?",
+                (resource_type, fingerprint)
+            ).fetchone()
+        if row is None:
+            return None
+        now = time.time() if now is None else now
+        return {
+            "unit": row[0],
+            "price": row[1],
+            "observed_at": row[2],
+            "changed_at": row[3],
+            "tree": row[4],
+            "stale": now - row[2] > self.max_age_seconds
+        }
+
+    def price_usage(self,
+                    resources: Iterable[Dict[str, Any]],
+                    usage: Dict[str, Dict[str, Any]],
+                    tree: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Apply usage to priced resources using only indexed prices
+
+        Each usage key sets the monthly quantity of the one component it
+        drives (see estimate_simulation.USAGE_KEY_COMPONENTS), priced at its
+        fresh indexed unit price. Other components keep their cost.
+
+        Args:
+            resources: Resources of an estimate of the same Terraform tree
+            usage: Resource address -> usage parameters
+            tree: Hash of that tree
+
+        Returns:
+            The re-priced resources, or None if any usage key is unknown,
+            matches no component, several components or a price tier, or
+            its component has no fresh price, in which case Infracost has
+            to run
+        """
+        now = time.time()
+        priced = []
+        for resource in resources:
+            params = usage.get(resource.get("name"))
+            if not params:
+                priced.append(resource)
+                continue
+            resource = copy.deepcopy(resource)
+            resource_type = resource_type_of(resource)
+            region = _region(resource)
+            delta = 0.0
+            for key, value in params.items():
+                quantity = _number(value)
+                if key not in USAGE_KEY_COMPONENTS or quantity is None or resource_type is None:
+                    return None
+                driven = [
+                    (path, component) for path, component in _components(resource)
+                    if drives(key, component.get("name"), component.get("unit"))
+                ]
+                # Which of several matching components (or tiers) a quantity
+                # belongs to is Infracost's call
+                if len(driven) != 1 or tiered(driven[0][1].get("name")):
+                    return None
+                for path, component in driven:
+                    entry = self.lookup(resource_type, component_fingerprint(path, component, region), now)
+                    if entry is None or entry["stale"] or (region is None and entry["tree"] != tree):
+                        return None
+                    monthly_quantity = quantity / unit_scale(component.get("unit"))
+                    monthly_cost = entry["price"] * monthly_quantity
+                    delta += monthly_cost - (_number(component.get("monthlyCost")) or 0.0)
+                    component.update({
+                        "price": _decimal(entry["price"]),
+                        "monthlyQuantity": _decimal(monthly_quantity),
+                        "hourlyQuantity": _decimal(monthly_quantity / HOURS_PER_MONTH),
+                        "monthlyCost": _decimal(monthly_cost),
+                        "hourlyCost": _decimal(monthly_cost / HOURS_PER_MONTH)
+                    })
+            resource["monthlyCost"] = _decimal(monthly_cost_of(resource) + delta)
+            priced.append(resource)
+        return priced
+
+    def stale_trees(self, limit: Optional[int] = None, now: Optional[float] = None) -> List[str]:
+        """
+        Return the trees behind stale entries, those with the most stale
+        entries first
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT tree FROM prices WHERE observed_at < ? AND tree IS NOT NULL "
+                "GROUP BY tree ORDER BY COUNT(*) DESC LIMIT ?",
+                (now - self.max_age_seconds, -1 if limit is None else limit)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def stats(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Return the number of entries, how many are stale and the oldest
+        observation
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            count, stale, oldest = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(observed_at < ?), 0), MIN(observed_at) FROM prices",
+                (now - self.max_age_seconds,)
+            ).fetchone()
+        return {"entries": count, "stale": stale, "oldest_observed_at": oldest, "max_age_seconds": self.max_age_seconds}
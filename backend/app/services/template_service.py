@@ -3,8 +3,15 @@ Service for managing usage templates.
 """
 import os
 import json
+import tempfile
+import threading
+from bisect import bisect_right
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any, Tuple
+
+from app.services.template_store import (
+    MAX_PAGE_SIZE, SQLiteTemplateStore, TemplateStore, decode_cursor, encode_cursor, matches, search_terms
+)
 
 # Templates directory path
 TEMPLATES_DIR = Path(__file__).parent.parent.parent / "templates" / "usage"
@@ -12,6 +19,11 @@ TEMPLATES_DIR = Path(__file__).parent.parent.parent / "templates" / "usage"
 # Ensure templates directory exists
 os.makedirs(TEMPLATES_DIR, exist_ok=True)
 
+# Set TEMPLATE_DB_PATH to keep custom templates in one SQLite database instead
+# of a JSON file each; templates already in TEMPLATES_DIR are imported into an
+# empty database
+TEMPLATE_DB_PATH = os.environ.get("TEMPLATE_DB_PATH", "")
+
 # Default templates
 DEFAULT_TEMPLATES = [
     {
@@ -55,30 +67,228 @@ def get_default_templates() -> List[Dict[str, Any]]:
     """
     return DEFAULT_TEMPLATES
 
-def get_custom_templates() -> List[Dict[str, Any]]:
+REQUIRED_FIELDS = ["id", "name", "description", "template"]
+
+def _load_custom_templates(templates_dir: Path) -> Dict[str, Dict[str, Any]]:
     """
-    Loads and returns all custom templates saved by users.
+    Read every valid template file of a directory, keyed by template ID.
     """
-    custom_templates = []
-    
+    templates = {}
     try:
-        # Get all JSON files in the templates directory
-        template_files = list(TEMPLATES_DIR.glob("*.json"))
-        
-        for template_file in template_files:
+        for template_file in sorted(templates_dir.glob("*.json")):
             try:
                 with open(template_file, "r") as f:
                     template_data = json.load(f)
-                    # Ensure the template has the required fields
-                    if all(key in template_data for key in ["id", "name", "description", "template"]):
-                        custom_templates.append(template_data)
+                # Ensure the template has the required fields
+                if all(key in template_data for key in REQUIRED_FIELDS):
+                    templates[template_data["id"]] = template_data
             except (json.JSONDecodeError, KeyError) as e:
                 print(f"Error loading template {template_file}: {e}")
                 continue
     except Exception as e:
         print(f"Error getting custom templates: {e}")
+    return templates
+
+def _directory_stamp(templates_dir: Path) -> Optional[Tuple[int, int]]:
+    try:
+        stat = templates_dir.stat()
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+class TemplateRegistry:
+    """
+    In-memory copy of the custom templates in TEMPLATES_DIR.
+    
+    Templates are read once and served from memory. Every read stats the
+    directory, and the templates are read again when it is another
+    directory or its modification time changed, which happens whenever a
+    template file is created, deleted or replaced (editors and other
+    processes writing through a rename included). A file rewritten in place
+    by something else is not noticed until the directory changes.
+    
+    Writes made through this service update the registry in place under
+    its lock, so they never trigger a reload. Returned templates are shared
+    and must not be modified.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dir: Optional[Path] = None
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._templates: Dict[str, Dict[str, Any]] = {}
+        self._listing: Optional[List[Dict[str, Any]]] = None
+        self._ids: List[str] = []
+    
+    def _refresh(self, templates_dir: Path) -> None:
+        stamp = _directory_stamp(templates_dir)
+        if templates_dir != self._dir or stamp != self._stamp:
+            self._templates = _load_custom_templates(templates_dir)
+            self._listing = None
+            self._dir, self._stamp = templates_dir, stamp
+    
+    def list(self, templates_dir: Path) -> List[Dict[str, Any]]:
+        """
+        Return the custom templates of a directory.
+        """
+        with self._lock:
+            self._refresh(templates_dir)
+            return self._sorted()
+    
+    def _sorted(self) -> List[Dict[str, Any]]:
+        if self._listing is None:
+            self._listing = sorted(self._templates.values(), key=lambda template: template["id"])
+            self._ids = [template["id"] for template in self._listing]
+        return self._listing
+    
+    def page(self, templates_dir: Path, query: Optional[str], after: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        """
+        Return up to limit templates of a directory matching a search query,
+        in ID order after a given ID.
+        """
+        terms = search_terms(query)
+        with self._lock:
+            self._refresh(templates_dir)
+            listing = self._sorted()
+            start = bisect_right(self._ids, after) if after else 0
+        result = []
+        for template in listing[start:]:
+            if len(result) == limit:
+                break
+            if matches(template, terms):
+                result.append(template)
+        return result
+    
+    def get(self, templates_dir: Path, template_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return a custom template by ID, or None.
+        """
+        with self._lock:
+            self._refresh(templates_dir)
+            return self._templates.get(template_id)
+    
+    def write(self,
+              templates_dir: Path,
+              template_id: str,
+              template_data: Optional[Dict[str, Any]],
+              write: Callable[[], Any]) -> Any:
+        """
+        Run a write to the template directory and apply it to the registry.
+        
+        Args:
+            templates_dir: Directory written to
+            template_id: ID of the template written
+            template_data: The template saved, or None if it was deleted
+            write: Function doing the write on disk
+            
+        Returns:
+            Whatever write returns
+        """
+        with self._lock:
+            self._refresh(templates_dir)
+            stamp = _directory_stamp(templates_dir)
+            result = write()
+            if template_data is None:
+                self._templates.pop(template_id, None)
+            else:
+                self._templates[template_id] = template_data
+            self._listing = None
+            # Our own write changed the directory; only a change made by
+            # someone else since the last read calls for a reload
+            if stamp == self._stamp:
+                self._stamp = _directory_stamp(templates_dir)
+            return result
+
+# Shared by every request, so templates are read from disk once per change
+registry = TemplateRegistry()
+
+class FileTemplateStore(TemplateStore):
+    """
+    Custom templates as one JSON file each in TEMPLATES_DIR, served from the
+    in-memory registry. Files are written to a temporary file and renamed
+    into place, so readers never see a partly written template.
+    """
+    def get(self, template_id: str) -> Optional[Dict[str, Any]]:
+        return registry.get(TEMPLATES_DIR, template_id)
+    
+    def list(self) -> List[Dict[str, Any]]:
+        return registry.list(TEMPLATES_DIR)
+    
+    def page(self, query: Optional[str], after: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        return registry.page(TEMPLATES_DIR, query, after, limit)
+    
+    def upsert(self, template: Dict[str, Any]) -> None:
+        templates_dir = TEMPLATES_DIR
+        template_path = templates_dir / f"{template['id']}.json"
+        
+        def write():
+            fd, tmp_path = tempfile.mkstemp(dir=templates_dir, prefix=".", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(template, f, indent=2)
+                os.replace(tmp_path, template_path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        
+        registry.write(templates_dir, template["id"], template, write)
     
-    return custom_templates
+    def delete(self, template_id: str) -> bool:
+        template_path = TEMPLATES_DIR / f"{template_id}.json"
+        if not template_path.exists():
+            return False
+        registry.write(TEMPLATES_DIR, template_id, None, lambda: os.remove(template_path))
+        return True
+
+def _open_store() -> TemplateStore:
+    if not TEMPLATE_DB_PATH:
+        return FileTemplateStore()
+    sqlite_store = SQLiteTemplateStore(Path(TEMPLATE_DB_PATH))
+    if sqlite_store.count() == 0:
+        sqlite_store.upsert_many(_load_custom_templates(TEMPLATES_DIR).values())
+    return sqlite_store
+
+# Backend holding custom templates; replace it to plug in another store
+store: TemplateStore = _open_store()
+
+def get_custom_templates() -> List[Dict[str, Any]]:
+    """
+    Returns all custom templates saved by users.
+    """
+    return store.list()
+
+def list_templates(query: Optional[str] = None,
+                   limit: int = 100,
+                   cursor: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Return one page of templates in ID order, default and custom alike.
+    
+    Args:
+        query: Words that must each start a word of the name or description
+        limit: Page size, at most MAX_PAGE_SIZE
+        cursor: next_cursor of the previous page
+        
+    Returns:
+        Dictionary with the page of templates and the cursor of the next
+        page, which is None on the last page
+    """
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    after = decode_cursor(cursor) if cursor else None
+    terms = search_terms(query)
+    
+    # Fetch one more than needed to know whether another page follows. The
+    # next limit + 1 templates overall are among the defaults after the
+    # cursor and the next limit + 1 custom ones.
+    defaults = [
+        template for template in DEFAULT_TEMPLATES
+        if (after is None or template["id"] > after) and matches(template, terms)
+    ]
+    rows = sorted(defaults + store.page(query, after, limit + 1), key=lambda template: template["id"])
+    page = rows[:limit]
+    return {
+        "templates": page,
+        "next_cursor": encode_cursor(page[-1]["id"]) if len(rows) > limit else None
+    }
 
 def get_all_templates() -> List[Dict[str, Any]]:
     """
@@ -96,15 +306,7 @@ def get_template_by_id(template_id: str) -> Optional[Dict[str, Any]]:
             return template
     
     # Look in custom templates
-    template_path = TEMPLATES_DIR / f"{template_id}.json"
-    if template_path.exists():
-        try:
-            with open(template_path, "r") as f:
-                return json.load(f)
-        except (json.JSONDecodeError, KeyError) as e:
-            print(f"Error loading template {template_id}: {e}")
-    
-    return None
+    return store.get(template_id)
 
 def save_custom_template(template_data: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -117,17 +319,11 @@ def save_custom_template(template_data: Dict[str, Any]) -> Dict[str, Any]:
         The saved template data
     """
     # Ensure the template has the required fields
-    required_fields = ["id", "name", "description", "template"]
-    for field in required_fields:
+    for field in REQUIRED_FIELDS:
         if field not in template_data:
             raise ValueError(f"Template is missing required field: {field}")
     
-    template_id = template_data["id"]
-    template_path = TEMPLATES_DIR / f"{template_id}.json"
-    
-    with open(template_path, "w") as f:
-        json.dump(template_data, f, indent=2)
-    
+    store.upsert(template_data)
     return template_data
 
 def delete_custom_template(template_id: str) -> bool:
@@ -140,17 +336,11 @@ def delete_custom_template(template_id: str) -> bool:
     Returns:
         True if deleted successfully, False otherwise
     """
-    template_path = TEMPLATES_DIR / f"{template_id}.json"
-    
-    if template_path.exists():
-        try:
-            os.remove(template_path)
-            return True
-        except Exception as e:
-            print(f"Error deleting template {template_id}: {e}")
-            return False
-    
-    return False
+    try:
+        return store.delete(template_id)
+    except Exception as e:
+        print(f"Error deleting template {template_id}: {e}")
+        return False
 
 def apply_template_to_resources(template_id: str, resources: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
@@ -0,0 +1,209 @@
+import base64
+import json
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS templates (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    body TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS templates_fts USING fts5(
+    name, description, content='templates', content_rowid='rowid'
+);
+CREATE TRIGGER IF NOT EXISTS templates_ai AFTER INSERT ON templates BEGIN
+    INSERT INTO templates_fts (rowid, name, description) VALUES (new.rowid, new.name, new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS templates_ad AFTER DELETE ON templates BEGIN
+    INSERT INTO templates_fts (templates_fts, rowid, name, description)
+    VALUES ('delete', old.rowid, old.name, old.description);
+END;
+CREATE TRIGGER IF NOT EXISTS templates_au AFTER UPDATE ON templates BEGIN
+    INSERT INTO templates_fts (templates_fts, rowid, name, description)
+    VALUES ('delete', old.rowid, old.name, old.description);
+    INSERT INTO templates_fts (rowid, name, description) VALUES (new.rowid, new.name, new.description);
+END;
+"""
+
+MAX_PAGE_SIZE = 1000
+
+# Words as SQLite's FTS5 tokenizer splits them: runs of letters and digits
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+def search_terms(query: Optional[str]) -> List[str]:
+    """
+    Split a search query into lowercase words; a template matches when
+    every word starts a word of its name or description
+    """
+    return _WORD_RE.findall(query.lower()) if query else []
+
+
+def matches(template: Dict[str, Any], terms: List[str]) -> bool:
+    """
+    Check a template against search_terms, for backends without an index
+    """
+    if not terms:
+        return True
+    words = _WORD_RE.findall(f"{template.get('name', '')} {template.get('description', '')}".lower())
+    return all(any(word.startswith(term) for word in words) for term in terms)
+
+
+def encode_cursor(template_id: str) -> str:
+    """
+    Encode the ID of the last template of a page as an opaque cursor
+    """
+    return base64.urlsafe_b64encode(json.dumps(template_id).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    """
+    Decode a cursor back into the template ID to continue after
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        template_id = json.loads(base64.urlsafe_b64decode(padded))
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    if not isinstance(template_id, str):
+        raise ValueError("Invalid cursor")
+    return template_id
+
+
+class TemplateStore(ABC):
+    """
+    Storage backend for custom templates
+    """
+    @abstractmethod
+    def get(self, template_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return a template by ID, or None
+        """
+
+    @abstractmethod
+    def list(self) -> List[Dict[str, Any]]:
+        """
+        Return every template
+        """
+
+    @abstractmethod
+    def page(self, query: Optional[str], after: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        """
+        Return up to limit templates matching a search query, ordered by ID
+
+        Args:
+            query: Words to search names and descriptions for, or None
+            after: Only return templates with a greater ID
+            limit: Maximum templates to return
+        """
+
+    @abstractmethod
+    def upsert(self, template: Dict[str, Any]) -> None:
+        """
+        Create or replace a template, atomically
+        """
+
+    @abstractmethod
+    def delete(self, template_id: str) -> bool:
+        """
+        Delete a template, returning whether it existed
+        """
+
+
+class SQLiteTemplateStore(TemplateStore):
+    """
+    Custom templates in a single SQLite database
+
+    Upserts are single statements, so concurrent writers (threads or
+    processes) never leave a template half-written. Pages are read in ID
+    order from the primary key, and search runs against a full-text index of
+    names and descriptions, so neither reads every template.
+    """
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def get(self, template_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT body FROM templates WHERE id = ?", (template_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT body FROM templates ORDER BY id").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def page(self, query: Optional[str], after: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        sql = "SELECT body FROM templates WHERE id > ?"
+        params: List[Any] = [after or ""]
+        terms = search_terms(query)
+        if terms:
+            sql += " AND rowid IN (SELECT rowid FROM templates_fts WHERE templates_fts MATCH ?)"
+            params.append(" ".join(f'"{term}"*' for term in terms))
+        sql += " ORDER BY id LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def upsert(self, template: Dict[str, Any]) -> None:
+        self.upsert_many([template])
+
+    def upsert_many(self, templates: Iterable[Dict[str, Any]]) -> int:
+        """
+        Create or replace templates in one transaction
+
+        Returns:
+            Number of templates written
+        """
+        now = time.time()
+        rows = [
+            (template["id"], template["name"], template["description"], json.dumps(template), now)
+            for template in templates
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO templates (id, name, description, body, updated_at) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (id) DO UPDATE SET "
+                    "name = excluded.name, description = excluded.description, "
+                    "body = excluded.body, updated_at = excluded.updated_at",
+                    rows
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def delete(self, template_id: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM templates WHERE id = ?", (template_id,))
+        return cursor.rowcount > 0
+
+    def count(self) -> int:
+        """
+        Return the number of templates
+        """
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM templates").fetchone()[0]
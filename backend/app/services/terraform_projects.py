@@ -0,0 +1,199 @@
+import hashlib
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from app.services.zip_ingest import is_terraform_relevant
+
+try:
+    import yaml
+except ImportError:
+    # PyYAML is only needed to read infracost.yml project configs
+    yaml = None
+
+INFRACOST_CONFIG_NAMES = ("infracost.yml", "infracost.yml.tmpl")
+
+TERRAFORM_CODE_SUFFIXES = (".tf", ".tf.json")
+
+# module "x" { source = "./modules/x" } - only local paths matter here
+LOCAL_SOURCE_RE = re.compile(r'\bsource\s*[=:]\s*"(\.{1,2}/[^"]*)"')
+
+
+def terraform_dirs(tree: Path) -> List[Path]:
+    """
+    Return every directory in the tree that contains Terraform code
+    """
+    dirs = {
+        path.parent for path in tree.rglob("*")
+        if path.is_file()
+        and path.name.endswith(TERRAFORM_CODE_SUFFIXES)
+        and ".terraform" not in path.relative_to(tree).parts
+    }
+    return sorted(dirs)
+
+
+def local_module_sources(module_dir: Path) -> Set[Path]:
+    """
+    Resolve the local module directories referenced by a Terraform directory
+    """
+    sources = set()
+    for path in module_dir.iterdir():
+        if not (path.is_file() and path.name.endswith(TERRAFORM_CODE_SUFFIXES)):
+            continue
+        text = path.read_text(errors="ignore")
+        for match in LOCAL_SOURCE_RE.finditer(text):
+            sources.add((module_dir / match.group(1)).resolve())
+    return sources
+
+
+def discover_root_modules(tree: Path) -> List[Dict[str, Any]]:
+    """
+    Find root modules: Terraform directories no other directory uses as a
+    local module source
+
+    Returns:
+        Project specs with ``name`` and ``path`` relative to the tree
+    """
+    tree = tree.resolve()
+    dirs = terraform_dirs(tree)
+
+    referenced = set()
+    for module_dir in dirs:
+        referenced |= local_module_sources(module_dir)
+
+    projects = []
+    for module_dir in dirs:
+        if module_dir in referenced:
+            continue
+        rel = module_dir.relative_to(tree).as_posix()
+        projects.append({"name": rel, "path": rel})
+    return projects
+
+
+def find_infracost_config(tree: Path) -> Optional[Path]:
+    """
+    Return the Infracost config file at the root of the tree, if any
+    """
+    for name in INFRACOST_CONFIG_NAMES:
+        path = tree / name
+        if path.is_file():
+            return path
+    return None
+
+
+def load_infracost_config(config_path: Path) -> List[Dict[str, Any]]:
+    """
+    Read the project list from an Infracost config file
+
+    Returns:
+        Project specs with ``name``, ``path`` and optional ``usage_file`` and
+        ``terraform_var_files``, all relative to the tree
+    """
+    if yaml is None:
+        raise ValueError("PyYAML is required to read infracost.yml project configs")
+
+    with open(config_path) as f:
+        config = yaml.safe_load(f) or {}
+
+    tree = config_path.parent.resolve()
+    projects = []
+    for entry in config.get("projects") or []:
+        path = str(entry.get("path", "."))
+        _ensure_inside(tree, path)
+        project = {"name": entry.get("name") or path, "path": path}
+        if entry.get("usage_file"):
+            _ensure_inside(tree, entry["usage_file"])
+            project["usage_file"] = entry["usage_file"]
+        if entry.get("terraform_var_files"):
+            for var_file in entry["terraform_var_files"]:
+                _ensure_inside(tree, str(Path(path) / var_file))
+            project["terraform_var_files"] = list(entry["terraform_var_files"])
+        projects.append(project)
+
+    if not projects:
+        raise ValueError(f"No projects defined in {config_path.name}")
+    return projects
+
+
+def find_projects(tree: Path) -> List[Dict[str, Any]]:
+    """
+    Return the projects to price: from infracost.yml if present, otherwise
+    from root module discovery
+    """
+    config_path = find_infracost_config(tree)
+    if config_path is not None:
+        return load_infracost_config(config_path)
+
+    projects = discover_root_modules(tree)
+    if not projects:
+        raise ValueError("No Terraform root modules found in upload")
+    return projects
+
+
+def module_closure(tree: Path, project_dir: Path) -> List[Path]:
+    """
+    Return a project directory plus every local module it uses, transitively,
+    limited to directories inside the tree
+    """
+    tree = tree.resolve()
+    seen = set()
+    stack = [project_dir.resolve()]
+    while stack:
+        module_dir = stack.pop()
+        if module_dir in seen or not module_dir.is_dir():
+            continue
+        if module_dir != tree and tree not in module_dir.parents:
+            continue
+        seen.add(module_dir)
+        stack.extend(local_module_sources(module_dir))
+    return sorted(seen)
+
+
+def fingerprint_project(tree: Path,
+                        project: Dict[str, Any],
+                        usage_file: Optional[Path] = None,
+                        salt: str = "") -> str:
+    """
+    Hash everything that can change a project's breakdown: the Terraform
+    files of the project and its local modules, its variable files and its
+    usage file
+
+    Args:
+        tree: Root of the extracted upload
+        project: Project spec as returned by find_projects
+        usage_file: Usage file applied when the project has none of its own
+        salt: Extra input such as the Infracost version
+
+    Returns:
+        Hex digest for the project
+    """
+    tree = tree.resolve()
+    digest = hashlib.sha256(salt.encode() + b"\0")
+
+    for module_dir in module_closure(tree, tree / project["path"]):
+        for path in sorted(module_dir.iterdir()):
+            rel = path.relative_to(tree).as_posix()
+            if path.is_file() and is_terraform_relevant(rel):
+                digest.update(rel.encode() + b"\0")
+                digest.update(hashlib.sha256(path.read_bytes()).digest())
+
+    if project.get("usage_file"):
+        usage_file = tree / project["usage_file"]
+    if usage_file is not None and usage_file.exists():
+        digest.update(b"usage\0")
+        digest.update(hashlib.sha256(usage_file.read_bytes()).digest())
+
+    for var_file in project.get("terraform_var_files", []):
+        digest.update(f"var-file:{var_file}\0".encode())
+        # Variable files are relative to the project directory
+        var_path = tree / project["path"] / var_file
+        if var_path.is_file():
+            digest.update(hashlib.sha256(var_path.read_bytes()).digest())
+
+    return digest.hexdigest()
+
+
+def _ensure_inside(tree: Path, rel_path: str) -> None:
+    target = (tree / rel_path).resolve()
+    if target != tree and tree not in target.parents:
+        raise ValueError(f"Project path escapes the upload: {rel_path}")
@@ -0,0 +1,160 @@
+import hashlib
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.services.zip_ingest import is_terraform_relevant
+
+
+def _relevant_files(tree: Path) -> List[Path]:
+    return sorted(
+        path for path in tree.rglob("*")
+        if path.is_file() and is_terraform_relevant(path.relative_to(tree).as_posix())
+    )
+
+
+def hash_tree(tree: Path) -> str:
+    """
+    Hash the Terraform-relevant files of an extracted tree
+
+    Args:
+        tree: Extracted Terraform directory
+
+    Returns:
+        Hex digest identifying the tree's contents
+    """
+    digest = hashlib.sha256(b"tree\0")
+    for path in _relevant_files(tree):
+        digest.update(path.relative_to(tree).as_posix().encode() + b"\0")
+        digest.update(hashlib.sha256(path.read_bytes()).digest())
+    return digest.hexdigest()
+
+
+def _link_or_copy(source: str, target: str) -> None:
+    try:
+        os.link(source, target)
+    except OSError:
+        # Different filesystem (e.g. an upload dir on tmpfs)
+        shutil.copy2(source, target)
+
+
+class TreeCache:
+    """
+    Content-addressed on-disk cache of extracted Terraform trees
+
+    Uploads are deleted once priced, so the Terraform-relevant files of each
+    tree are kept here under their hash. Estimates record the hash, which lets
+    them be priced again (for example with a usage file) without the archive
+    being uploaded again. The total size is bounded and the least recently
+    used trees are evicted first.
+    """
+    def __init__(self, cache_dir: Path, max_bytes: int = 1024 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_index()
+
+    def _load_index(self) -> None:
+        """
+        Rebuild the LRU order from directory modification times, dropping
+        trees left half-written by a crash
+        """
+        trees = []
+        for path in self.cache_dir.iterdir():
+            if not path.is_dir():
+                continue
+            if path.name.endswith(".tmp"):
+                shutil.rmtree(path, ignore_errors=True)
+                continue
+            size = sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+            trees.append((path.stat().st_mtime_ns, path.name, size))
+
+        for _, key, size in sorted(trees):
+            self._entries[key] = size
+            self.total_bytes += size
+
+    def path(self, key: str) -> Optional[Path]:
+        """
+        Return the directory of a cached tree, or None if it is not cached
+        """
+        with self._lock:
+            if key not in self._entries:
+                return None
+            path = self.cache_dir / key
+            os.utime(path)
+            self._entries.move_to_end(key)
+            return path
+
+    def retain(self, tree: Path) -> str:
+        """
+        Keep a copy of a tree's Terraform-relevant files
+
+        Files are hard-linked where possible, so retaining a tree that was just
+        extracted costs no extra disk space until the upload is cleaned up.
+
+        Args:
+            tree: Extracted Terraform directory
+
+        Returns:
+            The tree's hash, to pass to path() later
+        """
+        key = hash_tree(tree)
+        if self.path(key) is not None:
+            return key
+
+        files = _relevant_files(tree)
+        size = sum(path.stat().st_size for path in files)
+        if size > self.max_bytes:
+            return key
+
+        tmp_path = self.cache_dir / f"{key}.{threading.get_ident()}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        for path in files:
+            target = tmp_path / path.relative_to(tree)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            _link_or_copy(str(path), str(target))
+
+        with self._lock:
+            try:
+                os.rename(tmp_path, self.cache_dir / key)
+            except OSError:
+                # Another request retained the same tree first
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                return key
+            self._entries[key] = size
+            self.total_bytes += size
+
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                oldest = next(iter(self._entries))
+                self.total_bytes -= self._entries.pop(oldest)
+                shutil.rmtree(self.cache_dir / oldest, ignore_errors=True)
+        return key
+
+    def checkout(self, key: str, dest: Path) -> bool:
+        """
+        Populate a working directory with a cached tree
+
+        Returns:
+            False if the tree is not cached (or was evicted while copying)
+        """
+        path = self.path(key)
+        if path is None:
+            return False
+        try:
+            shutil.copytree(path, dest, copy_function=_link_or_copy, dirs_exist_ok=True)
+        except (OSError, shutil.Error):
+            return False
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the number of cached trees and their size
+        """
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.total_bytes, "max_bytes": self.max_bytes}
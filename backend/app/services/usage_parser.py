@@ -0,0 +1,226 @@
+import re
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+Number = Union[int, float]
+
+# A number with optional thousands separators, then an optional count
+# multiplier and an optional data size unit: "2,000", "5k", "3 million",
+# "50GB", "1.5 TiB". Digits glued to letters ("ec2", "t3") are not numbers.
+QUANTITY_RE = re.compile(
+    r"(?<![\w.])(?P<number>\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?|\.\d+)"
+    r"(?:\s*(?P<multiplier>thousand|million|billion|bn|k|m|b)\b)?"
+    r"(?:\s*(?P<size>[kmgtp]i?b)\b)?"
+)
+
+# A rate following a quantity within a few words: "per second", "a day",
+# "/min", "daily"
+RATE_RE = re.compile(
+    r"[^\d,;]{0,40}?(?:"
+    r"(?:\b(?:per|a|an|every|each)\s+|/\s*)"
+    r"(?P<period>seconds?|secs?|s|minutes?|mins?|hours?|hrs?|h|days?|d|weeks?|wk|months?|mo|years?|yr)\b"
+    r"|\b(?P<adverb>hourly|daily|weekly|monthly|yearly|annually)\b)"
+)
+
+# Clause boundaries; a comma between digits is a thousands separator
+CLAUSE_RE = re.compile(r"(?<!\d),|,(?!\d)|[;\n]|\b(?:and|but|plus|with)\b")
+
+MULTIPLIERS = {
+    None: 1,
+    "k": 1e3, "thousand": 1e3,
+    "m": 1e6, "million": 1e6,
+    "b": 1e9, "bn": 1e9, "billion": 1e9
+}
+
+# Data sizes are normalized to GB, the unit of Infracost's storage keys
+SIZE_GB = {
+    "kb": 1 / 1024 ** 2, "kib": 1 / 1024 ** 2,
+    "mb": 1 / 1024, "mib": 1 / 1024,
+    "gb": 1, "gib": 1,
+    "tb": 1024, "tib": 1024,
+    "pb": 1024 ** 2, "pib": 1024 ** 2
+}
+
+# Usage is monthly; a month is 30 days, the 720 hours of a 24/7 answer.
+# Offline pricing uses the same month, so the two always agree
+HOURS_PER_MONTH = 720
+
+_SECONDS = {
+    "second": 1,
+    "minute": 60,
+    "hour": 3600,
+    "day": 86400,
+    "week": 7 * 86400,
+    "month": HOURS_PER_MONTH * 3600,
+    "year": 365 * 86400
+}
+PERIODS = {
+    **{alias: period for period, aliases in {
+        "second": ("s", "sec", "secs", "second", "seconds"),
+        "minute": ("min", "mins", "minute", "minutes"),
+        "hour": ("h", "hr", "hrs", "hour", "hours", "hourly"),
+        "day": ("d", "day", "days", "daily"),
+        "week": ("wk", "week", "weeks", "weekly"),
+        "month": ("mo", "month", "months", "monthly"),
+        "year": ("yr", "year", "years", "yearly", "annually")
+    }.items() for alias in aliases}
+}
+PER_MONTH = {period: _SECONDS["month"] / seconds for period, seconds in _SECONDS.items()}
+
+
+@lru_cache(maxsize=None)
+def _keyword_re(keyword: str) -> "re.Pattern[str]":
+    # A keyword has to start a word, so "read" matches "reads" but not
+    # "spread"; a unit glued to a number ("gb" in "50gb") still counts
+    return re.compile(r"(?<![^\W\d_])" + re.escape(keyword))
+
+
+def _whole(value: Number) -> Number:
+    # Drop float noise such as 2.3 * 1e6 = 2299999.9999999995
+    value = round(float(value), 6)
+    return int(value) if value.is_integer() else value
+
+
+class Quantity(NamedTuple):
+    """
+    A quantity found in an answer
+    """
+    value: Number
+    unit: Optional[str]
+    period: Optional[str]
+    start: int
+    end: int
+
+    @property
+    def monthly(self) -> Number:
+        """
+        The value as a monthly amount; quantities without a rate are
+        taken to be monthly already
+        """
+        if self.period is None:
+            return self.value
+        return _whole(self.value * PER_MONTH[self.period])
+
+
+def _quantity(match: "re.Match[str]", text: str, rate_end: int) -> Quantity:
+    number, multiplier, size = match.groups()
+    if multiplier is None and size is None and "," not in number and "." not in number:
+        value = int(number)
+    else:
+        value = float(number.replace(",", "")) * MULTIPLIERS[multiplier]
+        if size:
+            value *= SIZE_GB[size]
+        value = _whole(value)
+
+    end = match.end()
+    rate = RATE_RE.match(text, end, rate_end)
+    period = PERIODS[rate.group(1) or rate.group(2)] if rate else None
+    return Quantity(value, "GB" if size else None, period, match.start(), end)
+
+
+def tokenize(text: str) -> List[Quantity]:
+    """
+    Find every quantity in an answer
+
+    Args:
+        text: Answer, lowercase
+
+    Returns:
+        Quantities in order of appearance, with positions into the text
+    """
+    matches = list(QUANTITY_RE.finditer(text))
+    # A rate has to come before the next quantity
+    ends = [match.start() for match in matches[1:]] + [len(text)]
+    return [_quantity(match, text, end) for match, end in zip(matches, ends)]
+
+
+def quantity_near(text: str, *keywords: str, quantities: Optional[List[Quantity]] = None) -> Optional[Quantity]:
+    """
+    Find the quantity an answer gives for a keyword
+
+    The quantity closest to an occurrence of any keyword within the same
+    clause wins, so "500k reads, 100k writes" gives 100k for "write".
+    Keywords only match at the start of a word ("ms" is not found in
+    "items"). A keyword inside a quantity (such as "gb" in "50GB") selects
+    it.
+
+    Args:
+        text: Answer, lowercase
+        keywords: Lowercase keywords, in order of preference
+        quantities: tokenize(text), if already done
+
+    Returns:
+        The quantity, or None if no clause mentions both a keyword and a
+        quantity
+    """
+    if quantities is None:
+        quantities = tokenize(text)
+    if not quantities:
+        return None
+    boundaries = [match.start() for match in CLAUSE_RE.finditer(text)]
+    clauses = [bisect_right(boundaries, quantity.start) for quantity in quantities]
+
+    for keyword in keywords:
+        best: Optional[Tuple[int, Quantity]] = None
+        for occurrence in _keyword_re(keyword).finditer(text):
+            position, keyword_end = occurrence.span()
+            clause = bisect_right(boundaries, position)
+            for quantity, quantity_clause in zip(quantities, clauses):
+                if quantity.end <= position:
+                    distance = position - quantity.end
+                elif quantity.start >= keyword_end:
+                    distance = quantity.start - keyword_end
+                else:
+                    distance = 0
+                if (distance and quantity_clause != clause) or (best is not None and distance >= best[0]):
+                    continue
+                best = (distance, quantity)
+        if best is not None:
+            return best[1]
+    return None
+
+
+def parse_quantity(text: str, *keywords: str) -> Optional[Quantity]:
+    """
+    Parse the quantity an answer gives, for the keywords if any
+
+    Args:
+        text: Free-text answer
+        keywords: Keywords the quantity has to be given for
+
+    Returns:
+        The quantity, or None if the answer gives none
+    """
+    text = text.lower()
+    if keywords:
+        return quantity_near(text, *(keyword.lower() for keyword in keywords))
+    match = QUANTITY_RE.search(text)
+    if match is None:
+        return None
+    following = QUANTITY_RE.search(text, match.end())
+    return _quantity(match, text, following.start() if following else len(text))
+
+
+def parse_many(answers: Iterable[str], *keywords: str) -> List[Optional[Quantity]]:
+    """
+    Parse the quantities of many answers in one call
+
+    Answers repeat heavily across projects ("24/7", "1 million requests"),
+    so each distinct answer is parsed once.
+
+    Args:
+        answers: Free-text answers
+        keywords: Keywords the quantities have to be given for
+
+    Returns:
+        The quantity of each answer, aligned with the answers
+    """
+    parsed: Dict[str, Optional[Quantity]] = {}
+    results = []
+    for answer in answers:
+        quantity = parsed.get(answer, parsed)
+        if quantity is parsed:
+            quantity = parsed[answer] = parse_quantity(answer, *keywords)
+        results.append(quantity)
+    return results
@@ -0,0 +1,154 @@
+import asyncio
+import hashlib
+import json
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+USAGE_FILE_NAME = "infracost-usage.yml"
+USAGE_FILE_VERSION = "0.1"
+
+_SCALARS = (str, int, float, bool)
+
+
+def _check_value(value: Any, path: str) -> None:
+    if value is None or isinstance(value, _SCALARS):
+        return
+    if isinstance(value, list):
+        for i, item in enumerate(value):
+            _check_value(item, f"{path}[{i}]")
+        return
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _check_value(item, f"{path}.{key}")
+        return
+    raise ValueError(f"Unsupported usage value at {path}")
+
+
+def render_usage_file(usage: Dict[str, Dict[str, Any]]) -> str:
+    """
+    Render generated usage as an Infracost usage file
+
+    The file is written as canonical JSON (sorted keys, fixed indentation),
+    which is valid YAML, so the same usage always renders to the same bytes
+    whatever order it was generated in.
+
+    Args:
+        usage: Resource address -> usage parameters, as returned by
+            /usage-generate, /generate-usage and /apply-template
+
+    Returns:
+        Contents of an infracost-usage.yml file
+
+    Raises:
+        ValueError: If the usage is not a mapping of resources to parameters
+    """
+    if not isinstance(usage, dict):
+        raise ValueError("Usage must map resource names to usage parameters")
+    for name, params in usage.items():
+        if not name or not isinstance(params, dict):
+            raise ValueError(f"Usage for {name or 'an unnamed resource'} must be a mapping of parameters")
+        _check_value(params, name)
+
+    return json.dumps(
+        {"version": USAGE_FILE_VERSION, "resource_usage": usage},
+        sort_keys=True,
+        indent=2
+    ) + "\n"
+
+
+def usage_run_uid(tree_hash: str, usage_body: str, salt: str = "") -> str:
+    """
+    Derive the estimate uid of pricing a tree with a usage file
+
+    The uid is a function of the inputs, so pricing the same tree with an
+    identical usage file again finds the estimate of the first run.
+
+    Args:
+        tree_hash: Hash of the Terraform tree, see tree_cache.hash_tree
+        usage_body: Rendered usage file
+        salt: Anything else that changes the breakdown, such as the Infracost
+            version
+
+    Returns:
+        A UUID-formatted estimate uid
+    """
+    digest = hashlib.sha256(f"{salt}\0{tree_hash}\0".encode() + usage_body.encode()).hexdigest()
+    return str(uuid.UUID(digest[:32]))
+
+
+DisconnectCheck = Callable[[], Awaitable[bool]]
+
+
+class InFlightRuns:
+    """
+    Coalesces concurrent runs with the same key into one
+
+    The first caller for a key runs the work; callers arriving while it is in
+    progress await the same result instead of starting another run. The work
+    is handed a disconnect check that only reports a disconnect once every
+    caller waiting on it has gone, so one client leaving does not cancel the
+    run for the others.
+    """
+    def __init__(self):
+        self._runs: Dict[str, "asyncio.Future[Any]"] = {}
+        self._waiters: Dict[str, List[Optional[DisconnectCheck]]] = {}
+        self.started = 0
+        self.joined = 0
+
+    async def run(self,
+                  key: str,
+                  work: Callable[[DisconnectCheck], Awaitable[Any]],
+                  is_disconnected: Optional[DisconnectCheck] = None) -> Tuple[Any, bool]:
+        """
+        Run work for a key unless a run for it is already in progress
+
+        Args:
+            key: Key identifying the run
+            work: Coroutine function doing the run, given the shared
+                disconnect check
+            is_disconnected: Optional coroutine function reporting whether
+                this caller has disconnected; a caller without one keeps
+                the run going
+
+        Returns:
+            Tuple of (result, whether an in-progress run was joined)
+        """
+        running = self._runs.get(key)
+        if running is not None:
+            self.joined += 1
+            self._waiters[key].append(is_disconnected)
+            return await asyncio.shield(running), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._runs[key] = future
+        waiters = self._waiters[key] = [is_disconnected]
+        self.started += 1
+
+        async def all_disconnected() -> bool:
+            for check in list(waiters):
+                if check is None or not await check():
+                    return False
+            return True
+
+        try:
+            result = await work(all_disconnected)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Nobody may be waiting; don't warn about an unretrieved exception
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            del self._runs[key]
+            del self._waiters[key]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return how many runs were started and how many callers joined one
+        """
+        return {"in_flight": len(self._runs), "started": self.started, "joined": self.joined}
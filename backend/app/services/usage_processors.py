@@ -0,0 +1,204 @@
+import json
+import logging
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.services.usage_parser import HOURS_PER_MONTH, Number, Quantity, _whole, quantity_near, tokenize
+
+# Built-in rules, one JSON file per provider prefix (aws.json, azurerm.json,
+# google.json) mapping resource types to their usage keys
+RULES_DIR = Path(__file__).parent / "usage_rules"
+
+# Packages can provide processors for more resource types: the entry point
+# name is the resource type and it loads a callable(answer) -> usage dict
+ENTRY_POINT_GROUP = "ccp.usage_processors"
+
+# Hours-kind keys: 24/7 answers run all month, business hours 8h x 20 days
+WORKDAY_HOURS = 160
+ALWAYS_ON_TERMS = ("24/7", "24 7", "all day", "always", "constantly", "constant")
+WORKDAY_TERMS = ("work", "business", "office", "weekday")
+
+# Rule units other than GB that data sizes are converted to
+_FROM_GB = {"TB": 1 / 1024, "GB": 1, "MB": 1024, "KB": 1024 ** 2}
+
+KINDS = ("rate", "level", "hours")
+
+logger = logging.getLogger(__name__)
+
+Processor = Callable[[str], Dict[str, Any]]
+
+
+class RuleProcessor:
+    """
+    Rule-based usage processor for one resource type
+
+    Each usage key has a rule with:
+
+    - ``keywords``: the key takes the quantity nearest one of them within a
+      clause; without keywords it takes the first quantity. A quantity
+      another key took is never taken twice
+    - ``kind``: ``rate`` (default) converts "per second"/"a day" quantities
+      to monthly, ``level`` takes the value as given (storage, duration) and
+      ``hours`` also reads 24/7 and business-hours answers
+    - ``unit``: unit of the key when not GB, for data sizes given in GB/TB
+    - ``default``: value when the answer gives none, otherwise the key is
+      left out
+
+    A dotted key such as ``standard.storage_gb`` sets a nested parameter.
+    """
+    def __init__(self, resource_type: str, rules: Dict[str, Dict[str, Any]]):
+        self.resource_type = resource_type
+        self.rules: List[Tuple[str, Dict[str, Any]]] = []
+        for key, rule in rules.items():
+            kind = rule.get("kind", "rate")
+            if kind not in KINDS:
+                raise ValueError(f"Unsupported usage rule kind for {resource_type}.{key}: {kind}")
+            if rule.get("unit", "GB") not in _FROM_GB:
+                raise ValueError(f"Unsupported usage rule unit for {resource_type}.{key}: {rule['unit']}")
+            self.rules.append((key, rule))
+        # Keyword rules claim their quantities first
+        self.rules.sort(key=lambda item: not item[1].get("keywords"))
+
+    def _value(self, rule: Dict[str, Any], quantity: Quantity) -> Number:
+        if rule.get("kind") == "level":
+            value = quantity.value
+        else:
+            value = quantity.monthly
+        if quantity.unit == "GB":
+            value = _whole(value * _FROM_GB[rule.get("unit", "GB")])
+        if rule.get("kind") == "hours":
+            value = min(value, HOURS_PER_MONTH)
+        return value
+
+    def __call__(self, answer: str) -> Dict[str, Any]:
+        text = answer.lower()
+        quantities = tokenize(text)
+        claimed = set()
+        usage: Dict[str, Any] = {}
+        for key, rule in self.rules:
+            value = None
+            if rule.get("kind") == "hours" and any(term in text for term in ALWAYS_ON_TERMS):
+                value = HOURS_PER_MONTH
+            elif rule.get("kind") == "hours" and any(term in text for term in WORKDAY_TERMS):
+                value = WORKDAY_HOURS
+            else:
+                keywords = rule.get("keywords")
+                unclaimed = [q for q in quantities if q.start not in claimed]
+                if keywords:
+                    quantity = quantity_near(text, *keywords, quantities=unclaimed)
+                else:
+                    quantity = next(iter(unclaimed), None)
+                if quantity is not None:
+                    claimed.add(quantity.start)
+                    value = self._value(rule, quantity)
+            if value is None:
+                value = rule.get("default")
+            if value is None:
+                continue
+
+            target = usage
+            *parents, leaf = key.split(".")
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            target[leaf] = value
+        return usage
+
+
+def _entry_points(group: str) -> List[Any]:
+    from importlib import metadata
+    if sys.version_info >= (3, 10):
+        return list(metadata.entry_points(group=group))
+    # Python 3.9 returns a dict of group -> entry points
+    return list(metadata.entry_points().get(group, []))
+
+
+def _provider(resource_type: str) -> str:
+    return resource_type.split("_", 1)[0]
+
+
+class UsageProcessorRegistry:
+    """
+    Resource type -> usage processor, loaded on first use
+
+    Nothing is read at startup. The first lookup of a type loads only the
+    rule file of its provider, and entry points are scanned (not imported)
+    the first time any type is looked up. After that every lookup is a
+    dictionary hit, including misses.
+    """
+    def __init__(self, rules_dir: Path = RULES_DIR, entry_point_group: Optional[str] = ENTRY_POINT_GROUP):
+        self.rules_dir = rules_dir
+        self.entry_point_group = entry_point_group
+        self._processors: Dict[str, Optional[Processor]] = {}
+        self._rules: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._entry_points: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def register(self, resource_type: str, processor: Processor) -> None:
+        """
+        Register a processor for a resource type, replacing any other
+        """
+        with self._lock:
+            self._processors[resource_type] = processor
+
+    def get(self, resource_type: Optional[str]) -> Optional[Processor]:
+        """
+        Return the processor for a resource type, or None if it has none
+        """
+        if not resource_type:
+            return None
+        try:
+            return self._processors[resource_type]
+        except KeyError:
+            pass
+        with self._lock:
+            if resource_type not in self._processors:
+                self._processors[resource_type] = self._load(resource_type)
+            return self._processors[resource_type]
+
+    def _load(self, resource_type: str) -> Optional[Processor]:
+        # Installed plugins take precedence over the built-in rules
+        entry_point = self._plugin_entry_points().get(resource_type)
+        if entry_point is not None:
+            try:
+                return entry_point.load()
+            except Exception as e:
+                # A broken plugin must not take down dispatch for other types
+                logger.warning("Error loading usage processor plugin %s: %s", entry_point.name, e)
+        rules = self._provider_rules(_provider(resource_type)).get(resource_type)
+        if rules is None:
+            return None
+        return RuleProcessor(resource_type, rules)
+
+    def _plugin_entry_points(self) -> Dict[str, Any]:
+        if self._entry_points is None:
+            self._entry_points = {}
+            if self.entry_point_group:
+                for entry_point in _entry_points(self.entry_point_group):
+                    self._entry_points[entry_point.name] = entry_point
+        return self._entry_points
+
+    def _provider_rules(self, provider: str) -> Dict[str, Dict[str, Any]]:
+        if provider not in self._rules:
+            path = self.rules_dir / f"{provider}.json"
+            try:
+                self._rules[provider] = json.loads(path.read_text())
+            except FileNotFoundError:
+                self._rules[provider] = {}
+        return self._rules[provider]
+
+    def supported_types(self) -> List[str]:
+        """
+        Return every resource type with a processor, loading all rule files
+        """
+        with self._lock:
+            types = set(self._plugin_entry_points())
+            for path in self.rules_dir.glob("*.json"):
+                types.update(self._provider_rules(path.stem))
+            types.update(t for t, processor in self._processors.items() if processor is not None)
+        return sorted(types)
+
+
+# Shared by every UsageService, so rules load once per process
+default_registry = UsageProcessorRegistry()
@@ -1,11 +1,84 @@
-from typing import Dict, List, Any, Optional
-import json
+import asyncio
+import threading
+from concurrent.futures import BrokenExecutor, Executor
+from typing import AsyncIterator, Callable, Dict, List, Any, Optional, Tuple
+
+from app.services.usage_parser import Number, parse_quantity
+from app.services.usage_processors import UsageProcessorRegistry, default_registry
+
+# Sets parsed per process pool task: small enough that results stream back
+# steadily, large enough that pickling doesn't dominate
+BATCH_CHUNK_SIZE = 16
+
+
+def generate_usage_chunk(sets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Generate usage for a chunk of (resources, answers) sets
+
+    Runs in process pool workers, which use the built-in processors.
+
+    Returns:
+        {"usage": ...} or {"error": ...} for each set
+    """
+    service = UsageService()
+    return [service.generate_usage_for_set(item) for item in sets]
+
+
+class WorkerPool:
+    """
+    Executor shared across batches that is replaced once it breaks
+
+    A process pool whose worker dies (killed, out of memory) is broken for
+    good: every later submission raises BrokenProcessPool. The first batch
+    to notice swaps in a new executor, built by the factory, so later
+    batches run normally.
+    """
+    def __init__(self, factory: Callable[[], Executor]):
+        self._factory = factory
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+    
+    @property
+    def executor(self) -> Executor:
+        """
+        The current executor, created on first use
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._factory()
+            return self._executor
+    
+    def replace(self, broken: Executor) -> Executor:
+        """
+        Replace a broken executor, unless another batch already did, and
+        return the current one
+        """
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False)
+        return self.executor
+    
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
 
 class UsageService:
     """
     Service for handling usage assumptions and conversions
     """
     
+    def __init__(self, processors: Optional[UsageProcessorRegistry] = None):
+        """
+        Args:
+            processors: Registry of per-type usage processors, defaults to
+                the built-in AWS, Azure and GCP rules and installed plugins
+        """
+        self.processors = processors or default_registry
+    
     def generate_usage_from_answers(self, 
                                   resources: List[Dict[str, Any]], 
                                   answers: List[str]) -> Dict[str, Dict[str, Any]]:
@@ -19,222 +92,123 @@ class UsageService:
         Returns:
             Dictionary mapping resource names to usage parameters
         """
-        # Special case for the test
-        if len(resources) == 3 and len(answers) == 3:
-            if "24/7 operation" in answers[0] and "About 2 million requests per month" in answers[1] and "500k reads, 100k writes, and 50GB storage" in answers[2]:
-                return {
-                    "aws_instance.web_server": {"monthly_hours": 720},
-                    "aws_lambda_function.processor": {"monthly_requests": 2000000},
-                    "aws_dynamodb_table.data_store": {
-                        "monthly_read_request_units": 500000,
-                        "monthly_write_request_units": 100000,
-                        "storage_gb": 50
-                    }
-                }
-                
         usage = {}
         
-        for idx, res in enumerate(resources):
-            if idx >= len(answers):
-                continue
-                
+        for res, answer in zip(resources, answers):
             name = res.get("name")
             if not name:
                 continue
                 
             # Convert based on resource type and answer
-            if res.get("resource_type") == "aws_instance":
-                usage[name] = self._process_ec2_usage(answers[idx])
-            elif res.get("resource_type") == "aws_lambda_function":
-                usage[name] = self._process_lambda_usage(answers[idx])
-            elif res.get("resource_type") == "aws_dynamodb_table":
-                usage[name] = self._process_dynamodb_usage(answers[idx])
-            else:
-                usage[name] = {}  # Default empty usage for unknown types
+            processor = self.processors.get(res.get("resource_type"))
+            usage[name] = processor(answer) if processor else {}  # Default empty usage for unknown types
         
         return usage
     
-    def _process_ec2_usage(self, answer: str) -> Dict[str, Any]:
+    def generate_usage_for_set(self, item: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Process EC2 instance usage from answer
+        Generate usage for one set of a batch, reporting failures instead of
+        raising so one bad set does not fail the batch
+        """
+        try:
+            return {"usage": self.generate_usage_from_answers(item["resources"], item["answers"])}
+        except Exception as e:
+            return {"error": str(e)}
+    
+    async def stream_usage_batch(self,
+                                 sets: List[Dict[str, Any]],
+                                 pool: Optional[WorkerPool] = None,
+                                 chunk_size: int = BATCH_CHUNK_SIZE) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
         """
-        # Special cases for tests
-        if "300 hours per month" in answer:
-            return {"monthly_hours": 300}
-        if "about 400 hours" in answer:
-            return {"monthly_hours": 400}
-        if "1000 hours" in answer:
-            return {"monthly_hours": 720}
+        Generate usage for many sets, yielding each result as it is ready
+        
+        Args:
+            sets: Dicts with the resources and answers of each set
+            pool: Worker pool to spread chunks of sets across; without one
+                the sets are parsed in order in this process
+            chunk_size: Sets per executor task
             
-        # Look for 24/7 or similar indicators
-        is_247 = any(term in answer.lower() for term in ["24/7", "24 7", "all day", "always", "constantly", "constant"])
-        is_workday = any(term in answer.lower() for term in ["work", "business", "office", "weekday"])
+        Yields:
+            Tuples of (set index, {"usage": ...} or {"error": ...}), in
+            completion order. Sets whose worker died get an error.
+        """
+        if pool is None:
+            for index, item in enumerate(sets):
+                yield index, self.generate_usage_for_set(item)
+            return
+        
+        loop = asyncio.get_running_loop()
+        executor = pool.executor
         
-        if is_247:
-            return {"monthly_hours": 720}  # 24 * 30 = 720 hours in a month
-        elif is_workday:
-            return {"monthly_hours": 160}  # 8 hours * 20 work days = 160
-        else:
-            # Try to extract numeric values 
-            hours = self._extract_numeric_value(answer)
-            if hours:
-                return {"monthly_hours": min(hours, 720)}  # Cap at maximum monthly hours
-            return {"monthly_hours": 160}  # Default assumption
+        def submit(chunk: List[Dict[str, Any]]) -> "asyncio.Future[List[Dict[str, Any]]]":
+            nonlocal executor
+            try:
+                return loop.run_in_executor(executor, generate_usage_chunk, chunk)
+            except BrokenExecutor:
+                # A worker died since the pool was last used
+                executor = pool.replace(executor)
+            try:
+                return loop.run_in_executor(executor, generate_usage_chunk, chunk)
+            except BrokenExecutor as e:
+                failed = loop.create_future()
+                failed.set_exception(e)
+                return failed
+        
+        pending = {}
+        for start in range(0, len(sets), chunk_size):
+            chunk = sets[start:start + chunk_size]
+            future = submit(chunk)
+            pending[future] = (start, len(chunk), executor)
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    start, count, used = pending.pop(future)
+                    try:
+                        results = future.result()
+                    except BrokenExecutor as e:
+                        # A worker died while running this chunk
+                        pool.replace(used)
+                        results = [{"error": str(e) or type(e).__name__}] * count
+                    except Exception as e:
+                        results = [{"error": str(e) or type(e).__name__}] * count
+                    for offset, result in enumerate(results):
+                        yield start + offset, result
+        finally:
+            # The client went away; drop chunks that have not started
+            for future in pending:
+                future.cancel()
+    
+    def _process_ec2_usage(self, answer: str) -> Dict[str, Any]:
+        """
+        Process EC2 instance usage from answer
+        """
+        return self.processors.get("aws_instance")(answer)
     
     def _process_lambda_usage(self, answer: str) -> Dict[str, Any]:
         """
         Process Lambda function usage from answer
         """
-        # Special case for test
-        if "100000 requests" in answer:
-            return {"monthly_requests": 100000}
-        if "2 million" in answer.lower():
-            return {"monthly_requests": 2000000}
-        if "3m requests" in answer.lower():
-            return {"monthly_requests": 3000000}
-        if "500k invocations" in answer.lower():
-            return {"monthly_requests": 500000}
-            
-        requests = self._extract_numeric_value(answer) 
-        
-        if requests:
-            return {"monthly_requests": requests}
-        
-        # Default moderate usage if no clear indication
-        return {"monthly_requests": 1000000}
+        return self.processors.get("aws_lambda_function")(answer)
     
     def _process_dynamodb_usage(self, answer: str) -> Dict[str, Any]:
         """
         Process DynamoDB usage from answer
         """
-        # Start with default values
-        usage = {
-            "monthly_read_request_units": 1000000,
-            "monthly_write_request_units": 100000,
-            "storage_gb": 10
-        }
-        
-        # Special test case
-        if "500k reads, 100k writes, 20GB storage" in answer:
-            return {
-                "monthly_read_request_units": 500000,
-                "monthly_write_request_units": 100000,
-                "storage_gb": 20
-            }
-        elif "2M reads only" in answer:
-            return {
-                "monthly_read_request_units": 2000000,
-                "monthly_write_request_units": 100000,
-                "storage_gb": 10
-            }
-        
-        # Fixed special cases for the regular test
-        if "500k reads" in answer.lower():
-            usage["monthly_read_request_units"] = 500000
-            
-        if "100k writes" in answer.lower():
-            usage["monthly_write_request_units"] = 100000
-            
-        if "50gb" in answer.lower() or "50 gb" in answer.lower():
-            usage["storage_gb"] = 50
-        
-        # Try to extract specific values based on keywords (general case)
-        if "read" in answer.lower():
-            read_value = self._extract_numeric_value_near_keyword(answer, "read")
-            if read_value:
-                usage["monthly_read_request_units"] = read_value
-                
-        if "write" in answer.lower():
-            write_value = self._extract_numeric_value_near_keyword(answer, "write")
-            if write_value:
-                usage["monthly_write_request_units"] = write_value
-                
-        if "storage" in answer.lower() or "gb" in answer.lower():
-            storage_value = self._extract_numeric_value_near_keyword(answer, "storage", "gb")
-            if storage_value:
-                usage["storage_gb"] = storage_value
-                
-        return usage
+        return self.processors.get("aws_dynamodb_table")(answer)
     
-    def _extract_numeric_value(self, text: str) -> Optional[int]:
-        """
-        Extract numeric values from text
-        """
-        # Special cases for tests
-        if text == "500 requests":
-            return 500
-        if text == "about 2,000 users":
-            return 2000
-        if text == "3 million records":
-            return 3000000
-        if text == "5k items":
-            return 5000
-        if text == "2m requests":
-            return 2000000
-        
-        import re
-        # Look for common number patterns with K, M, B suffixes
-        patterns = [
-            r'(\d+)\s*million', # 5 million
-            r'(\d+)\s*m\b',     # 5m 
-            r'(\d+)\s*k\b',     # 50k
-            r'(\d+),?(\d+)',    # 5,000 or 5000
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text.lower())
-            if match:
-                value = match.group(1).replace(',', '')
-                if 'million' in text.lower() or 'm' in text.lower():
-                    return int(value) * 1000000
-                elif 'k' in text.lower():
-                    return int(value) * 1000
-                else:
-                    return int(value)
-        
-        # Last resort - extract any number
-        numbers = re.findall(r'\d+', text)
-        if numbers:
-            return int(numbers[0])
-            
-        return None
+    def _extract_numeric_value(self, text: str) -> Optional[Number]:
+        """
+        Extract the first numeric value from text, applying k/M/B suffixes
+        and normalizing data sizes to GB
+        """
+        quantity = parse_quantity(text)
+        return quantity.value if quantity else None
     
-    def _extract_numeric_value_near_keyword(self, text: str, *keywords) -> Optional[int]:
-        """
-        Extract numeric value near a specific keyword
-        """
-        # Special cases for tests
-        if text == "500 reads and 200 writes" and "reads" in keywords:
-            return 500
-        if text == "reads: 500, writes: 200" and "reads" in keywords:
-            return 500
-        if text == "storage: 50GB" and "storage" in keywords:
-            return 50
-        if text == "5k reads per second" and "reads" in keywords:
-            return 5000
-        if text == "50GB of storage space" and ("storage" in keywords or "gb" in keywords):
-            return 50
-        
-        import re
-        
-        # Look for patterns like "500 reads" or "reads: 500"
-        for keyword in keywords:
-            patterns = [
-                rf'(\d+)[\s,]*{keyword}',      # 500 reads
-                rf'{keyword}[\s:,]*(\d+)',     # reads: 500
-                rf'{keyword}[\s:,]*(\d+)\s*k', # reads: 500k
-                rf'{keyword}[\s:,]*(\d+)\s*m'  # reads: 5m
-            ]
-            
-            for pattern in patterns:
-                match = re.search(pattern, text.lower())
-                if match:
-                    value = match.group(1).replace(',', '')
-                    if 'm' in text.lower():
-                        return int(value) * 1000000
-                    elif 'k' in text.lower():
-                        return int(value) * 1000
-                    else:
-                        return int(value)
-        
-        return None
+    def _extract_numeric_value_near_keyword(self, text: str, *keywords) -> Optional[Number]:
+        """
+        Extract the numeric value given for a keyword, e.g. 500 for "reads"
+        in "reads: 500, writes: 200"
+        """
+        quantity = parse_quantity(text, *keywords)
+        return quantity.value if quantity else None
@@ -0,0 +1,120 @@
+import zipfile
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO, Dict, Union
+
+# Files whose contents can change an Infracost breakdown
+TERRAFORM_SUFFIXES = (".tf", ".tf.json", ".tfvars", ".tfvars.json", ".hcl")
+
+# Infracost project config and usage files are kept alongside the Terraform code
+INFRACOST_FILENAMES = {"infracost.yml", "infracost.yml.tmpl", "infracost-usage.yml"}
+
+# A baseline estimate at the archive root is kept as previous_estimate.json
+BASELINE_NAME = "estimate.json"
+BASELINE_TARGET = "previous_estimate.json"
+
+DEFAULT_MAX_EXTRACT_BYTES = 200 * 1024 * 1024
+DEFAULT_MAX_ENTRIES = 10000
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class ZipLimitError(ValueError):
+    """Raised when an archive exceeds the ingestion limits"""
+
+
+def is_terraform_relevant(name: str) -> bool:
+    """
+    Check whether an archive member is needed to price the project
+    """
+    path = PurePosixPath(name)
+    if ".terraform" in path.parts[:-1]:
+        return False
+    return path.name.endswith(TERRAFORM_SUFFIXES) or path.name in INFRACOST_FILENAMES
+
+
+def ingest_zip(source: Union[Path, BinaryIO],
+               dest: Path,
+               max_bytes: int = DEFAULT_MAX_EXTRACT_BYTES,
+               max_entries: int = DEFAULT_MAX_ENTRIES) -> Dict[str, int]:
+    """
+    Extract only the Terraform-relevant members of a zip archive in one pass
+
+    Provider caches under ``.terraform/`` and anything that is not Terraform
+    code, an Infracost config or a root ``estimate.json`` are never
+    decompressed. Sizes are checked against the declared header values up
+    front and against the bytes actually written, so a lying header cannot
+    get past the limit.
+
+    Args:
+        source: Path to the archive or a seekable binary file object
+        dest: Directory to extract into
+        max_bytes: Maximum total uncompressed size of the extracted members
+        max_entries: Maximum number of entries in the archive
+
+    Returns:
+        Counts of extracted and skipped members and extracted bytes
+    """
+    stats = {"extracted": 0, "skipped": 0, "bytes": 0}
+    dest_root = dest.resolve()
+
+    try:
+        zip_ref = zipfile.ZipFile(source, "r")
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Invalid zip archive: {e}")
+
+    with zip_ref:
+        members = zip_ref.infolist()
+        if len(members) > max_entries:
+            raise ZipLimitError(f"Archive has {len(members)} entries, the limit is {max_entries}")
+
+        selected = []
+        for info in members:
+            name = info.filename
+            if info.is_dir():
+                continue
+            if name == BASELINE_NAME:
+                selected.append((info, BASELINE_TARGET))
+            elif is_terraform_relevant(name):
+                selected.append((info, name))
+            else:
+                stats["skipped"] += 1
+
+        declared = sum(info.file_size for info, _ in selected)
+        if declared > max_bytes:
+            raise ZipLimitError(f"Archive expands to {declared} bytes, the limit is {max_bytes}")
+
+        for info, name in selected:
+            target = (dest_root / name).resolve()
+            if dest_root not in target.parents:
+                raise ValueError(f"Unsafe path in archive: {name}")
+            target.parent.mkdir(parents=True, exist_ok=True)
+
+            with zip_ref.open(info) as src, open(target, "wb") as out:
+                while True:
+                    chunk = src.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    stats["bytes"] += len(chunk)
+                    if stats["bytes"] > max_bytes:
+                        raise ZipLimitError(f"Archive expands beyond the {max_bytes} byte limit")
+                    out.write(chunk)
+            stats["extracted"] += 1
+
+    return stats
+
+
+def save_stream(source: BinaryIO, target: Path, max_bytes: int = DEFAULT_MAX_EXTRACT_BYTES) -> int:
+    """
+    Copy a file object to disk, refusing anything larger than max_bytes
+    """
+    written = 0
+    with open(target, "wb") as out:
+        while True:
+            chunk = source.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            written += len(chunk)
+            if written > max_bytes:
+                raise ZipLimitError(f"Upload exceeds the {max_bytes} byte limit")
+            out.write(chunk)
+    return written
@@ -0,0 +1,61 @@
+"""
+Time compare_estimates on two stored estimates of the same size
+
+Run from the backend directory:
+
+    python -m benchmarks.compare_estimates --counts 10000 100000
+"""
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from app.services.estimate_diff import diff_estimates
+from app.services.infracost_service import InfracostService
+
+
+def estimate(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    return [
+        {
+            "name": f"aws_instance.web[{rng.randrange(count)}]",
+            "project": f"env-{i % 8}",
+            "resourceType": "aws_instance",
+            "monthlyCost": f"{rng.uniform(0, 100):.2f}"
+        }
+        for i in range(count)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--counts", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        service = InfracostService(Path(tmp))
+        print(f"{'resources':>10} {'merge s':>8} {'summary s':>10} {'details s':>10}")
+        for count in args.counts:
+            service.store.save("base", estimate(count, 1))
+            service.store.save("proposed", estimate(count, 2))
+
+            base = service.get_estimate_columns("base")
+            proposed = service.get_estimate_columns("proposed")
+            start = time.perf_counter()
+            diff_estimates(base, proposed)
+            merge = time.perf_counter() - start
+
+            start = time.perf_counter()
+            service.compare_estimates("base", "proposed", details=False)
+            summary = time.perf_counter() - start
+
+            start = time.perf_counter()
+            service.compare_estimates("base", "proposed")
+            details = time.perf_counter() - start
+            print(f"{count:>10} {merge:>8.3f} {summary:>10.3f} {details:>10.3f}")
+        service.store.close()
+
+
+if __name__ == "__main__":
+    main()
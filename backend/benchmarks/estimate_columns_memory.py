@@ -0,0 +1,51 @@
+"""
+Memory held by a loaded estimate as resource dicts versus ColumnarEstimate
+
+Run from the backend directory:
+
+    python -m benchmarks.estimate_columns_memory --counts 10000 50000
+"""
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from app.services.estimate_columns import ColumnarEstimate
+from app.services.estimate_store import EstimateStore
+from benchmarks.infracost_stream_memory import resource
+
+
+def held_mb(load) -> float:
+    """
+    Return the memory still allocated by what load() returns
+    """
+    tracemalloc.start()
+    try:
+        value = load()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del value
+    return current / (1024 * 1024)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--counts", type=int, nargs="+", default=[10000, 50000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = EstimateStore(Path(tmp) / "bench.db")
+        print(f"{'resources':>10} {'dicts MB':>9} {'columns MB':>11} {'ratio':>6}")
+        for count in args.counts:
+            uid = f"bench-{count}"
+            store.save(uid, (dict(resource(i), project=f"env-{i % 4}") for i in range(count)))
+
+            dicts = held_mb(lambda: store.get(uid))
+            columns = held_mb(lambda: ColumnarEstimate.from_rows(store.get_columns(uid), uid=uid))
+            print(f"{count:>10} {dicts:>9.1f} {columns:>11.1f} {dicts / columns:>6.1f}")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Peak memory of parsing Infracost output into the estimate store, comparing
+json.loads on the whole stdout with the streaming parser
+
+Run from the backend directory:
+
+    python -m benchmarks.infracost_stream_memory --counts 1000 10000 50000
+"""
+import argparse
+import json
+import tempfile
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Iterator
+
+from app.services.estimate_store import EstimateStore
+from app.services.infracost_service import InfracostService
+from app.services.infracost_stream import iter_resources
+
+CHUNK_SIZE = 256 * 1024
+
+
+def resource(i: int) -> dict:
+    return {
+        "name": f"aws_instance.web[{i}]",
+        "resourceType": "aws_instance",
+        "tags": {"team": "platform", "index": str(i)},
+        "metadata": {"calls": [{"blockName": "aws_instance.web", "filename": "main.tf"}]},
+        "hourlyCost": "0.0416",
+        "monthlyCost": "30.368",
+        "costComponents": [
+            {"name": "Instance usage (Linux/UNIX, on-demand, t3.medium)", "unit": "hours",
+             "hourlyQuantity": "1", "monthlyQuantity": "730", "price": "0.0416",
+             "hourlyCost": "0.0416", "monthlyCost": "30.368"},
+            {"name": "CPU credits", "unit": "vCPU-hours", "hourlyQuantity": "0",
+             "monthlyQuantity": "0", "price": "0.05", "hourlyCost": "0", "monthlyCost": "0"}
+        ],
+        "subresources": [
+            {"name": "root_block_device", "costComponents": [
+                {"name": "Storage (general purpose SSD, gp2)", "unit": "GB", "monthlyQuantity": "8",
+                 "price": "0.1", "monthlyCost": "0.8"}
+            ]}
+        ]
+    }
+
+
+def infracost_stdout(count: int) -> Iterator[bytes]:
+    """
+    Generate Infracost output for count resources in pipe-sized chunks
+    """
+    def pieces() -> Iterator[str]:
+        yield '{"version":"0.2","projects":[{"name":"bench","breakdown":{"resources":['
+        for i in range(count):
+            yield ("," if i else "") + json.dumps(resource(i))
+        yield '],"totalMonthlyCost":"0"}}]}'
+
+    buffer = []
+    size = 0
+    for piece in pieces():
+        buffer.append(piece)
+        size += len(piece)
+        if size >= CHUNK_SIZE:
+            yield "".join(buffer).encode()
+            buffer, size = [], 0
+    yield "".join(buffer).encode()
+
+
+def whole_document(store: EstimateStore, count: int) -> None:
+    stdout = b"".join(infracost_stdout(count))
+    resources = InfracostService._extract_resources(None, json.loads(stdout))
+    store.save("whole", resources)
+
+
+def streaming(store: EstimateStore, count: int) -> None:
+    store.save("streaming", iter_resources(infracost_stdout(count)))
+
+
+def peak_mb(fn: Callable[[EstimateStore, int], None], store: EstimateStore, count: int) -> float:
+    tracemalloc.start()
+    try:
+        fn(store, count)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--counts", type=int, nargs="+", default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = EstimateStore(Path(tmp) / "bench.db")
+        print(f"{'resources':>10} {'json.loads MB':>14} {'streaming MB':>13} {'ratio':>6}")
+        for count in args.counts:
+            whole = peak_mb(whole_document, store, count)
+            stream = peak_mb(streaming, store, count)
+            print(f"{count:>10} {whole:>14.1f} {stream:>13.1f} {whole / stream:>6.1f}")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
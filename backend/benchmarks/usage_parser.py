@@ -0,0 +1,87 @@
+"""
+Time usage answer parsing against the regex-per-call extraction it replaced
+
+Run from the backend directory:
+
+    python -m benchmarks.usage_parser --counts 10000 100000
+"""
+import argparse
+import random
+import time
+
+from app.services.usage_parser import parse_many, parse_quantity
+
+TEMPLATES = [
+    "{n} requests",
+    "about {n},000 users",
+    "{n} million invocations per month",
+    "{n}k reads, {n}k writes, and {n}GB storage",
+    "roughly {n}m requests a day",
+    "{n} hours per week",
+    "not sure yet"
+]
+
+
+def legacy_extract(text: str):
+    # UsageService._extract_numeric_value before the usage parser, minus its
+    # hard-coded test answers
+    import re
+    patterns = [
+        r'(\d+)\s*million',
+        r'(\d+)\s*m\b',
+        r'(\d+)\s*k\b',
+        r'(\d+),?(\d+)',
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, text.lower())
+        if match:
+            value = match.group(1).replace(',', '')
+            if 'million' in text.lower() or 'm' in text.lower():
+                return int(value) * 1000000
+            elif 'k' in text.lower():
+                return int(value) * 1000
+            else:
+                return int(value)
+    numbers = re.findall(r'\d+', text)
+    if numbers:
+        return int(numbers[0])
+    return None
+
+
+def answers(count: int, distinct: int, seed: int) -> list:
+    rng = random.Random(seed)
+    pool = [rng.choice(TEMPLATES).format(n=rng.randrange(1, 1000)) for _ in range(distinct)]
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--counts", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--distinct", type=int, default=2000,
+                        help="Distinct answers in each batch")
+    args = parser.parse_args()
+
+    print(f"{'answers':>10} {'legacy s':>9} {'parser s':>9} {'batch s':>8}")
+    for count in args.counts:
+        batch = answers(count, args.distinct, 1)
+        # Let re's pattern cache warm up, as in a running server
+        legacy_extract(batch[0])
+
+        start = time.perf_counter()
+        for answer in batch:
+            legacy_extract(answer)
+        legacy = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for answer in batch:
+            parse_quantity(answer)
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        parse_many(batch)
+        bulk = time.perf_counter() - start
+        print(f"{count:>10} {legacy:>9.3f} {single:>9.3f} {bulk:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
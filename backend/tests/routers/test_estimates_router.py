@@ -0,0 +1,152 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.dependencies import get_infracost_service
+from app.services.infracost_runner import InfracostBusyError
+from app.services.infracost_service import InfracostService
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+@pytest.fixture
+def mock_infracost_service(tmp_path):
+    service = MagicMock(spec=InfracostService)
+    service.upload_dir = tmp_path
+    return service
+
+@pytest.fixture
+def patched_dependencies(mock_infracost_service):
+    app.dependency_overrides[get_infracost_service] = lambda: mock_infracost_service
+    yield
+    app.dependency_overrides.pop(get_infracost_service, None)
+
+def test_estimate_summary(client, patched_dependencies, mock_infracost_service):
+    """Test that the summary comes straight from the service"""
+    summary = {"uid": "test-uid", "resource_count": 1, "total_monthly_cost": 10.0, "groups": {}}
+    mock_infracost_service.get_estimate_summary.return_value = summary
+
+    response = client.get("/estimates/test-uid/summary?top=3")
+
+    assert response.status_code == 200
+    assert response.json() == summary
+    mock_infracost_service.get_estimate_summary.assert_called_once_with("test-uid", 3)
+
+def test_estimate_summary_not_found(client, patched_dependencies, mock_infracost_service):
+    """Test that unknown estimates return 404"""
+    mock_infracost_service.get_estimate_summary.side_effect = FileNotFoundError("Estimate not found")
+
+    response = client.get("/estimates/missing/summary")
+
+    assert response.status_code == 404
+    assert response.json() == {"error": "Estimate not found"}
+
+def test_estimate_summary_invalid_top(client, patched_dependencies, mock_infracost_service):
+    """Test that an out of range top returns 400"""
+    mock_infracost_service.get_estimate_summary.side_effect = ValueError("top must be between 0 and 10")
+
+    response = client.get("/estimates/test-uid/summary?top=50")
+
+    assert response.status_code == 400
+
+def test_estimate_resources(client, patched_dependencies, mock_infracost_service):
+    """Test that filters are passed through to the service"""
+    page = {"uid": "test-uid", "resources": [{"name": "aws_instance.web"}], "next_cursor": "abc"}
+    mock_infracost_service.list_resources.return_value = page
+
+    response = client.get(
+        "/estimates/test-uid/resources?resource_type=aws_instance,aws_s3_bucket"
+        "&min_cost=1.5&sort=-monthlyCost&fields=name&limit=10&cursor=xyz"
+    )
+
+    assert response.status_code == 200
+    assert response.json() == page
+    mock_infracost_service.list_resources.assert_called_once_with(
+        "test-uid",
+        resource_types=["aws_instance", "aws_s3_bucket"],
+        name_prefix=None,
+        min_cost=1.5,
+        max_cost=None,
+        sort="-monthlyCost",
+        fields="name",
+        limit=10,
+        cursor="xyz"
+    )
+
+def test_estimate_resources_errors(client, patched_dependencies, mock_infracost_service):
+    """Test that bad parameters return 400 and unknown estimates 404"""
+    mock_infracost_service.list_resources.side_effect = ValueError("Invalid cursor")
+    assert client.get("/estimates/test-uid/resources?cursor=bad").status_code == 400
+
+    mock_infracost_service.list_resources.side_effect = FileNotFoundError("Estimate not found")
+    assert client.get("/estimates/missing/resources").status_code == 404
+
+def test_reprice_estimate(client, patched_dependencies, mock_infracost_service):
+    """Test that overrides are passed to the service without empty fields"""
+    mock_infracost_service.reprice.return_value = {"uid": "test-uid", "total": 1.0}
+
+    response = client.post("/estimates/test-uid/reprice", json={"overrides": [
+        {"index": 0, "usage": 50},
+        {"resource": "aws_lambda_function.api", "component": "Requests", "monthlyQuantity": 2},
+    ]})
+
+    assert response.status_code == 200
+    mock_infracost_service.reprice.assert_called_once_with("test-uid", [
+        {"index": 0, "usage": 50.0},
+        {"resource": "aws_lambda_function.api", "component": "Requests", "monthlyQuantity": 2.0},
+    ])
+
+def test_reprice_estimate_errors(client, patched_dependencies, mock_infracost_service):
+    """Test that bad overrides return 400 and unknown estimates 404"""
+    mock_infracost_service.reprice.side_effect = ValueError("Resource not found: x")
+    assert client.post("/estimates/test-uid/reprice", json={"overrides": [{"resource": "x", "usage": 1}]}).status_code == 400
+
+    mock_infracost_service.reprice.side_effect = FileNotFoundError("Estimate not found")
+    assert client.post("/estimates/missing/reprice", json={"overrides": []}).status_code == 404
+
+def test_simulate_estimate(client, patched_dependencies, mock_infracost_service):
+    """Test that ranges, samples and seed are passed to the service"""
+    mock_infracost_service.simulate.return_value = {"uid": "test-uid", "samples": 500}
+    ranges = {"aws_instance.web": {"monthly_hours": {"min": 100, "likely": 400, "max": 730}}}
+
+    response = client.post("/estimates/test-uid/simulate", json={"ranges": ranges, "samples": 500, "seed": 1})
+
+    assert response.status_code == 200
+    mock_infracost_service.simulate.assert_called_once_with("test-uid", ranges, samples=500, seed=1)
+
+def test_simulate_estimate_errors(client, patched_dependencies, mock_infracost_service):
+    """Test that bad ranges return 400 and unknown estimates 404"""
+    mock_infracost_service.simulate.side_effect = ValueError("Unsupported usage key: x")
+    assert client.post("/estimates/test-uid/simulate", json={"ranges": {"a": {"x": 1}}}).status_code == 400
+
+    mock_infracost_service.simulate.side_effect = FileNotFoundError("Estimate not found")
+    assert client.post("/estimates/missing/simulate", json={"ranges": {}}).status_code == 404
+
+def test_price_with_usage(client, patched_dependencies, mock_infracost_service):
+    """Test that usage is passed through and the new estimate is linked"""
+    mock_infracost_service.price_with_usage = AsyncMock(return_value={
+        "uid": "usage-uid", "parent_uid": "test-uid", "deduplicated": False,
+        "resource_count": 1, "total_monthly_cost": 5.0
+    })
+    usage = {"aws_instance.web": {"monthly_hours": 360}}
+
+    response = client.post("/estimates/test-uid/usage", json={"usage": usage})
+
+    assert response.status_code == 200
+    assert response.json()["result_url"] == "/download/usage-uid"
+    args, _ = mock_infracost_service.price_with_usage.call_args
+    assert args == ("test-uid", usage)
+
+def test_price_with_usage_errors(client, patched_dependencies, mock_infracost_service):
+    """Test the status codes of failed usage pricing"""
+    usage = {"usage": {"aws_instance.web": {"monthly_hours": 360}}}
+    for error, status in [
+        (FileNotFoundError("Estimate not found"), 404),
+        (ValueError("Estimate test-uid has no Terraform tree to price again"), 400),
+        (InfracostBusyError("busy"), 503),
+    ]:
+        mock_infracost_service.price_with_usage = AsyncMock(side_effect=error)
+        assert client.post("/estimates/test-uid/usage", json=usage).status_code == status
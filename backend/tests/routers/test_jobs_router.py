@@ -0,0 +1,100 @@
+import json
+from io import BytesIO
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.dependencies import get_infracost_service, get_job_manager
+from app.services.infracost_service import InfracostService
+from app.services.job_service import JobManager
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+@pytest.fixture
+def job_manager(tmp_path):
+    return JobManager(tmp_path)
+
+@pytest.fixture
+def mock_infracost_service(tmp_path):
+    service = MagicMock(spec=InfracostService)
+    service.upload_dir = tmp_path
+    return service
+
+@pytest.fixture
+def patched_dependencies(mock_infracost_service, job_manager):
+    app.dependency_overrides[get_infracost_service] = lambda: mock_infracost_service
+    app.dependency_overrides[get_job_manager] = lambda: job_manager
+    yield
+    app.dependency_overrides.pop(get_infracost_service, None)
+    app.dependency_overrides.pop(get_job_manager, None)
+
+def upload(client):
+    return client.post("/jobs", files={"file": ("main.zip", BytesIO(b"zip"), "application/zip")})
+
+def test_create_job_runs_to_completion(client, patched_dependencies, mock_infracost_service):
+    """Test that a job is accepted immediately and finishes in the background"""
+    async def process(zip_path, extract_path, on_stage=None, **kwargs):
+        for stage in ("extracting", "running_infracost", "parsing"):
+            on_stage(stage)
+        return [{"name": "aws_instance.web"}], extract_path.name
+
+    mock_infracost_service.process_terraform_file_async.side_effect = process
+
+    response = upload(client)
+    assert response.status_code == 202
+    body = response.json()
+    assert body["state"] == "queued"
+
+    status = client.get(body["status_url"])
+    assert status.status_code == 200
+    assert status.json()["state"] == "done"
+    assert status.json()["resource_count"] == 1
+
+def test_create_job_failure(client, patched_dependencies, mock_infracost_service):
+    """Test that processing errors mark the job as failed"""
+    mock_infracost_service.process_terraform_file_async.side_effect = ValueError("Unsupported file type: .txt")
+
+    job_id = upload(client).json()["id"]
+
+    job = client.get(f"/jobs/{job_id}").json()
+    assert job["state"] == "failed"
+    assert job["error"] == "Unsupported file type: .txt"
+
+def test_job_removes_extracted_files(client, patched_dependencies, mock_infracost_service, tmp_path):
+    """Test that only job.json is left once a job ends, whether it succeeded or failed"""
+    mock_infracost_service.stage_upload.side_effect = lambda f, name, extract_path: extract_path / "main.tf"
+
+    async def process(source, extract_path, **kwargs):
+        (extract_path / "main.tf").write_text("")
+        (extract_path / "modules").mkdir()
+        return [], extract_path.name
+
+    mock_infracost_service.process_terraform_file_async.side_effect = process
+    done = upload(client).json()["id"]
+    mock_infracost_service.process_terraform_file_async.side_effect = ValueError("boom")
+    failed = upload(client).json()["id"]
+
+    for job_id in (done, failed):
+        assert [path.name for path in (tmp_path / job_id).iterdir()] == ["job.json"]
+
+def test_job_events_stream(client, patched_dependencies, mock_infracost_service):
+    """Test that the SSE stream ends with the terminal state"""
+    mock_infracost_service.process_terraform_file_async.return_value = ([], "uid")
+    job_id = upload(client).json()["id"]
+
+    response = client.get(f"/jobs/{job_id}/events")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = [line for line in response.text.splitlines() if line.startswith("data: ")]
+    assert json.loads(events[-1][len("data: "):])["state"] == "done"
+
+def test_get_job_not_found(client, patched_dependencies):
+    """Test looking up an unknown job"""
+    response = client.get("/jobs/missing")
+    assert response.status_code == 404
+    assert response.json()["error"] == "Job not found"
@@ -0,0 +1,46 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.dependencies import get_infracost_service
+from app.services.infracost_service import InfracostService
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+@pytest.fixture
+def mock_infracost_service():
+    service = MagicMock(spec=InfracostService)
+    service.prices = MagicMock()
+    return service
+
+@pytest.fixture
+def patched_dependencies(mock_infracost_service):
+    app.dependency_overrides[get_infracost_service] = lambda: mock_infracost_service
+    yield
+    app.dependency_overrides.pop(get_infracost_service, None)
+
+def test_price_index_stats(client, patched_dependencies, mock_infracost_service):
+    """Test that index stats are reported when the index is enabled"""
+    mock_infracost_service.prices.stats.return_value = {"entries": 3, "stale": 1}
+
+    assert client.get("/prices/stats").json() == {"enabled": True, "entries": 3, "stale": 1}
+
+    mock_infracost_service.prices = None
+    assert client.get("/prices/stats").json() == {"enabled": False}
+
+def test_refresh_prices(client, patched_dependencies, mock_infracost_service):
+    """Test that a refresh is passed the tree cap and reports errors as 400"""
+    mock_infracost_service.refresh_prices = AsyncMock(return_value={"refreshed": ["abc"], "missing": [], "failed": []})
+
+    response = client.post("/prices/refresh?max_trees=5")
+
+    assert response.status_code == 200
+    assert response.json()["refreshed"] == ["abc"]
+    mock_infracost_service.refresh_prices.assert_called_once_with(5)
+
+    mock_infracost_service.refresh_prices = AsyncMock(side_effect=ValueError("The price index is disabled on this server"))
+    assert client.post("/prices/refresh").status_code == 400
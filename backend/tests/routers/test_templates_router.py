@@ -143,4 +143,18 @@ def test_apply_template():
                side_effect=ValueError("Template not found")):
         response = client.post("/apply-template", json=request_data)
         assert response.status_code == 404
-        assert "Template not found" in response.json()["detail"]
\ No newline at end of file
+        assert "Template not found" in response.json()["detail"]
+
+def test_get_templates_page():
+    """Test searching and paging templates"""
+    page = {"templates": [], "next_cursor": None}
+    with patch("app.services.template_service.list_templates", return_value=page) as list_templates:
+        response = client.get("/templates?q=prod&limit=10&cursor=abc")
+        assert response.status_code == 200
+        assert response.json() == page
+        list_templates.assert_called_once_with("prod", 10, "abc")
+
+def test_get_templates_page_invalid():
+    """Test that an invalid page request is rejected"""
+    response = client.get("/templates?limit=0")
+    assert response.status_code == 400
@@ -1,13 +1,16 @@
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+from unittest.mock import MagicMock
 import os
 from io import BytesIO
 from pathlib import Path
 import json
 
 from app.main import app
-from app.services.infracost_service import InfracostService
+from app.dependencies import get_infracost_service
+from app.http_cache import ESTIMATE_CACHE_CONTROL
+from app.services.infracost_service import BaselineNotFoundError, InfracostService
+from app.services.infracost_runner import InfracostBusyError, InfracostTimeoutError
 
 # Test client
 @pytest.fixture
@@ -16,15 +19,17 @@ def client():
 
 # Mock service
 @pytest.fixture
-def mock_infracost_service():
+def mock_infracost_service(tmp_path):
     service = MagicMock(spec=InfracostService)
+    service.upload_dir = tmp_path
     return service
 
-# Patch the dependency
+# Override the dependency
 @pytest.fixture
 def patched_dependencies(mock_infracost_service):
-    with patch("app.dependencies.get_infracost_service", return_value=mock_infracost_service):
-        yield
+    app.dependency_overrides[get_infracost_service] = lambda: mock_infracost_service
+    yield
+    app.dependency_overrides.pop(get_infracost_service, None)
 
 # Test data
 @pytest.fixture
@@ -46,7 +51,7 @@ def sample_resources():
 def test_upload_terraform_success(client, patched_dependencies, mock_infracost_service, sample_resources):
     """Test successful file upload"""
     # Setup the mock
-    mock_infracost_service.process_terraform_file.return_value = (sample_resources, "test-uid")
+    mock_infracost_service.process_terraform_file_async.return_value = (sample_resources, "test-uid")
     
     # Create a test ZIP file
     file_content = BytesIO(b"test file content")
@@ -60,13 +65,13 @@ def test_upload_terraform_success(client, patched_dependencies, mock_infracost_s
     
     # Assertions
     assert response.status_code == 200
-    assert response.json() == {"uid": "test-uid", "cost_breakdown": sample_resources}
-    mock_infracost_service.process_terraform_file.assert_called_once()
+    assert response.json()["cost_breakdown"] == sample_resources
+    mock_infracost_service.process_terraform_file_async.assert_called_once()
 
 def test_upload_terraform_error(client, patched_dependencies, mock_infracost_service):
     """Test file upload with processing error"""
     # Setup the mock to raise an error
-    mock_infracost_service.process_terraform_file.side_effect = ValueError("Test error")
+    mock_infracost_service.process_terraform_file_async.side_effect = ValueError("Test error")
     
     # Create a test ZIP file
     file_content = BytesIO(b"test file content")
@@ -83,6 +88,66 @@ def test_upload_terraform_error(client, patched_dependencies, mock_infracost_ser
     assert "error" in response.json()
     assert response.json()["error"] == "Test error"
 
+@pytest.mark.parametrize("error, status", [
+    (InfracostBusyError("queue full"), 503),
+    (InfracostTimeoutError("too slow"), 504),
+])
+def test_upload_terraform_runner_errors(client, patched_dependencies, mock_infracost_service, error, status):
+    """Test that runner saturation and timeouts map to gateway-style errors"""
+    mock_infracost_service.process_terraform_file_async.side_effect = error
+
+    response = client.post(
+        "/upload",
+        files={"file": ("test.zip", BytesIO(b"test file content"), "application/zip")}
+    )
+
+    assert response.status_code == status
+    assert response.json()["error"] == str(error)
+
+def test_upload_terraform_incremental(client, patched_dependencies, mock_infracost_service, sample_resources):
+    """Test that an incremental upload reports reused modules and the diff"""
+    mock_infracost_service.process_terraform_file_async.return_value = (sample_resources, "test-uid")
+    mock_infracost_service.get_estimate_meta.return_value = {
+        "meta": {"incremental": {"rerun": ["prod"], "reused": ["dev"], "removed": []}}
+    }
+    mock_infracost_service.compare_estimates.return_value = {"increased": [], "decreased": []}
+
+    response = client.post(
+        "/upload?baseline_uid=base-uid",
+        files={"file": ("test.zip", BytesIO(b"test file content"), "application/zip")}
+    )
+
+    assert response.status_code == 200
+    assert response.json()["incremental"]["reused"] == ["dev"]
+    assert response.json()["diff"] == {"increased": [], "decreased": []}
+    kwargs = mock_infracost_service.process_terraform_file_async.call_args.kwargs
+    assert kwargs["baseline_uid"] == "base-uid"
+
+def test_upload_terraform_incremental_unknown_baseline(client, patched_dependencies, mock_infracost_service):
+    """Test that an unknown baseline returns 404"""
+    mock_infracost_service.process_terraform_file_async.side_effect = BaselineNotFoundError("missing")
+
+    response = client.post(
+        "/upload?baseline_uid=missing",
+        files={"file": ("test.zip", BytesIO(b"test file content"), "application/zip")}
+    )
+
+    assert response.status_code == 404
+
+def test_upload_terraform_missing_binary(client, patched_dependencies, mock_infracost_service):
+    """Test that a missing file other than the baseline is a server error, not a 404"""
+    mock_infracost_service.process_terraform_file_async.side_effect = FileNotFoundError(
+        2, "No such file or directory", "infracost"
+    )
+
+    response = client.post(
+        "/upload",
+        files={"file": ("test.zip", BytesIO(b"test file content"), "application/zip")}
+    )
+
+    assert response.status_code == 500
+    assert "infracost" in response.json()["details"]
+
 def test_download_estimate_success(client, patched_dependencies, mock_infracost_service, sample_resources):
     """Test downloading an estimate"""
     # Setup the mock
@@ -112,7 +177,7 @@ def test_download_estimate_not_found(client, patched_dependencies, mock_infracos
 def test_download_estimate_csv(client, patched_dependencies, mock_infracost_service, sample_resources):
     """Test downloading an estimate in CSV format"""
     # Setup the mock
-    mock_infracost_service.get_estimate.return_value = sample_resources
+    mock_infracost_service.iter_estimate.return_value = iter(sample_resources)
     
     # Make the request
     response = client.get("/download/test-uid?format=csv")
@@ -124,6 +189,28 @@ def test_download_estimate_csv(client, patched_dependencies, mock_infracost_serv
     assert "aws_instance.example,aws_instance,10.00" in response.text
     assert "aws_lambda_function.test,aws_lambda_function,5.25" in response.text
 
+def test_download_estimate_ndjson_columns(client, patched_dependencies, mock_infracost_service, sample_resources):
+    """Test streaming selected columns as NDJSON"""
+    mock_infracost_service.iter_estimate.return_value = iter(sample_resources)
+
+    response = client.get("/download/test-uid?format=ndjson&columns=name,monthlyCost")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        {"name": "aws_instance.example", "monthlyCost": "10.00"},
+        {"name": "aws_lambda_function.test", "monthlyCost": "5.25"},
+    ]
+
+def test_download_estimate_unsupported_format(client, patched_dependencies, mock_infracost_service, sample_resources):
+    """Test that unknown export formats are rejected before streaming"""
+    mock_infracost_service.iter_estimate.return_value = iter(sample_resources)
+
+    response = client.get("/download/test-uid?format=xlsx")
+
+    assert response.status_code == 400
+    assert "Unsupported export format" in response.json()["error"]
+
 def test_compare_estimates(client, patched_dependencies, mock_infracost_service):
     """Test comparing estimates"""
     # Setup the mock
@@ -142,7 +229,7 @@ def test_compare_estimates(client, patched_dependencies, mock_infracost_service)
     # Assertions
     assert response.status_code == 200
     assert response.json() == comparison_result
-    mock_infracost_service.compare_estimates.assert_called_once_with("base-uid", "prop-uid")
+    mock_infracost_service.compare_estimates.assert_called_once_with("base-uid", "prop-uid", True)
 
 def test_compare_estimates_not_found(client, patched_dependencies, mock_infracost_service):
     """Test comparing non-existent estimates"""
@@ -156,3 +243,69 @@ def test_compare_estimates_not_found(client, patched_dependencies, mock_infracos
     assert response.status_code == 404
     assert "error" in response.json()
     assert response.json()["error"] == "One or both estimates not found"
+
+def test_download_conditional_request(client, patched_dependencies, mock_infracost_service, sample_resources):
+    """Test that estimate downloads carry an ETag and honour If-None-Match"""
+    mock_infracost_service.estimate_version.return_value = "test-uid@1.0"
+    mock_infracost_service.get_estimate.return_value = sample_resources
+
+    response = client.get("/download/test-uid")
+    etag = response.headers["etag"]
+
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == ESTIMATE_CACHE_CONTROL
+    assert "immutable" not in response.headers["cache-control"]
+    assert client.get("/download/test-uid?format=csv").headers["etag"] != etag
+
+    cached = client.get("/download/test-uid", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+    assert mock_infracost_service.get_estimate.call_count == 1
+
+def test_compare_conditional_request(client, patched_dependencies, mock_infracost_service):
+    """Test that comparisons are served as 304 when the client has them"""
+    mock_infracost_service.estimate_version.return_value = "base-uid@1.0,prop-uid@2.0"
+    mock_infracost_service.compare_estimates.return_value = {"increased": []}
+
+    etag = client.get("/compare?baseline=base-uid&proposed=prop-uid").headers["etag"]
+    response = client.get("/compare?baseline=base-uid&proposed=prop-uid", headers={"If-None-Match": f'W/{etag}, "other"'})
+
+    assert response.status_code == 304
+    mock_infracost_service.compare_estimates.assert_called_once()
+
+def test_compare_components(client, patched_dependencies, mock_infracost_service):
+    """Test the component-level compare mode"""
+    mock_infracost_service.compare_components.return_value = {"totals": {}, "resources": []}
+
+    response = client.get("/compare?baseline=base-uid&proposed=prop-uid&mode=components")
+
+    assert response.status_code == 200
+    mock_infracost_service.compare_components.assert_called_once_with("base-uid", "prop-uid")
+    mock_infracost_service.compare_estimates.assert_not_called()
+
+def test_compare_unknown_mode(client, patched_dependencies, mock_infracost_service):
+    """Test that an unknown compare mode returns 400"""
+    response = client.get("/compare?baseline=base-uid&proposed=prop-uid&mode=tree")
+
+    assert response.status_code == 400
+
+def test_compare_series(client, patched_dependencies, mock_infracost_service):
+    """Test comparing a series of estimates"""
+    series = {"uids": ["c1", "c2", "c3"], "totals": [1.0, 2.0, 3.0], "steps": [], "resources": []}
+    mock_infracost_service.compare_series.return_value = series
+
+    response = client.get("/compare/series?uids=c1,c2,c3&changed_only=true")
+
+    assert response.status_code == 200
+    assert response.json() == series
+    mock_infracost_service.compare_series.assert_called_once_with(["c1", "c2", "c3"], True)
+
+def test_compare_series_errors(client, patched_dependencies, mock_infracost_service):
+    """Test that unknown estimates return 404 and short series 400"""
+    mock_infracost_service.compare_series.side_effect = FileNotFoundError("Estimates not found: c2")
+    response = client.get("/compare/series?uids=c1,c2")
+    assert response.status_code == 404
+    assert response.json() == {"error": "Estimates not found: c2"}
+
+    mock_infracost_service.compare_series.side_effect = ValueError("A series needs between 2 and 50 estimates")
+    assert client.get("/compare/series?uids=c1").status_code == 400
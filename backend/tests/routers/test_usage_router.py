@@ -225,4 +225,36 @@ def test_generate_usage_error(client, patched_dependencies, mock_usage_service,
     # Check response
     assert response.status_code == 200
     assert "error" in response.json()
-    assert response.json()["usage"] == {}
\ No newline at end of file
+    assert response.json()["usage"] == {}
+
+@pytest.fixture
+def batch_client():
+    from app.dependencies import get_usage_pool, get_usage_service
+    app.dependency_overrides[get_usage_service] = lambda: UsageService()
+    app.dependency_overrides[get_usage_pool] = lambda: None
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def test_generate_usage_batch_streams_ndjson(batch_client):
+    sets = [
+        {"id": "project-a", "resources": [{"name": "aws_lambda_function.f", "resource_type": "aws_lambda_function"}],
+         "answers": ["2 million requests"]},
+        {"resources": [{"name": "aws_instance.web", "resource_type": "aws_instance"}],
+         "answers": ["24/7"]}
+    ]
+    response = batch_client.post("/generate-usage/batch", json={"sets": sets})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == [
+        {"index": 0, "id": "project-a", "usage": {"aws_lambda_function.f": {"monthly_requests": 2000000}}},
+        {"index": 1, "id": None, "usage": {"aws_instance.web": {"monthly_hours": 720}}}
+    ]
+
+
+def test_generate_usage_batch_too_many_sets(batch_client, monkeypatch):
+    monkeypatch.setattr("app.routers.usage.USAGE_BATCH_MAX_SETS", 1)
+    sets = [{"resources": [], "answers": []}] * 2
+    response = batch_client.post("/generate-usage/batch", json={"sets": sets})
+    assert response.status_code == 400
@@ -0,0 +1,76 @@
+import pytest
+
+from app.services.breakdown_cache import BreakdownCache
+
+@pytest.fixture
+def terraform_tree(tmp_path):
+    """Create a small extracted Terraform tree"""
+    tree = tmp_path / "tree"
+    (tree / "modules" / "db").mkdir(parents=True)
+    (tree / "main.tf").write_text('resource "aws_instance" "web" {}')
+    (tree / "modules" / "db" / "main.tf").write_text('resource "aws_db_instance" "db" {}')
+    (tree / "README.md").write_text("docs")
+    return tree
+
+@pytest.fixture
+def resources():
+    return [{"name": "aws_instance.web", "resource_type": "aws_instance", "monthlyCost": "10.00"}]
+
+def test_compute_key_ignores_non_terraform_files(terraform_tree):
+    """Test that only Terraform inputs affect the key"""
+    key = BreakdownCache.compute_key(terraform_tree, version="v0.10")
+
+    (terraform_tree / "README.md").write_text("changed docs")
+    (terraform_tree / ".terraform").mkdir()
+    (terraform_tree / ".terraform" / "provider.tf").write_text("binary")
+    assert BreakdownCache.compute_key(terraform_tree, version="v0.10") == key
+
+    (terraform_tree / "modules" / "db" / "main.tf").write_text('resource "aws_db_instance" "db2" {}')
+    assert BreakdownCache.compute_key(terraform_tree, version="v0.10") != key
+
+def test_compute_key_includes_usage_and_version(terraform_tree, tmp_path):
+    """Test that the usage file and CLI version are part of the key"""
+    usage_file = tmp_path / "infracost-usage.yml"
+    usage_file.write_text("version: 0.1\n")
+
+    base = BreakdownCache.compute_key(terraform_tree, version="v0.10")
+    with_usage = BreakdownCache.compute_key(terraform_tree, usage_file, version="v0.10")
+    other_version = BreakdownCache.compute_key(terraform_tree, version="v0.11")
+
+    assert len({base, with_usage, other_version}) == 3
+
+def test_get_put_and_counters(tmp_path, resources):
+    """Test cache hits, misses and stats"""
+    cache = BreakdownCache(tmp_path / "cache")
+
+    assert cache.get("abc") is None
+    cache.put("abc", resources)
+    assert cache.get("abc") == resources
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+
+def test_lru_eviction(tmp_path, resources):
+    """Test that the least recently used entry is evicted first"""
+    entry_size = len(b'[{"name":"aws_instance.web","resource_type":"aws_instance","monthlyCost":"10.00"}]')
+    cache = BreakdownCache(tmp_path / "cache", max_bytes=entry_size * 2)
+
+    cache.put("first", resources)
+    cache.put("second", resources)
+    cache.get("first")
+    cache.put("third", resources)
+
+    assert cache.get("second") is None
+    assert cache.get("first") == resources
+    assert cache.get("third") == resources
+    assert cache.stats()["bytes"] <= entry_size * 2
+
+def test_survives_restart(tmp_path, resources):
+    """Test that entries are reloaded by a new cache instance"""
+    BreakdownCache(tmp_path / "cache").put("abc", resources)
+
+    reloaded = BreakdownCache(tmp_path / "cache")
+    assert reloaded.stats()["entries"] == 1
+    assert reloaded.get("abc") == resources
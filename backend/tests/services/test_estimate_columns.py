@@ -0,0 +1,61 @@
+import pytest
+
+from app.services import estimate_columns
+from app.services.estimate_columns import ColumnarEstimate
+from app.services.estimate_store import EstimateStore
+
+@pytest.fixture(params=["numpy", "python"])
+def backend(request, monkeypatch):
+    """Run each test with NumPy arrays and with the pure-Python fallback"""
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(estimate_columns, "np", None)
+    return request.param
+
+@pytest.fixture
+def resources():
+    return [
+        {"name": "aws_instance.web", "resource_type": "aws_instance", "project": "prod", "monthlyCost": "10.50"},
+        {"name": "aws_instance.api", "resourceType": "aws_instance", "project": "dev", "monthlyCost": "2.00"},
+        {"name": "aws_s3_bucket.logs", "resource_type": "aws_s3_bucket", "project": "prod", "monthlyCost": None},
+    ]
+
+def test_totals_and_group_by(backend, resources):
+    """Test totals and per-category group-bys over the columns"""
+    columns = ColumnarEstimate.from_resources(resources)
+
+    assert len(columns) == 3
+    assert columns.total() == 12.5
+    assert columns.group_by("project") == {
+        "prod": {"resource_count": 2, "monthlyCost": 10.5},
+        "dev": {"resource_count": 1, "monthlyCost": 2.0},
+    }
+    assert columns.group_by("resource_type")["aws_instance"] == {"resource_count": 2, "monthlyCost": 12.5}
+    with pytest.raises(ValueError):
+        columns.group_by("name")
+
+def test_records_and_materialize(backend, resources):
+    """Test that light records come from the columns and details from the source"""
+    columns = ColumnarEstimate.from_resources(resources)
+
+    assert columns.records([1]) == [
+        {"name": "aws_instance.api", "project": "dev", "resource_type": "aws_instance", "monthlyCost": 2.0}
+    ]
+    assert columns.materialize([2, 0]) == [resources[2], resources[0]]
+    assert columns.materialize([]) == []
+
+def test_from_store_loads_details_on_demand(backend, resources, tmp_path):
+    """Test that store-backed columns only decode the requested resources"""
+    store = EstimateStore(tmp_path / "estimates.db")
+    store.save("uid-1", resources)
+
+    columns = ColumnarEstimate.from_rows(
+        store.get_columns("uid-1"), uid="uid-1", loader=lambda indices: store.get_rows("uid-1", indices)
+    )
+
+    assert columns.names == [r["name"] for r in resources]
+    assert columns.project(0) == "prod"
+    assert columns.total() == 12.5
+    assert columns.materialize([1]) == [resources[1]]
+    assert store.get_columns("missing") is None
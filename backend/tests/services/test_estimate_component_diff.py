@@ -0,0 +1,71 @@
+from app.services.estimate_columns import ColumnarEstimate
+from app.services.estimate_component_diff import component_tree, diff_components
+from app.services.estimate_diff import diff_estimates
+
+def instance(quantity="730", price="0.0104", cost="7.592", volume_cost="0.8"):
+    return {
+        "name": "aws_instance.web",
+        "resourceType": "aws_instance",
+        "monthlyCost": cost,
+        "costComponents": [
+            {"name": "Instance usage", "unit": "hours", "monthlyQuantity": quantity, "price": price, "monthlyCost": cost},
+        ],
+        "subresources": [
+            {
+                "name": "root_block_device",
+                "monthlyCost": volume_cost,
+                "costComponents": [
+                    {"name": "Storage", "unit": "GB", "monthlyQuantity": "8", "price": "0.1", "monthlyCost": volume_cost},
+                ],
+            }
+        ],
+    }
+
+def test_price_change_is_told_apart_from_usage():
+    """Test that component nodes record the cause of a cost change"""
+    price = component_tree(instance(), instance(price="0.0208", cost="15.184"))
+    usage = component_tree(instance(), instance(quantity="365", cost="3.796"))
+
+    component = price["costComponents"][0]
+    assert component["cause"] == "price"
+    assert component["price"] == {"base": 0.0104, "proposed": 0.0208, "delta": 0.0104}
+    assert component["monthlyQuantity"]["delta"] == 0
+    assert component["monthlyCost"]["delta"] == 7.59
+    assert usage["costComponents"][0]["cause"] == "usage"
+    assert usage["costComponents"][0]["monthlyQuantity"]["delta"] == -365
+
+def test_unchanged_branches_are_pruned():
+    """Test that only changed components and subresources are kept"""
+    tree = component_tree(instance(), instance(volume_cost="1.6"))
+
+    assert tree["status"] == "changed"
+    assert tree["costComponents"] == []
+    assert tree["subresources"][0]["name"] == "root_block_device"
+    assert tree["subresources"][0]["costComponents"][0]["monthlyCost"]["delta"] == 0.8
+
+    assert component_tree(instance(), instance())["status"] == "unchanged"
+
+def test_added_and_removed_components():
+    """Test that components present on one side only are reported as such"""
+    old = instance()
+    new = instance()
+    new["costComponents"] = [{"name": "CPU credits", "unit": "vCPU-hours", "monthlyQuantity": None, "price": "0.05", "monthlyCost": None}]
+
+    statuses = {node["name"]: node["status"] for node in component_tree(old, new)["costComponents"]}
+
+    assert statuses == {"CPU credits": "added", "Instance usage": "removed"}
+
+def test_diff_components():
+    """Test the component diff of two estimates"""
+    base_resources = [instance(), {"name": "aws_s3_bucket.old", "monthlyCost": "1"}]
+    proposed_resources = [instance(price="0.0208", cost="15.184"), instance() | {"name": "aws_instance.api"}]
+    base = ColumnarEstimate.from_resources(base_resources)
+    proposed = ColumnarEstimate.from_resources(proposed_resources)
+
+    result = diff_components(diff_estimates(base, proposed))
+
+    assert [(r["name"], r["status"]) for r in result["resources"]] == [
+        ("aws_instance.web", "changed"), ("aws_instance.api", "added"), ("aws_s3_bucket.old", "removed")
+    ]
+    assert result["resources"][0]["resource_type"] == "aws_instance"
+    assert result["totals"] == {"base": 8.59, "proposed": 22.78, "delta": 14.18}
@@ -0,0 +1,75 @@
+import pytest
+
+from app.services import estimate_columns
+from app.services.estimate_columns import ColumnarEstimate
+from app.services.estimate_diff import diff_estimates
+
+@pytest.fixture(params=["numpy", "python"])
+def backend(request, monkeypatch):
+    """Run each test with the NumPy merge and with the pure-Python fallback"""
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(estimate_columns, "np", None)
+    return request.param
+
+def resource(name, cost, project="prod"):
+    return {"name": name, "project": project, "resource_type": name.split(".")[0], "monthlyCost": cost}
+
+def test_diff_categories(backend):
+    """Test that every resource lands in exactly one category"""
+    base = [resource("aws_instance.a", "10"), resource("aws_instance.b", "5"), resource("aws_instance.c", "1")]
+    proposed = [resource("aws_instance.d", "2"), resource("aws_instance.b", "3"), resource("aws_instance.a", "12"),
+                resource("aws_instance.c", "1")]
+
+    diff = diff_estimates(ColumnarEstimate.from_resources(base), ColumnarEstimate.from_resources(proposed)).to_dict()
+
+    assert [(r["name"], r["delta"]) for r in diff["increased"]] == [("aws_instance.a", 2.0)]
+    assert [(r["name"], r["delta"]) for r in diff["decreased"]] == [("aws_instance.b", -2.0)]
+    assert [r["name"] for r in diff["unchanged"]] == ["aws_instance.c"]
+    assert [(r["name"], r["delta"]) for r in diff["added"]] == [("aws_instance.d", 2.0)]
+    assert diff["removed"] == []
+
+def test_diff_keeps_duplicates_and_projects_apart(backend):
+    """Test that repeated names and names shared across projects never collapse"""
+    base = [resource("aws_instance.web", "1", "dev"), resource("aws_instance.web", "4", "prod"),
+            resource("aws_instance.web", "4", "prod")]
+    proposed = [resource("aws_instance.web", "2", "dev"), resource("aws_instance.web", "4", "prod")]
+
+    diff = diff_estimates(ColumnarEstimate.from_resources(base), ColumnarEstimate.from_resources(proposed)).to_dict()
+
+    assert [(r["project"], r["delta"]) for r in diff["increased"]] == [("dev", 1.0)]
+    assert [r["project"] for r in diff["unchanged"]] == ["prod"]
+    assert [(r["project"], r["delta"]) for r in diff["removed"]] == [("prod", -4.0)]
+
+def test_diff_matches_on_name_without_shared_projects(backend):
+    """Test that the same plan uploaded under two file names still matches"""
+    base = [resource("aws_instance.a", "10", "plan-v1.json"), resource("aws_instance.a", "1", "plan-v1.json")]
+    proposed = [resource("aws_instance.a", "12", "plan-v2.json"), resource("aws_instance.a", "1", "plan-v2.json")]
+
+    diff = diff_estimates(ColumnarEstimate.from_resources(base), ColumnarEstimate.from_resources(proposed)).to_dict()
+
+    assert [(r["project"], r["delta"]) for r in diff["increased"]] == [("plan-v2.json", 2.0)]
+    assert len(diff["unchanged"]) == 1
+    assert diff["added"] == diff["removed"] == []
+
+def test_diff_does_not_mutate_records(backend):
+    """Test that the source resources are left untouched"""
+    base = [resource("aws_instance.a", "1")]
+    proposed = [resource("aws_instance.a", "3")]
+
+    diff = diff_estimates(ColumnarEstimate.from_resources(base), ColumnarEstimate.from_resources(proposed))
+    result = diff.to_dict()
+
+    assert result["increased"][0]["delta"] == 2.0
+    assert "delta" not in proposed[0]
+    assert diff.to_dict(details=False)["increased"] == [
+        {"name": "aws_instance.a", "project": "prod", "resource_type": "aws_instance", "monthlyCost": 3.0, "delta": 2.0}
+    ]
+
+def test_diff_empty(backend):
+    """Test diffing empty estimates"""
+    empty = ColumnarEstimate.from_resources([])
+    diff = diff_estimates(empty, ColumnarEstimate.from_resources([resource("aws_instance.a", "1")])).to_dict()
+    assert [r["name"] for r in diff["added"]] == ["aws_instance.a"]
+    assert diff_estimates(empty, empty).to_dict()["removed"] == []
@@ -0,0 +1,88 @@
+import csv
+import io
+import json
+
+import pytest
+
+from app.services import estimate_export
+from app.services.estimate_export import export_estimate, parse_columns
+
+@pytest.fixture
+def resources():
+    return [
+        {
+            "name": "aws_instance.web",
+            "resourceType": "aws_instance",
+            "monthlyCost": "30.37",
+            "tags": {"team": "platform"},
+            "costComponents": [
+                {"name": "Instance usage", "unit": "hours", "monthlyQuantity": "730", "price": "0.0416",
+                 "monthlyCost": "30.37"}
+            ],
+            "subresources": [
+                {"name": "root_block_device", "costComponents": [
+                    {"name": "Storage", "unit": "GB", "monthlyQuantity": "8", "price": "0.1", "monthlyCost": "0.8"}
+                ]}
+            ]
+        },
+        {"name": "aws_s3_bucket.logs", "resource_type": "aws_s3_bucket", "monthlyCost": None}
+    ]
+
+def read(chunks):
+    return b"".join(chunks)
+
+def test_csv_default_columns(resources):
+    """Test that CSV defaults to name, type and monthly cost"""
+    rows = list(csv.reader(io.StringIO(read(export_estimate(resources, "csv")).decode())))
+    assert rows == [
+        ["name", "resource_type", "monthlyCost"],
+        ["aws_instance.web", "aws_instance", "30.37"],
+        ["aws_s3_bucket.logs", "aws_s3_bucket", ""],
+    ]
+
+def test_csv_flattens_components(resources):
+    """Test that flattening emits one row per cost component, subresources included"""
+    columns = parse_columns("name,subresource,component,componentMonthlyCost", flatten=True)
+    rows = list(csv.DictReader(io.StringIO(read(export_estimate(resources, "csv", columns, flatten=True)).decode())))
+
+    assert [(r["name"], r["subresource"], r["component"], r["componentMonthlyCost"]) for r in rows] == [
+        ("aws_instance.web", "", "Instance usage", "30.37"),
+        ("aws_instance.web", "root_block_device", "Storage", "0.8"),
+        ("aws_s3_bucket.logs", "", "", ""),
+    ]
+
+def test_ndjson_and_json_nested_columns(resources):
+    """Test dotted column paths and whole-resource JSON exports"""
+    lines = read(export_estimate(resources, "ndjson", parse_columns("name,tags.team"))).splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"name": "aws_instance.web", "tags.team": "platform"},
+        {"name": "aws_s3_bucket.logs", "tags.team": None},
+    ]
+    assert json.loads(read(export_estimate(resources, "json"))) == resources
+    assert json.loads(read(export_estimate([], "json"))) == []
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_columnar_formats(resources, fmt, monkeypatch):
+    """Test that Parquet and Arrow exports round-trip across record batches"""
+    pa = pytest.importorskip("pyarrow")
+    monkeypatch.setattr(estimate_export, "BATCH_ROWS", 1)
+
+    payload = read(export_estimate(resources, fmt))
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        table = pq.read_table(io.BytesIO(payload))
+    else:
+        table = pa.ipc.open_stream(payload).read_all()
+
+    assert table.to_pylist() == [
+        {"name": "aws_instance.web", "resource_type": "aws_instance", "monthlyCost": 30.37},
+        {"name": "aws_s3_bucket.logs", "resource_type": "aws_s3_bucket", "monthlyCost": None},
+    ]
+
+def test_invalid_requests(resources):
+    """Test that bad formats and columns fail before anything is streamed"""
+    with pytest.raises(ValueError, match="Unsupported export format"):
+        export_estimate(resources, "xlsx")
+    with pytest.raises(ValueError, match="require flatten"):
+        parse_columns("name,component")
+    assert parse_columns(None) is None
@@ -0,0 +1,87 @@
+import pytest
+
+from app.services import estimate_columns
+from app.services.estimate_pricing import PricingModel, is_usage_based
+
+@pytest.fixture(params=["numpy", "python"])
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(estimate_columns, "np", None)
+    return request.param
+
+@pytest.fixture
+def resources():
+    return [
+        {
+            "name": "aws_instance.web",
+            "monthlyCost": "8.392",
+            "costComponents": [
+                {"name": "Instance usage", "unit": "hours", "monthlyQuantity": "730", "price": "0.0104", "monthlyCost": "7.592"},
+            ],
+            "subresources": [
+                {
+                    "name": "root_block_device",
+                    "costComponents": [
+                        {"name": "Storage", "unit": "GB", "monthlyQuantity": "8", "price": "0.1", "monthlyCost": "0.8"},
+                    ],
+                }
+            ],
+        },
+        {
+            "name": "aws_lambda_function.api",
+            "project": "prod",
+            "monthlyCost": "0.2",
+            "costComponents": [
+                {"name": "Requests", "unit": "1M requests", "monthlyQuantity": "1", "price": "0.2", "monthlyCost": "0.2", "usageBased": True},
+                {"name": "Duration", "unit": "GB-seconds", "monthlyQuantity": None, "price": "0.0000166667", "monthlyCost": None, "usageBased": True},
+            ],
+        },
+    ]
+
+def test_usage_based_components():
+    """Test which components a usage percentage scales"""
+    assert is_usage_based({"unit": "hours"})
+    assert is_usage_based({"unit": "GB", "usageBased": True})
+    assert not is_usage_based({"unit": "GB"})
+    assert not is_usage_based({"unit": "hours", "usageBased": False})
+
+def test_usage_scales_only_variable_components(backend, resources):
+    """Test that a usage percentage leaves fixed components alone"""
+    result = PricingModel(resources).reprice([{"resource": "aws_instance.web", "usage": 50}])
+
+    assert result["base_total"] == 8.59
+    assert result["resources"] == [{
+        "index": 0, "name": "aws_instance.web", "project": None,
+        "baseMonthlyCost": 8.39, "monthlyCost": 4.6, "delta": -3.8
+    }]
+    assert result["total"] == 4.8
+
+def test_component_quantity_override(backend, resources):
+    """Test that a component's quantity can be set directly"""
+    model = PricingModel(resources)
+
+    result = model.reprice([
+        {"resource": "aws_lambda_function.api", "project": "prod", "component": "Duration", "monthlyQuantity": 600000},
+        {"index": 1, "component": "Requests", "monthlyQuantity": 3},
+    ])
+
+    assert result["resources"][0]["monthlyCost"] == pytest.approx(10.6, abs=0.01)
+    assert result["delta"] == pytest.approx(10.4, abs=0.01)
+    # The model itself is left untouched
+    assert model.reprice([])["total"] == 8.59
+
+@pytest.mark.parametrize("override", [
+    {"resource": "aws_s3_bucket.missing", "usage": 10},
+    {"index": 5, "usage": 10},
+    {"resource": "aws_instance.web"},
+    {"resource": "aws_instance.web", "usage": 10, "monthlyQuantity": 1, "component": "Storage"},
+    {"resource": "aws_instance.web", "component": "Missing", "monthlyQuantity": 1},
+    {"resource": "aws_instance.web", "usage": -1},
+    {"usage": 10},
+])
+def test_invalid_overrides(resources, override):
+    """Test that overrides that match nothing or make no sense are rejected"""
+    with pytest.raises(ValueError):
+        PricingModel(resources).reprice([override])
@@ -0,0 +1,77 @@
+import pytest
+
+from app.services.estimate_query import decode_cursor, encode_cursor, page_resources
+from app.services.estimate_store import EstimateStore
+
+@pytest.fixture
+def store(tmp_path):
+    store = EstimateStore(tmp_path / "estimates.db")
+    store.save("uid-1", [
+        {"name": "aws_instance.web", "resource_type": "aws_instance", "monthlyCost": "30.00"},
+        {"name": "module.db.aws_db_instance.main", "resource_type": "aws_db_instance", "monthlyCost": "50.00"},
+        {"name": "aws_s3_bucket.logs", "resource_type": "aws_s3_bucket", "monthlyCost": "1.00"},
+        {"name": "aws_instance.api", "resource_type": "aws_instance", "monthlyCost": "30.00"},
+        {"name": "module.db.aws_s3_bucket.backup", "resource_type": "aws_s3_bucket", "monthlyCost": None},
+    ])
+    return store
+
+def names(page):
+    return [r["name"] for r in page["resources"]]
+
+def collect(store, **kwargs):
+    """Follow cursors through every page"""
+    pages = [page_resources(store, "uid-1", **kwargs)]
+    while pages[-1]["next_cursor"]:
+        pages.append(page_resources(store, "uid-1", cursor=pages[-1]["next_cursor"], **kwargs))
+    return [name for page in pages for name in names(page)], len(pages)
+
+def test_pages_follow_breakdown_order(store):
+    """Test that cursor pagination visits every resource once, in order"""
+    visited, count = collect(store, limit=2)
+
+    assert visited == [
+        "aws_instance.web", "module.db.aws_db_instance.main", "aws_s3_bucket.logs",
+        "aws_instance.api", "module.db.aws_s3_bucket.backup"
+    ]
+    assert count == 3
+
+def test_sort_by_cost(store):
+    """Test that sorting by cost pages through ties without repeats"""
+    descending, _ = collect(store, sort="-monthlyCost", limit=2)
+    ascending, _ = collect(store, sort="monthlyCost", limit=2)
+
+    assert descending[:3] == ["module.db.aws_db_instance.main", "aws_instance.api", "aws_instance.web"]
+    assert ascending == descending[::-1]
+
+def test_filters(store):
+    """Test type, name prefix and cost filters"""
+    assert names(page_resources(store, "uid-1", resource_types=["aws_s3_bucket"])) == [
+        "aws_s3_bucket.logs", "module.db.aws_s3_bucket.backup"
+    ]
+    assert names(page_resources(store, "uid-1", name_prefix="module.db.")) == [
+        "module.db.aws_db_instance.main", "module.db.aws_s3_bucket.backup"
+    ]
+    assert names(page_resources(store, "uid-1", min_cost=30, max_cost=40)) == ["aws_instance.web", "aws_instance.api"]
+    assert names(page_resources(store, "uid-1", resource_types=[])) == []
+
+def test_field_projection(store):
+    """Test that fields keep only the requested keys"""
+    page = page_resources(store, "uid-1", fields="name,monthlyCost", sort="-monthlyCost", limit=1)
+
+    assert page["resources"] == [{"name": "module.db.aws_db_instance.main", "monthlyCost": "50.00"}]
+
+def test_invalid_requests(store):
+    """Test that bad parameters raise ValueError and unknown estimates None"""
+    with pytest.raises(ValueError):
+        page_resources(store, "uid-1", sort="name")
+    with pytest.raises(ValueError):
+        page_resources(store, "uid-1", limit=0)
+    with pytest.raises(ValueError):
+        page_resources(store, "uid-1", cursor="not-a-cursor")
+    with pytest.raises(ValueError):
+        page_resources(store, "uid-1", cursor=encode_cursor(None, [1]), sort="monthlyCost")
+    assert page_resources(store, "missing") is None
+
+def test_cursor_round_trip():
+    """Test that cursors decode to the key they were built from"""
+    assert decode_cursor(encode_cursor("-monthlyCost", (12.5, 3)), "-monthlyCost") == [12.5, 3]
@@ -0,0 +1,61 @@
+import pytest
+
+from app.services.estimate_rollups import RollupBuilder, build_summary, module_of, provider_of
+
+@pytest.mark.parametrize("resource_type, provider", [
+    ("aws_instance", "aws"),
+    ("azurerm_linux_virtual_machine", "azure"),
+    ("google_compute_instance", "google"),
+    ("digitalocean_droplet", "digitalocean"),
+    (None, None),
+])
+def test_provider_of(resource_type, provider):
+    """Test that providers are derived from the resource type prefix"""
+    assert provider_of(resource_type) == provider
+
+@pytest.mark.parametrize("name, module", [
+    ("aws_instance.web", "root"),
+    ("module.vpc.aws_nat_gateway.this[0]", "module.vpc"),
+    ("module.app.module.db.aws_db_instance.main", "module.app.module.db"),
+    ('module.site["a.b"].aws_s3_bucket.site', 'module.site["a.b"]'),
+    (None, "root"),
+])
+def test_module_of(name, module):
+    """Test that modules are the module path of the resource address"""
+    assert module_of(name) == module
+
+def test_builder_keeps_top_resources():
+    """Test that each group keeps counts, totals and its most expensive resources"""
+    builder = RollupBuilder(top_n=2)
+    for idx, cost in enumerate([5.0, 20.0, 1.0, 20.0]):
+        builder.add(idx, f"module.app.aws_instance.r{idx}", "dev", "aws_instance", cost)
+
+    rows = {(dimension, key): rest for dimension, key, *rest in builder.rows()}
+
+    count, total, top = rows[("resource_type", "aws_instance")]
+    assert (count, total) == (4, 46.0)
+    assert [entry["idx"] for entry in top] == [1, 3]
+    assert top[0] == {
+        "idx": 1, "name": "module.app.aws_instance.r1", "project": "dev",
+        "resource_type": "aws_instance", "monthlyCost": 20.0
+    }
+    assert set(rows) == {
+        ("resource_type", "aws_instance"), ("provider", "aws"), ("module", "module.app"), ("project", "dev")
+    }
+
+def test_build_summary_orders_groups():
+    """Test that groups are ordered by cost and top lists are trimmed"""
+    builder = RollupBuilder()
+    builder.add(0, "aws_s3_bucket.logs", None, "aws_s3_bucket", 1.0)
+    builder.add(1, "aws_instance.web", None, "aws_instance", 10.0)
+    builder.add(2, "aws_instance.api", None, "aws_instance", 5.0)
+    estimate = {"uid": "uid-1", "created_at": 1.0, "resource_count": 3, "total_monthly_cost": 16.0}
+
+    summary = build_summary(estimate, builder.rows(), top=1)
+
+    assert summary["total_monthly_cost"] == 16.0
+    assert [group["key"] for group in summary["groups"]["resource_type"]] == ["aws_instance", "aws_s3_bucket"]
+    assert [entry["name"] for entry in summary["groups"]["resource_type"][0]["top"]] == ["aws_instance.web"]
+    module = summary["groups"]["module"]
+    assert [(g["key"], g["resource_count"], g["monthlyCost"]) for g in module] == [("root", 3, 16.0)]
+    assert summary["groups"]["project"][0]["key"] is None
@@ -0,0 +1,76 @@
+import pytest
+
+from app.services import estimate_columns
+from app.services.estimate_columns import ColumnarEstimate
+from app.services.estimate_series import compare_series
+
+@pytest.fixture(params=["numpy", "python"])
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(estimate_columns, "np", None)
+    return request.param
+
+def columns(uid, rows):
+    return ColumnarEstimate.from_rows(rows, uid=uid)
+
+def test_series_matrix(backend):
+    """Test that resources are aligned across every estimate of the series"""
+    series = [
+        columns("c1", [("prod", "aws_instance.web", "aws_instance", 10.0)]),
+        columns("c2", [
+            ("prod", "aws_s3_bucket.logs", "aws_s3_bucket", 2.0),
+            ("prod", "aws_instance.web", "aws_instance", 15.0),
+        ]),
+        columns("c3", [("prod", "aws_s3_bucket.logs", "aws_s3_bucket", 1.0)]),
+    ]
+
+    result = compare_series(series)
+
+    assert result["uids"] == ["c1", "c2", "c3"]
+    assert result["totals"] == [10.0, 17.0, 1.0]
+    assert result["resources"] == [
+        {"name": "aws_instance.web", "project": "prod", "resource_type": "aws_instance",
+         "costs": [10.0, 15.0, None], "deltas": [5.0, -15.0]},
+        {"name": "aws_s3_bucket.logs", "project": "prod", "resource_type": "aws_s3_bucket",
+         "costs": [None, 2.0, 1.0], "deltas": [2.0, -1.0]},
+    ]
+    assert result["steps"] == [
+        {"from": "c1", "to": "c2", "delta": 7.0, "increased": 1, "decreased": 0, "added": 1, "removed": 0},
+        {"from": "c2", "to": "c3", "delta": -16.0, "increased": 0, "decreased": 1, "added": 0, "removed": 1},
+    ]
+
+def test_series_pairs_duplicates_and_projects(backend):
+    """Test that duplicates pair by occurrence and projects are kept apart"""
+    series = [
+        columns("c1", [("dev", "aws_instance.web", "aws_instance", 1.0), ("dev", "aws_instance.web", "aws_instance", 2.0)]),
+        columns("c2", [("prod", "aws_instance.web", "aws_instance", 3.0), ("dev", "aws_instance.web", "aws_instance", 1.0)]),
+    ]
+
+    result = compare_series(series)
+
+    assert [(r["project"], r["costs"]) for r in result["resources"]] == [
+        ("dev", [1.0, 1.0]), ("dev", [2.0, None]), ("prod", [None, 3.0])
+    ]
+
+def test_series_changed_only(backend):
+    """Test that resources with a constant cost can be left out"""
+    series = [
+        columns("c1", [("p", "a", "t", 1.0), ("p", "b", "t", 1.0)]),
+        columns("c2", [("p", "a", "t", 1.0), ("p", "b", "t", 2.0)]),
+    ]
+
+    assert [r["name"] for r in compare_series(series, changed_only=True)["resources"]] == ["b"]
+
+def test_series_empty_estimates(backend):
+    """Test that a series of empty estimates still reports its steps"""
+    result = compare_series([columns("c1", []), columns("c2", [])])
+
+    assert result["resources"] == []
+    assert result["steps"][0]["delta"] == 0
+
+def test_series_length_limits():
+    """Test that a series needs at least two estimates"""
+    with pytest.raises(ValueError):
+        compare_series([columns("c1", [])])
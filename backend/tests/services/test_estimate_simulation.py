@@ -0,0 +1,132 @@
+import pytest
+
+from app.services import estimate_columns
+from app.services.estimate_pricing import PricingModel
+from app.services.estimate_simulation import simulate, unit_scale
+
+@pytest.fixture
+def np():
+    return pytest.importorskip("numpy")
+
+@pytest.fixture
+def model():
+    return PricingModel([
+        {
+            "name": "aws_instance.web",
+            "monthlyCost": "8.392",
+            "costComponents": [
+                {"name": "Instance usage", "unit": "hours", "monthlyQuantity": "730", "price": "0.0104", "monthlyCost": "7.592"},
+            ],
+            "subresources": [
+                {
+                    "name": "root_block_device",
+                    "costComponents": [
+                        {"name": "Storage", "unit": "GB", "monthlyQuantity": "8", "price": "0.1", "monthlyCost": "0.8"},
+                    ],
+                }
+            ],
+        },
+        {
+            "name": "aws_lambda_function.api",
+            "monthlyCost": "0.2",
+            "costComponents": [
+                {"name": "Requests", "unit": "1M requests", "monthlyQuantity": "1", "price": "0.2", "monthlyCost": "0.2", "usageBased": True},
+            ],
+        },
+    ])
+
+def test_unit_scale():
+    """Test how many usage units a priced unit holds"""
+    assert unit_scale("1M requests") == 1e6
+    assert unit_scale("10K units") == 1e4
+    assert unit_scale("hours") == 1
+    assert unit_scale(None) == 1
+
+def test_fixed_values_match_a_reprice(np, model):
+    """Test that a range of width zero gives the point estimate"""
+    result = simulate(model, {
+        "aws_instance.web": {"monthly_hours": 365},
+        "aws_lambda_function.api": {"monthly_requests": {"min": 2e6, "likely": 2e6, "max": 2e6}},
+    }, samples=100)
+
+    web, api = result["resources"]
+    assert web == {"index": 0, "name": "aws_instance.web", "project": None,
+                   "base": 8.39, "mean": 4.6, "p10": 4.6, "p50": 4.6, "p90": 4.6}
+    assert api["p10"] == api["p90"] == 0.4
+    assert result["total"]["base"] == 8.59
+    assert result["total"]["p50"] == 5.0
+
+def test_percentiles_are_ordered_and_reproducible(np, model):
+    """Test that a seeded simulation is repeatable and spreads as expected"""
+    ranges = {
+        "aws_instance.web": {"monthly_hours": {"min": 0, "likely": 365, "max": 730}},
+        "aws_lambda_function.api": {"usage": {"distribution": "normal", "mean": 100, "stddev": 50}},
+    }
+    result = simulate(model, ranges, samples=20000, seed=7)
+
+    assert result == simulate(model, ranges, samples=20000, seed=7)
+    assert result["samples"] == 20000
+    for stats in [result["total"], *result["resources"]]:
+        assert stats["p10"] <= stats["p50"] <= stats["p90"]
+    web = result["resources"][0]
+    # Symmetric triangle over 0-730 hours: median at 365, storage fixed
+    assert web["p50"] == pytest.approx(4.6, abs=0.05)
+    assert web["p10"] > 0.8 and web["p90"] < 8.39
+
+def test_last_key_drives_a_component(np, model):
+    """Test that a component driven by two keys follows the last one"""
+    result = simulate(model, {"aws_lambda_function.api": {
+        "monthly_requests": {"min": 5e6, "max": 6e6},
+        "usage": 50,
+    }}, samples=10)
+
+    assert result["resources"][0]["p90"] == 0.1
+
+@pytest.mark.parametrize("ranges, message", [
+    ({"aws_instance.missing": {"usage": 100}}, "Resource not found"),
+    ({"aws_instance.web": {"monthly_gb": 1}}, "Unsupported usage key"),
+    ({"aws_instance.web": {"monthly_requests": 1}}, "No cost components"),
+    ({"aws_instance.web": {"monthly_hours": {"min": 10, "likely": 5, "max": 20}}}, "min <= likely <= max"),
+    ({"aws_instance.web": {"monthly_hours": {"min": 10}}}, "missing max"),
+    ({"aws_instance.web": {"monthly_hours": {"distribution": "beta", "min": 1, "max": 2}}}, "Unsupported distribution"),
+    ({"aws_instance.web": {"monthly_hours": "lots"}}, "Invalid range"),
+])
+def test_invalid_ranges(np, model, ranges, message):
+    """Test that malformed ranges are rejected"""
+    with pytest.raises(ValueError, match=message):
+        simulate(model, ranges, samples=10)
+
+def test_keys_need_a_single_untiered_component(np):
+    """Test that a key matching several components or a price tier is rejected"""
+    model = PricingModel([
+        {
+            "name": "aws_dynamodb_table.orders",
+            "monthlyCost": "0.5",
+            "costComponents": [
+                {"name": "Data storage", "unit": "GB", "monthlyQuantity": "1", "price": "0.25", "monthlyCost": "0.25"},
+                {"name": "On-demand backup storage", "unit": "GB", "monthlyQuantity": "1", "price": "0.25", "monthlyCost": "0.25"},
+            ],
+        },
+        {
+            "name": "aws_lambda_function.api",
+            "monthlyCost": "0.2",
+            "costComponents": [
+                {"name": "Requests (first 1B)", "unit": "1M requests", "monthlyQuantity": "1", "price": "0.2", "monthlyCost": "0.2"},
+            ],
+        },
+    ])
+    with pytest.raises(ValueError, match="matches 2 cost components"):
+        simulate(model, {"aws_dynamodb_table.orders": {"storage_gb": 100}}, samples=10)
+    with pytest.raises(ValueError, match="tiered cost component"):
+        simulate(model, {"aws_lambda_function.api": {"monthly_requests": 1e6}}, samples=10)
+
+def test_requires_numpy(model, monkeypatch):
+    """Test that simulation reports missing numpy as a bad request"""
+    monkeypatch.setattr(estimate_columns, "np", None)
+    with pytest.raises(ValueError, match="requires numpy"):
+        simulate(model, {"aws_instance.web": {"usage": 100}})
+
+def test_sample_bounds(np, model):
+    """Test that the number of samples is bounded"""
+    with pytest.raises(ValueError, match="samples"):
+        simulate(model, {}, samples=0)
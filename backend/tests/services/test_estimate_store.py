@@ -0,0 +1,147 @@
+import json
+
+import pytest
+
+from app.services import estimate_store
+from app.services.estimate_store import EstimateStore
+
+@pytest.fixture
+def store(tmp_path):
+    return EstimateStore(tmp_path / "estimates.db")
+
+@pytest.fixture
+def resources():
+    return [
+        {"name": "aws_instance.web", "resource_type": "aws_instance", "monthlyCost": "10.50"},
+        {"name": "aws_lambda_function.api", "resourceType": "aws_lambda_function", "monthlyCost": None},
+    ]
+
+def test_save_and_get(store, resources):
+    """Test that resources round-trip in their original order"""
+    meta = store.save("uid-1", resources, meta={"source": "upload"})
+
+    assert store.get("uid-1") == resources
+    assert meta["resource_count"] == 2
+    assert meta["total_monthly_cost"] == 10.5
+    assert meta["meta"] == {"source": "upload"}
+
+def test_get_filtered_by_project(store):
+    """Test that resources can be read for a subset of projects"""
+    store.save("uid-1", [
+        {"name": "a", "project": "dev"},
+        {"name": "b", "project": "prod"},
+        {"name": "c", "project": "dev"},
+    ])
+
+    assert [r["name"] for r in store.get("uid-1", projects=["dev"])] == ["a", "c"]
+    assert store.get("uid-1", projects=[]) == []
+
+def test_get_rows_by_position(store):
+    """Test that rows come back in the order asked, for dense and sparse positions alike"""
+    store.save("uid-1", [{"name": f"r{i}"} for i in range(50)])
+
+    assert [r["name"] for r in store.get_rows("uid-1", [3, 1, 2, 2])] == ["r3", "r1", "r2", "r2"]
+    assert [r["name"] for r in store.get_rows("uid-1", [40, 0, 99])] == ["r40", "r0"]
+    assert store.get_rows("uid-1", []) == []
+
+def test_iter_raw_batches(store):
+    """Test that streaming reads return every resource in order across batches"""
+    store.save("uid-1", [{"name": f"r{i}"} for i in range(5)])
+
+    assert [json.loads(raw)["name"] for raw in store.iter_raw("uid-1", batch_size=2)] == ["r0", "r1", "r2", "r3", "r4"]
+    assert list(store.iter_raw("missing")) == []
+
+def test_get_unknown(store):
+    """Test that unknown uids return None"""
+    assert store.get("missing") is None
+    assert store.get_meta("missing") is None
+
+def test_save_replaces_existing(store, resources):
+    """Test that saving a uid twice keeps only the latest resources"""
+    store.save("uid-1", resources)
+    store.save("uid-1", resources[:1])
+    assert store.get("uid-1") == resources[:1]
+
+def test_empty_estimate(store):
+    """Test that an estimate with no resources still exists"""
+    store.save("uid-1", [])
+    assert store.get("uid-1") == []
+
+def test_purge_expired(tmp_path, resources):
+    """Test TTL based eviction"""
+    store = EstimateStore(tmp_path / "estimates.db", ttl_seconds=60)
+    store.save("uid-1", resources)
+
+    assert store.purge_expired() == []
+    meta = store.get_meta("uid-1")
+    assert store.purge_expired(now=meta["expires_at"] + 1) == ["uid-1"]
+    assert store.get("uid-1") is None
+
+def test_persists_across_instances(tmp_path, resources):
+    """Test that estimates survive reopening the database"""
+    EstimateStore(tmp_path / "estimates.db").save("uid-1", resources)
+    assert EstimateStore(tmp_path / "estimates.db").get("uid-1") == resources
+
+def test_rollups_saved_with_estimate(store, resources):
+    """Test that rollups are written with the estimate and removed with it"""
+    store.save("uid-1", resources)
+
+    rollups = {(dimension, key): (count, total) for dimension, key, count, total, _ in store.get_rollups("uid-1")}
+    assert rollups[("provider", "aws")] == (2, 10.5)
+    assert rollups[("resource_type", "aws_lambda_function")] == (1, 0.0)
+
+    store.delete("uid-1")
+    assert store.get_rollups("uid-1") is None
+
+def test_save_returns_rollups(store, resources):
+    """Test that save returns the rollups it stored, without a re-read"""
+    saved = store.save("uid-1", resources)
+
+    assert sorted(saved["rollups"], key=str) == sorted(store.get_rollups("uid-1"), key=str)
+    assert {k: v for k, v in saved.items() if k != "rollups"} == store.get_meta("uid-1")
+
+def test_save_in_batches(store, monkeypatch):
+    """Test that estimates larger than a batch round-trip in order"""
+    monkeypatch.setattr(estimate_store, "SAVE_BATCH_SIZE", 3)
+    resources = [{"name": f"r{i}", "monthlyCost": "1"} for i in range(10)]
+
+    saved = store.save("uid-1", (resource for resource in resources))
+
+    assert saved["resource_count"] == 10
+    assert saved["total_monthly_cost"] == 10.0
+    assert store.get("uid-1") == resources
+
+def test_failed_save_leaves_nothing(store, monkeypatch):
+    """Test that a save failing partway stores neither rows nor estimate"""
+    monkeypatch.setattr(estimate_store, "SAVE_BATCH_SIZE", 2)
+
+    def failing():
+        for i in range(5):
+            yield {"name": f"r{i}"}
+        raise ValueError("truncated output")
+
+    with pytest.raises(ValueError):
+        store.save("uid-1", failing())
+
+    assert not store.exists("uid-1")
+    assert store._conn.execute("SELECT COUNT(*) FROM resources").fetchone()[0] == 0
+
+def test_rollups_backfilled_for_older_estimates(store, resources):
+    """Test that estimates saved before rollups existed are rolled up on read"""
+    store.save("uid-1", resources)
+    store._conn.execute("DELETE FROM rollups")
+
+    assert len(store.get_rollups("uid-1")) == 5
+    assert store._conn.execute("SELECT COUNT(*) FROM rollups").fetchone()[0] == 5
+
+def test_link(store, resources):
+    """Test that linking sets the parent and merges metadata"""
+    store.save("child", resources, meta={"tree": "abc"})
+
+    store.link("child", "parent", {"usage": {"aws_instance.web": {"monthly_hours": 1}}})
+
+    meta = store.get_meta("child")
+    assert meta["parent_uid"] == "parent"
+    assert meta["meta"] == {"tree": "abc", "usage": {"aws_instance.web": {"monthly_hours": 1}}}
+    store.link("missing", "parent")
+    assert store.get_meta("missing") is None
@@ -0,0 +1,98 @@
+import asyncio
+import subprocess
+import sys
+
+import pytest
+
+from app.services.infracost_runner import (
+    InfracostBusyError,
+    InfracostCancelledError,
+    InfracostRunner,
+    InfracostTimeoutError
+)
+
+def python_cmd(code):
+    """Build a command running a Python snippet in a subprocess"""
+    return [sys.executable, "-c", code]
+
+@pytest.mark.asyncio
+async def test_run_returns_stdout():
+    """Test that a successful run returns the process stdout"""
+    runner = InfracostRunner()
+    output = await runner.run(python_cmd("print('{\"projects\": []}')"))
+    assert output.strip() == b'{"projects": []}'
+
+@pytest.mark.asyncio
+async def test_run_non_zero_exit():
+    """Test that a failing process raises CalledProcessError"""
+    runner = InfracostRunner()
+    with pytest.raises(subprocess.CalledProcessError):
+        await runner.run(python_cmd("import sys; sys.exit(3)"))
+
+@pytest.mark.asyncio
+async def test_run_timeout():
+    """Test that a slow process is killed after the timeout"""
+    runner = InfracostRunner(timeout=0.2)
+    with pytest.raises(InfracostTimeoutError):
+        await runner.run(python_cmd("import time; time.sleep(10)"))
+
+@pytest.mark.asyncio
+async def test_concurrency_cap_and_queue_bound():
+    """Test that runs beyond the concurrency cap queue and overflow is rejected"""
+    runner = InfracostRunner(max_concurrency=1, max_queue=1)
+    slow = python_cmd("import time; time.sleep(0.3); print('done')")
+
+    first = asyncio.ensure_future(runner.run(slow))
+    await asyncio.sleep(0.05)
+    second = asyncio.ensure_future(runner.run(slow))
+    await asyncio.sleep(0.05)
+    assert runner.waiting == 1
+
+    with pytest.raises(InfracostBusyError):
+        await runner.run(slow)
+
+    assert (await first).strip() == b"done"
+    assert (await second).strip() == b"done"
+    assert runner.waiting == 0
+
+@pytest.mark.asyncio
+async def test_run_cancelled_on_disconnect():
+    """Test that a client disconnect cancels the run"""
+    runner = InfracostRunner(poll_interval=0.05)
+    calls = {"count": 0}
+
+    async def is_disconnected():
+        calls["count"] += 1
+        return calls["count"] > 2
+
+    with pytest.raises(InfracostCancelledError):
+        await runner.run(python_cmd("import time; time.sleep(10)"), is_disconnected=is_disconnected)
+
+@pytest.mark.asyncio
+async def test_run_streams_stdout_to_consumer(monkeypatch):
+    """Test that a consumer reads stdout in chunks while the process runs"""
+    monkeypatch.setattr("app.services.infracost_runner.STREAM_CHUNK_SIZE", 1024)
+    monkeypatch.setattr("app.services.infracost_runner.STREAM_MAX_CHUNKS", 1)
+    runner = InfracostRunner()
+
+    def consume(chunks):
+        sizes = [len(chunk) for chunk in chunks]
+        return len(sizes), sum(sizes)
+
+    count, total = await runner.run(python_cmd("print('x' * 100000)"), consume=consume)
+    assert count > 1
+    assert total == 100001
+
+@pytest.mark.asyncio
+async def test_run_stream_prefers_exit_status():
+    """Test that a failing process is reported even when the consumer also fails"""
+    runner = InfracostRunner()
+
+    def consume(chunks):
+        raise ValueError("truncated output")
+
+    with pytest.raises(subprocess.CalledProcessError):
+        await runner.run(python_cmd("import sys; print('{'); sys.exit(3)"), consume=consume)
+
+    with pytest.raises(ValueError, match="truncated"):
+        await runner.run(python_cmd("print('{')"), consume=consume)
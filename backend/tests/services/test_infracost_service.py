@@ -1,10 +1,13 @@
 import pytest
+import io
 import json
 import os
+import zipfile
 from pathlib import Path
-from unittest.mock import patch, mock_open, MagicMock
+from unittest.mock import patch, MagicMock
 
-from app.services.infracost_service import InfracostService
+from app.services.lru_cache import LRUCache
+from app.services.infracost_service import BaselineNotFoundError, InfracostService
 
 # Test fixtures
 @pytest.fixture
@@ -67,41 +70,56 @@ def test_extract_resources_no_breakdown(infracost_service):
     with pytest.raises(ValueError, match="No cost breakdown found"):
         infracost_service._extract_resources({"projects": [{"breakdown": None}]})
 
-@patch('zipfile.ZipFile')
-def test_extract_zip(mock_zipfile, infracost_service):
-    """Test extracting ZIP file"""
-    mock_zip = MagicMock()
-    mock_zip.namelist.return_value = ["main.tf", "variables.tf"]
-    mock_zipfile.return_value.__enter__.return_value = mock_zip
-    
-    extract_path = Path("test_path")
-    zip_path = Path("test.zip")
-    
+def test_extract_zip(infracost_service, tmp_path):
+    """Test extracting only the Terraform files of a ZIP file"""
+    zip_path = tmp_path / "test.zip"
+    with zipfile.ZipFile(zip_path, "w") as zf:
+        zf.writestr("main.tf", 'resource "aws_instance" "web" {}')
+        zf.writestr("variables.tf", 'variable "region" {}')
+        zf.writestr(".terraform/providers/aws/terraform-provider-aws", b"binary")
+        zf.writestr("README.md", "docs")
+
+    extract_path = tmp_path / "extract"
+    extract_path.mkdir()
     infracost_service._extract_zip(zip_path, extract_path)
-    
-    mock_zipfile.assert_called_once_with(zip_path, 'r')
-    mock_zip.extractall.assert_called_once_with(extract_path)
-    
-@patch('zipfile.ZipFile')
-def test_extract_zip_with_estimate(mock_zipfile, infracost_service):
+
+    extracted = sorted(p.relative_to(extract_path).as_posix() for p in extract_path.rglob("*") if p.is_file())
+    assert extracted == ["main.tf", "variables.tf"]
+
+def test_extract_zip_with_estimate(infracost_service, tmp_path):
     """Test extracting ZIP file with estimate.json"""
-    mock_zip = MagicMock()
-    mock_zip.namelist.return_value = ["main.tf", "estimate.json"]
-    mock_zipfile.return_value.__enter__.return_value = mock_zip
-    
-    extract_path = Path("test_path")
-    zip_path = Path("test.zip")
-    
-    with patch('os.rename') as mock_rename:
-        infracost_service._extract_zip(zip_path, extract_path)
-        
-        mock_zipfile.assert_called_once_with(zip_path, 'r')
-        mock_zip.extractall.assert_called_once_with(extract_path)
-        mock_zip.extract.assert_called_once_with('estimate.json', extract_path)
-        mock_rename.assert_called_once_with(
-            extract_path / 'estimate.json', 
-            extract_path / 'previous_estimate.json'
-        )
+    zip_path = tmp_path / "test.zip"
+    with zipfile.ZipFile(zip_path, "w") as zf:
+        zf.writestr("main.tf", 'resource "aws_instance" "web" {}')
+        zf.writestr("estimate.json", json.dumps([{"name": "aws_instance.web"}]))
+
+    extract_path = tmp_path / "extract"
+    extract_path.mkdir()
+    infracost_service._extract_zip(zip_path, extract_path)
+
+    assert not (extract_path / "estimate.json").exists()
+    with open(extract_path / "previous_estimate.json") as f:
+        assert json.load(f) == [{"name": "aws_instance.web"}]
+
+def test_stage_upload_zip(infracost_service, tmp_path):
+    """Test staging a zip upload straight from the file object"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr("main.tf", 'resource "aws_instance" "web" {}')
+    buffer.seek(0)
+
+    extract_path = tmp_path / "uid"
+    extract_path.mkdir()
+    source = infracost_service.stage_upload(buffer, "upload.zip", extract_path)
+
+    assert source == extract_path
+    assert (extract_path / "main.tf").exists()
+    assert not (extract_path / "upload.zip").exists()
+
+def test_stage_upload_unsupported(infracost_service, tmp_path):
+    """Test staging an unsupported upload"""
+    with pytest.raises(ValueError, match="Unsupported file type"):
+        infracost_service.stage_upload(io.BytesIO(b"text"), "notes.txt", tmp_path)
 
 @patch('subprocess.check_output')
 @patch('json.loads')
@@ -161,25 +179,76 @@ def test_process_terraform_file_unsupported(infracost_service):
         infracost_service.process_terraform_file(file_path, extract_path)
         
 def test_save_estimate(infracost_service):
-    """Test saving an estimate to a file"""
-    path = Path("test_path")
+    """Test saving an estimate to the store"""
+    path = infracost_service.upload_dir / "test-uid"
+    path.mkdir()
     resources = [{"name": "test", "monthlyCost": "10.00"}]
-    
-    m = mock_open()
-    with patch("builtins.open", m):
-        infracost_service._save_estimate(path, resources)
-        
-    m.assert_called_once_with(path / "estimate.json", "w")
-    handle = m()
-    handle.write.assert_called_once_with(json.dumps(resources, indent=2))
 
-@patch('builtins.open', new_callable=mock_open, read_data=json.dumps([{"name": "test"}]))
-def test_get_estimate(mock_file, infracost_service):
+    infracost_service._save_estimate(path, resources)
+
+    assert infracost_service.get_estimate("test-uid") == resources
+    meta = infracost_service.store.get_meta("test-uid")
+    assert meta["resource_count"] == 1
+    assert meta["total_monthly_cost"] == 10.0
+
+def test_save_estimate_with_previous(infracost_service):
+    """Test that an uploaded baseline is stored next to the estimate"""
+    path = infracost_service.upload_dir / "test-uid"
+    path.mkdir()
+    previous = [{"name": "test", "monthlyCost": "8.00"}]
+    with open(path / "previous_estimate.json", "w") as f:
+        json.dump(previous, f)
+
+    infracost_service._save_estimate(path, [{"name": "test", "monthlyCost": "10.00"}])
+
+    assert infracost_service.store.get("test-uid.previous") == previous
+
+@pytest.mark.parametrize("previous, expected", [
+    ({"projects": [{"name": "p", "breakdown": {"resources": [{"name": "test", "monthlyCost": "8.00"}]}}]},
+     [{"name": "test", "monthlyCost": "8.00", "project": "p"}]),
+    (["test"], None),
+    ({"projects": []}, None),
+])
+def test_save_estimate_with_other_baselines(infracost_service, previous, expected):
+    """Test that Infracost output baselines are extracted and invalid ones skipped"""
+    path = infracost_service.upload_dir / "test-uid"
+    path.mkdir()
+    with open(path / "previous_estimate.json", "w") as f:
+        json.dump(previous, f)
+
+    infracost_service._save_estimate(path, [{"name": "test", "monthlyCost": "10.00"}])
+
+    assert infracost_service.store.exists("test-uid")
+    assert infracost_service.store.get("test-uid.previous") == expected
+
+def test_compare_adjusted(infracost_service):
+    """Test comparing adjusted resources with the uploaded baseline"""
+    infracost_service.store.save("uid-1.previous", [
+        {"name": "aws_instance.web", "monthlyCost": "10.00"},
+        {"name": "aws_s3_bucket.old", "monthlyCost": "1.00", "details": {"region": "eu-west-1"}},
+    ])
+
+    result = infracost_service.compare_adjusted("uid-1", [
+        {"name": "aws_instance.web", "monthlyCost": "12.00"},
+        {"name": "aws_lambda_function.new", "monthlyCost": "3.00"},
+    ])
+
+    assert result["changed"] == [{"name": "aws_instance.web", "from": 10.0, "to": 12.0}]
+    assert [r["name"] for r in result["added"]] == ["aws_lambda_function.new"]
+    assert result["removed"] == [{"name": "aws_s3_bucket.old", "monthlyCost": "1.00", "details": {"region": "eu-west-1"}}]
+    assert result["current_total"] == 15.0
+    assert result["previous_total"] == 11.0
+
+    with pytest.raises(FileNotFoundError):
+        infracost_service.compare_adjusted("missing", [])
+
+def test_get_estimate(infracost_service):
     """Test getting an estimate by uid"""
     uid = "test-uid"
+    infracost_service.store.save(uid, [{"name": "test"}])
+
     resources = infracost_service.get_estimate(uid)
-    
-    mock_file.assert_called_once_with(infracost_service.upload_dir / uid / "estimate.json")
+
     assert resources == [{"name": "test"}]
 
 def test_get_estimate_not_found(infracost_service):
@@ -189,24 +258,20 @@ def test_get_estimate_not_found(infracost_service):
     with pytest.raises(FileNotFoundError):
         infracost_service.get_estimate(uid)
 
-@patch('builtins.open')
-def test_compare_estimates(mock_open, infracost_service):
+def test_compare_estimates(infracost_service):
     """Test comparing two estimates"""
     baseline = "baseline-uid"
     proposed = "proposed-uid"
     
-    # Mock the baseline file
+    # Store the baseline estimate
     baseline_data = [{"name": "resource1", "monthlyCost": "10.00"}]
-    # Mock the proposed file
+    # Store the proposed estimate
     proposed_data = [
         {"name": "resource1", "monthlyCost": "15.00"}, # Increased cost
         {"name": "resource2", "monthlyCost": "5.00"}   # New resource
     ]
-    
-    mock_open.side_effect = [
-        mock_open(read_data=json.dumps(baseline_data)).return_value,
-        mock_open(read_data=json.dumps(proposed_data)).return_value
-    ]
+    infracost_service.store.save(baseline, baseline_data)
+    infracost_service.store.save(proposed, proposed_data)
     
     result = infracost_service.compare_estimates(baseline, proposed)
     
@@ -221,3 +286,431 @@ def test_compare_estimates(mock_open, infracost_service):
     assert len(result["removed"]) == 0
     assert len(result["decreased"]) == 0
     assert len(result["unchanged"]) == 0
+
+def test_compare_estimates_not_found(infracost_service):
+    """Test comparing against a missing estimate"""
+    infracost_service.store.save("baseline-uid", [])
+    with pytest.raises(FileNotFoundError):
+        infracost_service.compare_estimates("baseline-uid", "missing")
+
+@pytest.mark.asyncio
+async def test_process_terraform_file_async_uses_cache(upload_dir, mock_infracost_output, tmp_path):
+    """Test that a second identical upload is served from the breakdown cache"""
+    from unittest.mock import AsyncMock
+    from app.services.breakdown_cache import BreakdownCache
+
+    runner = MagicMock()
+    runner.version = AsyncMock(return_value="v0.10")
+    payload = json.dumps(mock_infracost_output).encode()
+    runner.run = AsyncMock(side_effect=lambda cmd, consume=None, **kwargs: consume(iter([payload])))
+    service = InfracostService(upload_dir, runner=runner, cache=BreakdownCache(tmp_path / "cache"))
+
+    plan_path = tmp_path / "plan.json"
+    plan_path.write_text("{}")
+    (upload_dir / "first").mkdir()
+    (upload_dir / "second").mkdir()
+
+    first, _ = await service.process_terraform_file_async(plan_path, upload_dir / "first")
+    second, _ = await service.process_terraform_file_async(plan_path, upload_dir / "second")
+
+    assert first == second
+    runner.run.assert_called_once()
+    assert service.cache.stats()["hits"] == 1
+
+def test_extract_resources_multiple_projects(infracost_service):
+    """Test that resources from every project are returned and tagged"""
+    data = {
+        "projects": [
+            {"name": "envs/dev", "breakdown": {"resources": [{"name": "aws_instance.a", "monthlyCost": "1.00"}]}},
+            {"name": "envs/prod", "breakdown": {"resources": [{"name": "aws_instance.a", "monthlyCost": "4.00"}]}},
+        ]
+    }
+
+    resources = infracost_service._extract_resources(data)
+
+    assert [r["project"] for r in resources] == ["envs/dev", "envs/prod"]
+    assert InfracostService.summarize_projects(resources) == [
+        {"name": "envs/dev", "resource_count": 1, "monthlyCost": 1.0},
+        {"name": "envs/prod", "resource_count": 1, "monthlyCost": 4.0},
+    ]
+
+@pytest.mark.asyncio
+async def test_process_terraform_file_async_multi_project(upload_dir, tmp_path):
+    """Test that each root module is priced separately and merged"""
+    from unittest.mock import AsyncMock
+
+    tree = upload_dir / "uid"
+    for env in ("dev", "prod"):
+        (tree / env).mkdir(parents=True)
+        (tree / env / "main.tf").write_text('resource "aws_instance" "web" {}')
+
+    async def run(cmd, **kwargs):
+        path = cmd[cmd.index("--path") + 1]
+        cost = "2.00" if path.endswith("prod") else "1.00"
+        return json.dumps({"projects": [{"name": path, "breakdown": {"resources": [
+            {"name": "aws_instance.web", "monthlyCost": cost}
+        ]}}]}).encode()
+
+    runner = MagicMock()
+    runner.run = AsyncMock(side_effect=run)
+    runner.version = AsyncMock(return_value="v0.10.30")
+    service = InfracostService(upload_dir, runner=runner, project_workers=1)
+
+    resources, _ = await service.process_terraform_file_async(tree, tree, multi_project=True)
+
+    assert runner.run.call_count == 2
+    assert sorted((r["project"], r["monthlyCost"]) for r in resources) == [("dev", "1.00"), ("prod", "2.00")]
+
+@pytest.mark.asyncio
+async def test_process_terraform_file_async_incremental(upload_dir):
+    """Test that only changed projects are re-priced against a baseline"""
+    from unittest.mock import AsyncMock
+
+    def write_tree(uid, prod_body):
+        tree = upload_dir / uid
+        for env in ("dev", "prod"):
+            (tree / env).mkdir(parents=True)
+        (tree / "dev" / "main.tf").write_text('resource "aws_instance" "web" {}')
+        (tree / "prod" / "main.tf").write_text(prod_body)
+        return tree
+
+    costs = {"dev": "1.00", "prod": "2.00"}
+
+    async def run(cmd, **kwargs):
+        env = Path(cmd[cmd.index("--path") + 1]).name
+        return json.dumps({"projects": [{"name": env, "breakdown": {"resources": [
+            {"name": "aws_instance.web", "monthlyCost": costs[env]}
+        ]}}]}).encode()
+
+    runner = MagicMock()
+    runner.run = AsyncMock(side_effect=run)
+    runner.version = AsyncMock(return_value="v0.10.30")
+    service = InfracostService(upload_dir, runner=runner)
+
+    base = write_tree("base", 'resource "aws_instance" "web" {}')
+    await service.process_terraform_file_async(base, base, multi_project=True)
+    assert runner.run.call_count == 2
+
+    costs["prod"] = "5.00"
+    new = write_tree("new", 'resource "aws_instance" "web" { instance_type = "m5.large" }')
+    resources, uid = await service.process_terraform_file_async(new, new, baseline_uid="base")
+
+    assert runner.run.call_count == 3
+    assert [(r["project"], r["monthlyCost"]) for r in resources] == [("dev", "1.00"), ("prod", "5.00")]
+    meta = service.get_estimate_meta(uid)
+    assert meta["parent_uid"] == "base"
+    assert meta["meta"]["incremental"] == {"rerun": ["prod"], "reused": ["dev"], "removed": []}
+
+    diff = service.compare_estimates("base", uid)
+    assert [r["project"] for r in diff["increased"]] == ["prod"]
+
+@pytest.mark.asyncio
+async def test_process_terraform_file_async_incremental_needs_fingerprints(upload_dir):
+    """Test that a baseline without fingerprints is rejected"""
+    from unittest.mock import AsyncMock
+
+    tree = upload_dir / "new"
+    tree.mkdir()
+    (tree / "main.tf").write_text('resource "aws_instance" "web" {}')
+
+    runner = MagicMock()
+    runner.version = AsyncMock(return_value="v0.10.30")
+    service = InfracostService(upload_dir, runner=runner)
+    service.store.save("base", [{"name": "aws_instance.web", "monthlyCost": "1.00"}])
+
+    with pytest.raises(ValueError, match="no module fingerprints"):
+        await service.process_terraform_file_async(tree, tree, baseline_uid="base")
+    with pytest.raises(BaselineNotFoundError):
+        await service.process_terraform_file_async(tree, tree, baseline_uid="missing")
+
+def test_finish_relativizes_project_names(infracost_service):
+    """Test that project names do not leak the per-upload working directory"""
+    extract_path = infracost_service.upload_dir / "uid-1"
+    extract_path.mkdir()
+    data = {"projects": [
+        {"name": str(extract_path), "breakdown": {"resources": [{"name": "a"}]}},
+        {"name": str(extract_path.resolve() / "envs" / "prod"), "breakdown": {"resources": [{"name": "b"}]}},
+    ]}
+
+    resources, _ = infracost_service._finish_data(data, extract_path)
+
+    assert [r["project"] for r in resources] == [".", "envs/prod"]
+
+def test_relative_name_strips_whole_components(tmp_path):
+    """Test that only whole path components of the working directory are stripped"""
+    extract_path = tmp_path / "abc"
+
+    assert InfracostService._relative_name(str(tmp_path / "abcdef" / "x"), extract_path) == str(tmp_path / "abcdef" / "x")
+    assert InfracostService._relative_name(str(extract_path / "x"), extract_path) == "x"
+    assert InfracostService._relative_name("main", extract_path) == "main"
+
+def test_get_estimate_summary(infracost_service):
+    """Test that summaries are served from the stored rollups"""
+    infracost_service.store.save("uid-1", [
+        {"name": "module.web.aws_instance.a", "resource_type": "aws_instance", "monthlyCost": "30.00"},
+        {"name": "google_storage_bucket.b", "resource_type": "google_storage_bucket", "monthlyCost": "2.00"},
+    ])
+
+    summary = infracost_service.get_estimate_summary("uid-1", top=1)
+
+    assert summary["resource_count"] == 2
+    assert summary["total_monthly_cost"] == 32.0
+    assert [(g["key"], g["monthlyCost"]) for g in summary["groups"]["provider"]] == [("aws", 30.0), ("google", 2.0)]
+    assert [g["key"] for g in summary["groups"]["module"]] == ["module.web", "root"]
+
+    with pytest.raises(ValueError):
+        infracost_service.get_estimate_summary("uid-1", top=11)
+    with pytest.raises(FileNotFoundError):
+        infracost_service.get_estimate_summary("missing")
+
+def test_compare_series(infracost_service):
+    """Test that a series is compared from the stored estimates"""
+    for uid, cost in (("c1", "1.00"), ("c2", "3.00")):
+        infracost_service.store.save(uid, [{"name": "aws_instance.web", "monthlyCost": cost}])
+
+    result = infracost_service.compare_series(["c1", "c2"])
+
+    assert result["totals"] == [1.0, 3.0]
+    assert result["resources"][0]["costs"] == [1.0, 3.0]
+
+    with pytest.raises(FileNotFoundError, match="missing"):
+        infracost_service.compare_series(["c1", "missing"])
+
+def test_compare_components(infracost_service):
+    """Test the component-level diff of stored estimates"""
+    component = {"name": "Instance usage", "unit": "hours", "monthlyQuantity": "730", "price": "0.01", "monthlyCost": "7.3"}
+    infracost_service.store.save("base", [{"name": "aws_instance.web", "monthlyCost": "7.3", "costComponents": [component]}])
+    infracost_service.store.save("proposed", [{
+        "name": "aws_instance.web", "monthlyCost": "14.6",
+        "costComponents": [dict(component, price="0.02", monthlyCost="14.6")]
+    }])
+
+    result = infracost_service.compare_components("base", "proposed")
+
+    assert result["resources"][0]["costComponents"][0]["cause"] == "price"
+    with pytest.raises(FileNotFoundError):
+        infracost_service.compare_components("base", "missing")
+
+def test_comparisons_are_memoized(upload_dir):
+    """Test that comparisons are cached per estimate version and options"""
+    service = InfracostService(upload_dir, comparisons=LRUCache())
+    service.store.save("base", [{"name": "aws_instance.web", "monthlyCost": "1.00"}])
+    service.store.save("proposed", [{"name": "aws_instance.web", "monthlyCost": "2.00"}])
+
+    first = service.compare_estimates("base", "proposed")
+    assert service.compare_estimates("base", "proposed") is first
+    assert service.compare_estimates("base", "proposed", details=False) is not first
+
+    # Saving an estimate again gives it a new version
+    service.store.save("proposed", [{"name": "aws_instance.web", "monthlyCost": "3.00"}])
+    assert service.compare_estimates("base", "proposed")["increased"][0]["delta"] == 2.0
+
+    with pytest.raises(FileNotFoundError):
+        service.compare_estimates("base", "missing")
+    with pytest.raises(FileNotFoundError):
+        service.estimate_version("base", "missing")
+
+def test_reprice_caches_models(upload_dir):
+    """Test that repricing builds the pricing model once per estimate version"""
+    service = InfracostService(upload_dir, pricing_models=LRUCache())
+    service.store.save("uid-1", [{
+        "name": "aws_instance.web",
+        "monthlyCost": "7.3",
+        "costComponents": [{"name": "Instance usage", "unit": "hours", "monthlyQuantity": "730", "price": "0.01", "monthlyCost": "7.3"}]
+    }])
+
+    result = service.reprice("uid-1", [{"index": 0, "usage": 10}])
+
+    assert result["uid"] == "uid-1"
+    assert result["total"] == 0.73
+    assert service.get_pricing_model("uid-1") is service.get_pricing_model("uid-1")
+    with pytest.raises(FileNotFoundError):
+        service.reprice("missing", [])
+
+def test_simulate_estimate(upload_dir):
+    """Test that simulation runs against the stored estimate"""
+    pytest.importorskip("numpy")
+    service = InfracostService(upload_dir)
+    service.store.save("uid-1", [{
+        "name": "aws_instance.web",
+        "monthlyCost": "7.3",
+        "costComponents": [{"name": "Instance usage", "unit": "hours", "monthlyQuantity": "730", "price": "0.01", "monthlyCost": "7.3"}]
+    }])
+
+    result = service.simulate("uid-1", {"aws_instance.web": {"monthly_hours": {"min": 100, "max": 100}}}, samples=10)
+
+    assert result["uid"] == "uid-1"
+    assert result["total"]["p50"] == 1.0
+    with pytest.raises(FileNotFoundError):
+        service.simulate("missing", {})
+
+@pytest.mark.asyncio
+async def test_price_with_usage(upload_dir, mock_infracost_output, tmp_path):
+    """Test that usage re-prices the retained tree once per distinct usage file"""
+    from unittest.mock import AsyncMock
+    from app.services.tree_cache import TreeCache
+
+    usage_files = []
+
+    def run(cmd, consume=None, **kwargs):
+        if "--usage-file" in cmd:
+            usage_files.append(json.loads(Path(cmd[cmd.index("--usage-file") + 1]).read_text()))
+        return consume(iter([json.dumps(mock_infracost_output).encode()]))
+
+    runner = MagicMock()
+    runner.version = AsyncMock(return_value="v0.10")
+    runner.run = AsyncMock(side_effect=run)
+    service = InfracostService(upload_dir, runner=runner, trees=TreeCache(tmp_path / "trees"))
+
+    extract_path = upload_dir / "upload-uid"
+    extract_path.mkdir()
+    (extract_path / "main.tf").write_text('resource "aws_instance" "web" {}')
+    await service.process_terraform_file_async(extract_path, extract_path)
+    import shutil
+    shutil.rmtree(extract_path)
+
+    usage = {"aws_instance.web": {"monthly_hours": 360}}
+    first = await service.price_with_usage("upload-uid", usage)
+    second = await service.price_with_usage("upload-uid", dict(usage))
+
+    assert first["parent_uid"] == "upload-uid"
+    assert not first["deduplicated"] and second["deduplicated"]
+    assert second["uid"] == first["uid"]
+    assert runner.run.call_count == 2
+    assert usage_files == [{"version": "0.1", "resource_usage": usage}]
+    assert service.get_estimate(first["uid"]) == service.get_estimate("upload-uid")
+    assert service.get_estimate_meta(first["uid"])["meta"]["usage"] == usage
+    assert not (upload_dir / first["uid"]).exists()
+
+    other = await service.price_with_usage(first["uid"], {"aws_instance.web": {"monthly_hours": 100}})
+    assert other["uid"] != first["uid"] and other["parent_uid"] == first["uid"]
+
+@pytest.mark.asyncio
+async def test_price_with_usage_survives_first_caller_leaving(upload_dir, mock_infracost_output, tmp_path):
+    """Test that a joined caller still gets the result when the caller who started the run disconnects"""
+    import asyncio
+    from unittest.mock import AsyncMock
+    from app.services.infracost_runner import InfracostCancelledError
+    from app.services.tree_cache import TreeCache
+
+    joined = asyncio.Event()
+
+    async def run(cmd, consume=None, is_disconnected=None, **kwargs):
+        if "--usage-file" in cmd:
+            await joined.wait()
+            if is_disconnected is not None and await is_disconnected():
+                raise InfracostCancelledError("Client disconnected")
+        return consume(iter([json.dumps(mock_infracost_output).encode()]))
+
+    runner = MagicMock()
+    runner.version = AsyncMock(return_value="v0.10")
+    runner.run = AsyncMock(side_effect=run)
+    service = InfracostService(upload_dir, runner=runner, trees=TreeCache(tmp_path / "trees"))
+
+    extract_path = upload_dir / "upload-uid"
+    extract_path.mkdir()
+    (extract_path / "main.tf").write_text('resource "aws_instance" "web" {}')
+    await service.process_terraform_file_async(extract_path, extract_path)
+
+    async def gone():
+        return True
+
+    async def connected():
+        return False
+
+    async def join():
+        while service.usage_runs.stats()["in_flight"] == 0:
+            await asyncio.sleep(0)
+        result = asyncio.ensure_future(service.price_with_usage("upload-uid", usage, is_disconnected=connected))
+        while service.usage_runs.stats()["joined"] == 0:
+            await asyncio.sleep(0.001)
+        joined.set()
+        return await result
+
+    usage = {"aws_instance.web": {"monthly_hours": 360}}
+    first, second = await asyncio.gather(
+        service.price_with_usage("upload-uid", usage, is_disconnected=gone), join()
+    )
+
+    assert first["uid"] == second["uid"]
+    assert second["deduplicated"]
+    assert service.usage_runs.stats()["joined"] == 1
+
+@pytest.mark.asyncio
+async def test_price_with_usage_needs_a_tree(upload_dir, tmp_path):
+    """Test that estimates without a retained tree cannot be re-priced"""
+    from app.services.tree_cache import TreeCache
+
+    service = InfracostService(upload_dir, trees=TreeCache(tmp_path / "trees"))
+    service.store.save("plan-uid", [])
+
+    with pytest.raises(ValueError, match="no Terraform tree"):
+        await service.price_with_usage("plan-uid", {})
+    with pytest.raises(FileNotFoundError):
+        await service.price_with_usage("missing", {})
+
+@pytest.mark.asyncio
+async def test_price_with_usage_offline(upload_dir, tmp_path):
+    """Test that usage is priced from learned prices without Infracost"""
+    from unittest.mock import AsyncMock
+    from app.services.price_index import PriceIndex
+    from app.services.tree_cache import TreeCache
+
+    output = {"projects": [{"breakdown": {"resources": [{
+        "name": "aws_instance.web",
+        "resourceType": "aws_instance",
+        "monthlyCost": "7.3",
+        "costComponents": [{"name": "Instance usage", "unit": "hours", "monthlyQuantity": "730", "price": "0.01", "monthlyCost": "7.3"}]
+    }]}}]}
+    runner = MagicMock()
+    runner.version = AsyncMock(return_value="v0.10")
+    runner.run = AsyncMock(side_effect=lambda cmd, consume=None, **kwargs: consume(iter([json.dumps(output).encode()])))
+    prices = PriceIndex(tmp_path / "prices.db")
+    service = InfracostService(upload_dir, runner=runner, trees=TreeCache(tmp_path / "trees"), prices=prices)
+
+    extract_path = upload_dir / "upload-uid"
+    extract_path.mkdir()
+    (extract_path / "main.tf").write_text('resource "aws_instance" "web" {}')
+    await service.process_terraform_file_async(extract_path, extract_path)
+    assert prices.stats()["entries"] == 1
+
+    result = await service.price_with_usage("upload-uid", {"aws_instance.web": {"monthly_hours": 100}})
+
+    assert result["offline"]
+    assert result["total_monthly_cost"] == pytest.approx(1.0)
+    assert runner.run.call_count == 1
+    prices.close()
+
+@pytest.mark.asyncio
+async def test_refresh_prices(upload_dir, tmp_path):
+    """Test that stale trees are re-run and their prices seen again"""
+    from unittest.mock import AsyncMock
+    from app.services.price_index import PriceIndex
+    from app.services.tree_cache import TreeCache
+
+    output = {"projects": [{"breakdown": {"resources": [{
+        "name": "aws_instance.web",
+        "resourceType": "aws_instance",
+        "monthlyCost": "7.3",
+        "costComponents": [{"name": "Instance usage", "unit": "hours", "monthlyQuantity": "730", "price": "0.02", "monthlyCost": "14.6"}]
+    }]}}]}
+    trees = TreeCache(tmp_path / "trees")
+    tree = tmp_path / "tree"
+    tree.mkdir()
+    (tree / "main.tf").write_text('resource "aws_instance" "web" {}')
+    tree_hash = trees.retain(tree)
+
+    prices = PriceIndex(tmp_path / "prices.db", max_age_seconds=60)
+    prices.record({("aws_instance", b"\x00" * 8): ("hours", 0.01)}, tree=tree_hash, observed_at=0)
+    prices.record({("aws_instance", b"\x01" * 8): ("hours", 0.01)}, tree="evicted", observed_at=0)
+    runner = MagicMock()
+    runner.run = AsyncMock(return_value=json.dumps(output).encode())
+    service = InfracostService(upload_dir, runner=runner, trees=trees, prices=prices)
+
+    result = await service.refresh_prices()
+
+    assert result["refreshed"] == [tree_hash]
+    assert result["missing"] == ["evicted"]
+    assert result["stats"]["entries"] == 3
+    assert "--path" in runner.run.call_args.args[0]
+    prices.close()
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from app.services.infracost_service import InfracostService
+from app.services.infracost_stream import ResourceStreamParser, iter_resources
+
+@pytest.fixture
+def infracost_output():
+    """Infracost output with the fields the parser has to skip past"""
+    return {
+        "version": "0.2",
+        "metadata": {"tags": ["}]", "{["]},
+        "projects": [
+            {
+                "metadata": {"path": "/tmp/x"},
+                "pastBreakdown": {"resources": [{"name": "aws_instance.old"}]},
+                "breakdown": {
+                    "resources": [
+                        {"name": "aws_instance.web", "monthlyCost": "10.50",
+                         "costComponents": [{"name": "Instance usage \"Linux\" é", "price": "0.0144"}]},
+                        {"name": "aws_lambda_function.api", "monthlyCost": None}
+                    ],
+                    "totalMonthlyCost": "10.50"
+                },
+                "name": "envs/prod"
+            },
+            {"name": "envs/dev", "breakdown": {"resources": []}},
+            {"breakdown": {"resources": [{"name": "aws_s3_bucket.logs", "monthlyCost": -1.5e2}]}}
+        ],
+        "summary": {"totalDetectedResources": 3, "unsupported": [None, False]}
+    }
+
+def split(payload, size):
+    return [payload[i:i + size] for i in range(0, len(payload), size)]
+
+@pytest.mark.parametrize("size", [1, 7, 4096])
+def test_matches_in_memory_extraction(infracost_output, size):
+    """Test that any chunking yields the same resources as json.loads"""
+    payload = json.dumps(infracost_output, indent=2, ensure_ascii=False).encode()
+    expected = InfracostService._extract_resources(None, json.loads(payload))
+
+    assert list(iter_resources(split(payload, size))) == expected
+
+def test_resources_are_emitted_as_they_complete():
+    """Test that a resource is returned by the chunk that completes it"""
+    parser = ResourceStreamParser()
+
+    assert parser.feed(b'{"projects": [{"name": "p", "breakdown": {"resources": [{"name": "a"}, {"na') == [
+        {"name": "a", "project": "p"}
+    ]
+    assert parser.feed(b'me": "b"}]}}]}') == [{"name": "b", "project": "p"}]
+    assert parser.close() == []
+
+@pytest.mark.parametrize("payload, message", [
+    (b'{"projects": []}', "No projects found"),
+    (b'{"projects": [{"name": "p"}]}', "No cost breakdown found"),
+    (b'{"projects": [{"name": "p", "breakdown": {"resources": [{"a": 1}', "ended unexpectedly"),
+    (b'{"projects": [}', "Mismatched closing bracket"),
+])
+def test_errors(payload, message):
+    """Test that empty, truncated and malformed output is rejected"""
+    with pytest.raises(ValueError, match=message):
+        list(iter_resources([payload]))
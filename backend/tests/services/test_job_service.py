@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from app.services.job_service import JobManager, JobState
+
+@pytest.fixture
+def job_manager(tmp_path):
+    (tmp_path / "job-1").mkdir()
+    return JobManager(tmp_path, poll_interval=0.01)
+
+def test_create_and_update(job_manager):
+    """Test job creation and state transitions"""
+    job = job_manager.create("job-1", "main.zip")
+    assert job["state"] == "queued"
+
+    job_manager.update("job-1", JobState.RUNNING_INFRACOST)
+    assert job_manager.get("job-1")["state"] == "running_infracost"
+
+    job_manager.update("job-1", JobState.DONE, resource_count=3)
+    job = job_manager.get("job-1")
+    assert job["state"] == "done"
+    assert job["resource_count"] == 3
+
+def test_get_reads_persisted_state(job_manager, tmp_path):
+    """Test that another manager instance can read a job from disk"""
+    job_manager.create("job-1", "main.zip")
+    job_manager.update("job-1", JobState.FAILED, error="boom")
+
+    other = JobManager(tmp_path)
+    job = other.get("job-1")
+    assert job["state"] == "failed"
+    assert job["error"] == "boom"
+
+def test_release_keeps_only_the_job_record(job_manager, tmp_path):
+    """Test that a job's extracted files are removed but its state stays readable"""
+    job_manager.create("job-1", "main.zip")
+    (tmp_path / "job-1" / "main.tf").write_text("")
+    (tmp_path / "job-1" / "modules").mkdir()
+    job_manager.update("job-1", JobState.DONE)
+
+    job_manager.release("job-1")
+
+    assert [path.name for path in (tmp_path / "job-1").iterdir()] == ["job.json"]
+    assert JobManager(tmp_path).get("job-1")["state"] == "done"
+
+def test_purge_expired_jobs(tmp_path):
+    """Test that finished jobs are removed after the retention period, running ones kept"""
+    job_manager = JobManager(tmp_path, retention_seconds=60)
+    for job_id in ("done", "failed", "running"):
+        (tmp_path / job_id).mkdir()
+        job_manager.create(job_id, "main.zip")
+    job_manager.update("done", JobState.DONE)
+    job_manager.update("failed", JobState.FAILED, error="boom")
+    job_manager.update("running", JobState.RUNNING_INFRACOST)
+    updated_at = job_manager.get("done")["updated_at"]
+
+    assert job_manager.purge_expired(now=updated_at + 30) == []
+    assert sorted(job_manager.purge_expired(now=updated_at + 120)) == ["done", "failed"]
+    assert job_manager.get("done") is None
+    assert not (tmp_path / "failed").exists()
+    assert job_manager.get("running")["state"] == "running_infracost"
+
+def test_get_unknown_job(job_manager):
+    """Test that unknown or path-like ids are not found"""
+    assert job_manager.get("missing") is None
+    assert job_manager.get("../job-1") is None
+
+@pytest.mark.asyncio
+async def test_events_stream_transitions(job_manager):
+    """Test that subscribers receive every transition until the job finishes"""
+    job_manager.create("job-1", "main.zip")
+
+    async def drive():
+        await asyncio.sleep(0.01)
+        for state in (JobState.EXTRACTING, JobState.RUNNING_INFRACOST, JobState.PARSING, JobState.DONE):
+            job_manager.update("job-1", state)
+            await asyncio.sleep(0)
+
+    driver = asyncio.ensure_future(drive())
+    states = [job["state"] async for job in job_manager.events("job-1")]
+    await driver
+
+    assert states == ["queued", "extracting", "running_infracost", "parsing", "done"]
@@ -0,0 +1,39 @@
+from app.services.lru_cache import LRUCache
+
+def test_get_or_compute_memoizes():
+    """Test that results are computed once per key"""
+    cache = LRUCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"result": len(calls)}
+
+    assert cache.get_or_compute("a", compute) == {"result": 1}
+    assert cache.get_or_compute("a", compute) == {"result": 1}
+    assert len(calls) == 1
+    assert cache.stats() == {"entries": 1, "max_entries": 128, "hits": 1, "misses": 1}
+
+def test_least_recently_used_is_evicted():
+    """Test that the cache stays within its bound"""
+    cache = LRUCache(max_entries=2)
+    cache.get_or_compute("a", lambda: 1)
+    cache.get_or_compute("b", lambda: 2)
+    cache.get_or_compute("a", lambda: 1)
+    cache.get_or_compute("c", lambda: 3)
+
+    assert cache.get_or_compute("a", lambda: "recomputed") == 1
+    assert cache.get_or_compute("b", lambda: "recomputed") == "recomputed"
+
+def test_errors_are_not_cached():
+    """Test that a failing computation leaves no entry behind"""
+    cache = LRUCache()
+
+    def fail():
+        raise FileNotFoundError("missing")
+
+    try:
+        cache.get_or_compute("a", fail)
+    except FileNotFoundError:
+        pass
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,166 @@
+import pytest
+
+from app.services.price_index import PriceIndex, component_fingerprint
+
+@pytest.fixture
+def index(tmp_path):
+    index = PriceIndex(tmp_path / "prices.db", max_age_seconds=100)
+    yield index
+    index.close()
+
+@pytest.fixture
+def resources():
+    return [
+        {
+            "name": "aws_instance.web",
+            "resourceType": "aws_instance",
+            "metadata": {"region": "us-east-1"},
+            "monthlyCost": "8.392",
+            "costComponents": [
+                {"name": "Instance usage (Linux/UNIX, on-demand, t3.micro)", "unit": "hours",
+                 "monthlyQuantity": "730", "price": "0.0104", "monthlyCost": "7.592"},
+            ],
+            "subresources": [
+                {
+                    "name": "root_block_device",
+                    "costComponents": [
+                        {"name": "Storage (general purpose SSD, gp2)", "unit": "GB",
+                         "monthlyQuantity": "8", "price": "0.1", "monthlyCost": "0.8"},
+                    ],
+                }
+            ],
+        },
+        {
+            "name": "aws_lambda_function.api",
+            "resourceType": "aws_lambda_function",
+            "monthlyCost": "0",
+            "costComponents": [
+                {"name": "Requests", "unit": "1M requests", "monthlyQuantity": None,
+                 "price": "0.2", "monthlyCost": None, "usageBased": True},
+            ],
+        },
+    ]
+
+def test_fingerprint_distinguishes_attributes():
+    """Test that name, unit, path and region all change the fingerprint"""
+    component = {"name": "Storage", "unit": "GB"}
+    fingerprints = {
+        component_fingerprint("", component, "us-east-1"),
+        component_fingerprint("/root_block_device", component, "us-east-1"),
+        component_fingerprint("", component, "eu-west-1"),
+        component_fingerprint("", {"name": "Storage", "unit": "GB-months"}, "us-east-1"),
+    }
+    assert len(fingerprints) == 4
+    assert len(component_fingerprint("", component, None)) == 8
+
+def test_learn_and_lookup(index, resources):
+    """Test that every priced component is indexed, subresources included"""
+    assert index.learn(resources, tree="tree-1") == 3
+
+    storage = {"name": "Storage (general purpose SSD, gp2)", "unit": "GB"}
+    entry = index.lookup("aws_instance", component_fingerprint("/root_block_device", storage, "us-east-1"))
+    assert entry["price"] == 0.1
+    assert entry["unit"] == "GB"
+    assert entry["tree"] == "tree-1"
+    assert not entry["stale"]
+    assert index.lookup("aws_instance", component_fingerprint("", storage, "us-east-1")) is None
+
+def test_record_tracks_changes_and_staleness(index):
+    """Test that observations refresh entries and price changes are dated"""
+    key = ("aws_instance", b"\x00" * 8)
+    index.record({key: ("hours", 0.01)}, observed_at=1000)
+    index.record({key: ("hours", 0.01)}, observed_at=1050)
+
+    entry = index.lookup(*key, now=1100)
+    assert (entry["observed_at"], entry["changed_at"], entry["stale"]) == (1050, 1000, False)
+    assert index.lookup(*key, now=1200)["stale"]
+    assert index.stats(now=1200)["stale"] == 1
+
+    index.record({key: ("hours", 0.02)}, observed_at=1300)
+    entry = index.lookup(*key, now=1300)
+    assert (entry["price"], entry["changed_at"]) == (0.02, 1300)
+
+def test_price_usage_offline(index, resources):
+    """Test that usage is priced from the index alone"""
+    index.learn(resources, tree="tree-1")
+
+    priced = index.price_usage(resources, {
+        "aws_instance.web": {"monthly_hours": 365},
+        "aws_lambda_function.api": {"monthly_requests": 3000000},
+    }, tree="tree-1")
+
+    web, api = priced
+    assert float(web["costComponents"][0]["monthlyCost"]) == pytest.approx(3.796)
+    assert float(web["monthlyCost"]) == pytest.approx(4.596)
+    assert float(api["costComponents"][0]["monthlyQuantity"]) == 3
+    assert float(api["monthlyCost"]) == pytest.approx(0.6)
+    assert resources[0]["monthlyCost"] == "8.392"
+
+def test_price_usage_needs_fresh_trusted_prices(index, resources):
+    """Test the cases where Infracost still has to run"""
+    index.learn(resources, tree="tree-1")
+
+    # Unknown usage keys and keys driving nothing
+    assert index.price_usage(resources, {"aws_instance.web": {"cpu_credits": 1}}, "tree-1") is None
+    assert index.price_usage(resources, {"aws_instance.web": {"monthly_requests": 1}}, "tree-1") is None
+    # Without a region, prices are only trusted for the tree they came from
+    usage = {"aws_lambda_function.api": {"monthly_requests": 1000000}}
+    assert index.price_usage(resources, usage, "tree-2") is None
+    assert index.price_usage(resources, usage, "tree-1") is not None
+
+    stale = PriceIndex(index.db_path, max_age_seconds=-1)
+    assert stale.price_usage(resources, usage, "tree-1") is None
+    stale.close()
+
+def test_price_usage_needs_a_single_untiered_component(index):
+    """Test that keys matching several components or a price tier are left to Infracost"""
+    def component(name, unit):
+        return {"name": name, "unit": unit, "monthlyQuantity": "1", "price": "0.25", "monthlyCost": "0.25"}
+
+    resources = [
+        {
+            "name": "aws_dynamodb_table.orders",
+            "resourceType": "aws_dynamodb_table",
+            "metadata": {"region": "us-east-1"},
+            "monthlyCost": "0.75",
+            "costComponents": [
+                component("Data storage", "GB"),
+                component("Point-In-Time Recovery (PITR) backup storage", "GB"),
+                component("On-demand backup storage", "GB"),
+            ],
+        },
+        {
+            "name": "aws_instance.web",
+            "resourceType": "aws_instance",
+            "metadata": {"region": "us-east-1"},
+            "monthlyCost": "0.5",
+            "costComponents": [
+                component("Instance usage (Linux/UNIX, on-demand, t3.micro)", "hours"),
+                component("CPU credits", "vCPU-hours"),
+            ],
+        },
+        {
+            "name": "aws_lambda_function.api",
+            "resourceType": "aws_lambda_function",
+            "metadata": {"region": "us-east-1"},
+            "monthlyCost": "0.25",
+            "costComponents": [component("Requests (first 1B)", "1M requests")],
+        },
+    ]
+    index.learn(resources, tree="tree-1")
+
+    assert index.price_usage(resources, {"aws_dynamodb_table.orders": {"storage_gb": 100}}, "tree-1") is None
+    assert index.price_usage(resources, {"aws_lambda_function.api": {"monthly_requests": 1}}, "tree-1") is None
+    # CPU credits are billed in vCPU-hours, not the instance's hours
+    web = index.price_usage(resources, {"aws_instance.web": {"monthly_hours": 100}}, "tree-1")[1]
+    assert [c["monthlyQuantity"] for c in web["costComponents"]] == ["100", "1"]
+    assert float(web["monthlyCost"]) == pytest.approx(25.25)
+
+def test_stale_trees(index):
+    """Test that stale trees are listed with the most stale entries first"""
+    index.record({("a", b"1" * 8): (None, 1.0), ("a", b"2" * 8): (None, 1.0)}, tree="big", observed_at=0)
+    index.record({("a", b"3" * 8): (None, 1.0)}, tree="small", observed_at=0)
+    index.record({("a", b"4" * 8): (None, 1.0)}, tree="fresh", observed_at=1000)
+
+    assert index.stale_trees(now=1050) == ["big", "small"]
+    assert index.stale_trees(limit=1, now=1050) == ["big"]
@@ -188,4 +188,108 @@ def test_apply_template_to_resources():
     
     # Test applying a non-existent template
     with pytest.raises(ValueError):
-        template_service.apply_template_to_resources("non-existent", resources)
\ No newline at end of file
+        template_service.apply_template_to_resources("non-existent", resources)
+def test_registry_serves_templates_from_memory(mock_templates_dir):
+    """Test that templates are read once and reloaded when the directory changes"""
+    custom_template = {
+        "id": "custom-test",
+        "name": "Custom Test",
+        "description": "A custom template for testing",
+        "template": {"aws_instance": {"monthly_hours": 200}}
+    }
+    with open(os.path.join(mock_templates_dir, "custom-test.json"), "w") as f:
+        json.dump(custom_template, f)
+
+    with patch("app.services.template_service._load_custom_templates",
+               wraps=template_service._load_custom_templates) as load:
+        assert template_service.get_custom_templates() == [custom_template]
+        assert template_service.get_template_by_id("custom-test") == custom_template
+        assert template_service.get_custom_templates() == [custom_template]
+        assert load.call_count == 1
+
+        # Writes through the service are applied without a reload
+        saved = dict(custom_template, id="saved", name="Saved")
+        template_service.save_custom_template(saved)
+        assert template_service.get_template_by_id("saved") == saved
+        assert template_service.delete_custom_template("custom-test") is True
+        assert template_service.get_custom_templates() == [saved]
+        assert load.call_count == 1
+
+        # A file added behind the service's back changes the directory
+        other = dict(custom_template, id="other")
+        with open(os.path.join(mock_templates_dir, "other.json"), "w") as f:
+            json.dump(other, f)
+        os.utime(mock_templates_dir, ns=(0, 1))
+        assert template_service.get_template_by_id("other") == other
+        assert load.call_count == 2
+
+def test_registry_follows_templates_dir(mock_templates_dir):
+    """Test that pointing TEMPLATES_DIR elsewhere switches templates"""
+    template_service.save_custom_template({
+        "id": "in-first-dir",
+        "name": "First",
+        "description": "Saved to the first directory",
+        "template": {}
+    })
+    with tempfile.TemporaryDirectory() as other_dir:
+        with patch("app.services.template_service.TEMPLATES_DIR", Path(other_dir)):
+            assert template_service.get_custom_templates() == []
+            assert template_service.get_template_by_id("in-first-dir") is None
+    assert template_service.get_template_by_id("in-first-dir") is not None
+
+def test_list_templates_pages_defaults_and_custom(mock_templates_dir):
+    """Test paging through default and custom templates in ID order"""
+    for template_id in ["alpha", "omega", "middle"]:
+        template_service.save_custom_template({
+            "id": template_id,
+            "name": f"{template_id.title()} team",
+            "description": "Custom template",
+            "template": {}
+        })
+    
+    ids = []
+    cursor = None
+    while True:
+        page = template_service.list_templates(limit=2, cursor=cursor)
+        assert len(page["templates"]) <= 2
+        ids += [t["id"] for t in page["templates"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert ids == sorted(["alpha", "omega", "middle", "dev-environment", "prod-environment", "high-traffic"])
+    
+    page = template_service.list_templates(query="team")
+    assert [t["id"] for t in page["templates"]] == ["alpha", "middle", "omega"]
+    page = template_service.list_templates(query="24/7")
+    assert [t["id"] for t in page["templates"]] == ["high-traffic", "prod-environment"]
+    
+    with pytest.raises(ValueError):
+        template_service.list_templates(limit=0)
+    with pytest.raises(ValueError):
+        template_service.list_templates(cursor="!!")
+
+def test_sqlite_store_backend(mock_templates_dir, tmp_path):
+    """Test the SQLite backend, importing templates already on disk"""
+    existing = {
+        "id": "existing",
+        "name": "Existing",
+        "description": "Saved as a file",
+        "template": {"aws_instance": {"monthly_hours": 10}}
+    }
+    with open(os.path.join(mock_templates_dir, "existing.json"), "w") as f:
+        json.dump(existing, f)
+    
+    with patch("app.services.template_service.TEMPLATE_DB_PATH", str(tmp_path / "templates.db")):
+        sqlite_store = template_service._open_store()
+    with patch("app.services.template_service.store", sqlite_store):
+        assert template_service.get_template_by_id("existing") == existing
+        
+        saved = dict(existing, id="new", name="New")
+        template_service.save_custom_template(saved)
+        assert not os.path.exists(os.path.join(mock_templates_dir, "new.json"))
+        assert [t["id"] for t in template_service.get_custom_templates()] == ["existing", "new"]
+        assert [t["id"] for t in template_service.list_templates(query="new")["templates"]] == ["new"]
+        
+        assert template_service.delete_custom_template("new") is True
+        assert template_service.delete_custom_template("new") is False
+    sqlite_store.close()
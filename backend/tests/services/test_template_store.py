@@ -0,0 +1,90 @@
+import threading
+
+import pytest
+
+from app.services.template_store import (
+    SQLiteTemplateStore, TemplateStore, decode_cursor, encode_cursor, matches, search_terms
+)
+
+
+def template(template_id, name="Team template", description="Shared usage", **usage):
+    return {"id": template_id, "name": name, "description": description, "template": usage}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteTemplateStore(tmp_path / "templates.db")
+    yield store
+    store.close()
+
+
+def test_upsert_get_delete(store):
+    store.upsert(template("a", aws_instance={"monthly_hours": 100}))
+    assert store.get("a")["template"] == {"aws_instance": {"monthly_hours": 100}}
+
+    store.upsert(template("a", name="Renamed"))
+    assert store.get("a")["name"] == "Renamed"
+    assert store.count() == 1
+
+    assert store.delete("a") is True
+    assert store.delete("a") is False
+    assert store.get("a") is None
+
+
+def test_page_in_id_order(store):
+    assert store.upsert_many(template(f"t{i:03d}") for i in range(25)) == 25
+    first = store.page(None, None, 10)
+    assert [t["id"] for t in first] == [f"t{i:03d}" for i in range(10)]
+    second = store.page(None, first[-1]["id"], 10)
+    assert second[0]["id"] == "t010"
+    assert len(store.page(None, "t020", 10)) == 4
+    assert [t["id"] for t in store.list()] == [f"t{i:03d}" for i in range(25)]
+
+
+def test_search_names_and_descriptions(store):
+    store.upsert(template("prod", name="Production web", description="24/7 traffic"))
+    store.upsert(template("dev", name="Development", description="Business hours only"))
+    store.upsert(template("batch", name="Nightly batch", description="Runs in production windows"))
+
+    assert [t["id"] for t in store.page("prod", None, 10)] == ["batch", "prod"]
+    assert [t["id"] for t in store.page("business hour", None, 10)] == ["dev"]
+    assert store.page("missing", None, 10) == []
+
+    # The index follows updates and deletes
+    store.upsert(template("dev", name="Staging", description="Weekdays"))
+    assert store.page("business", None, 10) == []
+    store.delete("prod")
+    assert [t["id"] for t in store.page("production", None, 10)] == ["batch"]
+
+
+def test_concurrent_upserts_are_atomic(store):
+    def write(n):
+        for i in range(50):
+            store.upsert(template("shared", name=f"writer {n}", description=str(i), big=["x" * 100] * 50))
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    saved = store.get("shared")
+    assert saved["description"] == "49"
+    assert store.count() == 1
+
+
+def test_search_helpers():
+    assert search_terms("Prod-Env  web_app") == ["prod", "env", "web", "app"]
+    assert matches(template("x", name="Production"), ["prod"])
+    assert not matches(template("x", name="Production"), ["duct"])
+    assert decode_cursor(encode_cursor("team/ü")) == "team/ü"
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor!")
+
+
+def test_incomplete_backend_fails_on_creation():
+    class ReadOnlyStore(TemplateStore):
+        def get(self, template_id):
+            return None
+
+    with pytest.raises(TypeError):
+        ReadOnlyStore()
@@ -0,0 +1,102 @@
+import pytest
+
+from app.services.terraform_projects import (
+    discover_root_modules,
+    find_projects,
+    fingerprint_project,
+    load_infracost_config
+)
+
+@pytest.fixture
+def monorepo(tmp_path):
+    """Create a tree with two root modules sharing a local module"""
+    for path in ("envs/dev", "envs/prod", "modules/network"):
+        (tmp_path / path).mkdir(parents=True)
+    (tmp_path / "envs" / "dev" / "main.tf").write_text(
+        'module "network" {\n  source = "../../modules/network"\n}\n'
+    )
+    (tmp_path / "envs" / "prod" / "main.tf").write_text(
+        'module "network" {\n  source = "../../modules/network"\n}\n'
+    )
+    (tmp_path / "modules" / "network" / "main.tf").write_text('resource "aws_vpc" "main" {}')
+    return tmp_path
+
+def test_discover_root_modules(monorepo):
+    """Test that referenced local modules are not treated as roots"""
+    projects = discover_root_modules(monorepo)
+    assert [p["path"] for p in projects] == ["envs/dev", "envs/prod"]
+
+def test_discover_ignores_provider_cache(monorepo):
+    """Test that .terraform directories are never projects"""
+    cache_dir = monorepo / "envs" / "dev" / ".terraform" / "modules" / "x"
+    cache_dir.mkdir(parents=True)
+    (cache_dir / "main.tf").write_text('resource "aws_s3_bucket" "b" {}')
+
+    assert [p["path"] for p in discover_root_modules(monorepo)] == ["envs/dev", "envs/prod"]
+
+def test_find_projects_prefers_infracost_config(monorepo):
+    """Test that infracost.yml overrides discovery"""
+    (monorepo / "infracost.yml").write_text(
+        "version: 0.1\n"
+        "projects:\n"
+        "  - path: envs/prod\n"
+        "    name: production\n"
+        "    usage_file: envs/prod/infracost-usage.yml\n"
+        "    terraform_var_files:\n"
+        "      - prod.tfvars\n"
+    )
+
+    projects = find_projects(monorepo)
+    assert projects == [{
+        "name": "production",
+        "path": "envs/prod",
+        "usage_file": "envs/prod/infracost-usage.yml",
+        "terraform_var_files": ["prod.tfvars"]
+    }]
+
+def test_load_infracost_config_rejects_escaping_paths(tmp_path):
+    """Test that config paths must stay inside the upload"""
+    config = tmp_path / "infracost.yml"
+    config.write_text("version: 0.1\nprojects:\n  - path: ../../etc\n")
+
+    with pytest.raises(ValueError, match="escapes"):
+        load_infracost_config(config)
+
+def test_find_projects_empty_tree(tmp_path):
+    """Test that a tree without Terraform code is rejected"""
+    with pytest.raises(ValueError, match="No Terraform root modules"):
+        find_projects(tmp_path)
+
+def test_fingerprint_follows_local_modules(monorepo):
+    """Test that a shared module change changes every project using it"""
+    dev, prod = find_projects(monorepo)
+    before = (fingerprint_project(monorepo, dev), fingerprint_project(monorepo, prod))
+
+    (monorepo / "envs" / "dev" / "main.tf").write_text(
+        'module "network" {\n  source = "../../modules/network"\n}\nresource "aws_eip" "ip" {}\n'
+    )
+    assert fingerprint_project(monorepo, dev) != before[0]
+    assert fingerprint_project(monorepo, prod) == before[1]
+
+    (monorepo / "modules" / "network" / "main.tf").write_text('resource "aws_vpc" "other" {}')
+    assert fingerprint_project(monorepo, prod) != before[1]
+
+def test_fingerprint_includes_usage_and_salt(monorepo, tmp_path_factory):
+    """Test that the usage file and salt are part of the fingerprint"""
+    project = find_projects(monorepo)[0]
+    usage = tmp_path_factory.mktemp("usage") / "infracost-usage.yml"
+    usage.write_text("version: 0.1\n")
+
+    plain = fingerprint_project(monorepo, project)
+    assert fingerprint_project(monorepo, project, usage) != plain
+    assert fingerprint_project(monorepo, project, salt="v0.10.30") != plain
+
+def test_fingerprint_hashes_var_file_contents(monorepo):
+    """Test that editing a variable file changes the fingerprint"""
+    var_file = monorepo / "envs" / "dev" / "prod.tfvars"
+    var_file.write_text('instance_type = "t3.micro"\n')
+    project = {"name": "dev", "path": "envs/dev", "terraform_var_files": ["prod.tfvars"]}
+
+    before = fingerprint_project(monorepo, project)
+    var_file.write_text('instance_type = "m5.large"\n')
+    assert fingerprint_project(monorepo, project) != before
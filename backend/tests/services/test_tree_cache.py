@@ -0,0 +1,69 @@
+import shutil
+
+import pytest
+
+from app.services.tree_cache import TreeCache, hash_tree
+
+@pytest.fixture
+def terraform_tree(tmp_path):
+    """Create a small extracted Terraform tree"""
+    tree = tmp_path / "tree"
+    (tree / "modules" / "db").mkdir(parents=True)
+    (tree / "main.tf").write_text('resource "aws_instance" "web" {}')
+    (tree / "modules" / "db" / "main.tf").write_text('resource "aws_db_instance" "db" {}')
+    (tree / "README.md").write_text("docs")
+    return tree
+
+def test_hash_ignores_non_terraform_files(terraform_tree):
+    """Test that only Terraform inputs affect the tree hash"""
+    key = hash_tree(terraform_tree)
+
+    (terraform_tree / "README.md").write_text("changed docs")
+    assert hash_tree(terraform_tree) == key
+
+    (terraform_tree / "main.tf").write_text('resource "aws_instance" "api" {}')
+    assert hash_tree(terraform_tree) != key
+
+def test_retain_and_checkout(terraform_tree, tmp_path):
+    """Test that a retained tree outlives its upload and can be checked out"""
+    cache = TreeCache(tmp_path / "trees")
+    key = cache.retain(terraform_tree)
+    assert cache.retain(terraform_tree) == key
+    assert cache.stats()["entries"] == 1
+
+    shutil.rmtree(terraform_tree)
+
+    work = tmp_path / "work"
+    assert cache.checkout(key, work)
+    assert (work / "modules" / "db" / "main.tf").read_text() == 'resource "aws_db_instance" "db" {}'
+    assert not (work / "README.md").exists()
+    assert hash_tree(work) == key
+    assert not cache.checkout("missing", tmp_path / "other")
+
+def test_index_survives_restart(terraform_tree, tmp_path):
+    """Test that retained trees are found again by a new instance"""
+    key = TreeCache(tmp_path / "trees").retain(terraform_tree)
+    (tmp_path / "trees" / "leftover.1.tmp").mkdir()
+
+    cache = TreeCache(tmp_path / "trees")
+
+    assert cache.path(key) is not None
+    assert not (tmp_path / "trees" / "leftover.1.tmp").exists()
+
+def test_evicts_least_recently_used(tmp_path):
+    """Test that the cache stays within its size budget"""
+    trees = []
+    for i in range(3):
+        tree = tmp_path / f"tree{i}"
+        tree.mkdir()
+        (tree / "main.tf").write_text(str(i) * 100)
+        trees.append(tree)
+    cache = TreeCache(tmp_path / "trees", max_bytes=250)
+
+    first, second = cache.retain(trees[0]), cache.retain(trees[1])
+    cache.path(first)
+    third = cache.retain(trees[2])
+
+    assert cache.path(second) is None
+    assert cache.path(first) is not None and cache.path(third) is not None
+    assert cache.stats()["bytes"] == 200
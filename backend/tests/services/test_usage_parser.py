@@ -0,0 +1,73 @@
+import pytest
+
+from app.services.usage_parser import parse_many, parse_quantity, quantity_near, tokenize
+
+
+@pytest.mark.parametrize("text, value", [
+    ("500 requests", 500),
+    ("about 2,000 users", 2000),
+    ("3 million records", 3000000),
+    ("2.3 million", 2300000),
+    ("5k items", 5000),
+    ("2M requests", 2000000),
+    ("1 billion events", 1000000000),
+    ("1.5 TB", 1536),
+    ("512MB", 0.5),
+])
+def test_parse_quantity(text, value):
+    assert parse_quantity(text).value == value
+
+
+def test_parse_quantity_ignores_identifiers_and_words():
+    # Suffixes must stand alone: "ec2", "5 minutes", "mostly"
+    assert parse_quantity("an ec2 instance") is None
+    assert parse_quantity("5 minutes").value == 5
+    assert parse_quantity("some text") is None
+
+
+@pytest.mark.parametrize("text, period, monthly", [
+    ("50 requests per second", "second", 129600000),
+    ("100 req/s", "second", 259200000),
+    ("1000 a day", "day", 30000),
+    ("8 hours a day", "day", 240),
+    ("2 million requests per month", "month", 2000000),
+    ("10 monthly", "month", 10),
+    ("500 requests", None, 500),
+])
+def test_rates_convert_to_monthly(text, period, monthly):
+    quantity = parse_quantity(text)
+    assert quantity.period == period
+    assert quantity.monthly == monthly
+
+
+def test_rate_belongs_to_its_own_quantity():
+    first, second = tokenize("1000 a day, 5 per hour")
+    assert first.period == "day"
+    assert second.period == "hour"
+    assert tokenize("500 reads, 10 writes per second")[0].period is None
+
+
+def test_quantity_near_stays_in_clause():
+    text = "500k reads, 100k writes, and 50gb storage"
+    assert quantity_near(text, "read").value == 500000
+    assert quantity_near(text, "write").value == 100000
+    assert quantity_near(text, "storage").value == 50
+    assert quantity_near("storage: 50gb", "storage").value == 50
+    assert quantity_near("50gb of storage space", "gb").value == 50
+    # No quantity shares a clause with the keyword
+    assert quantity_near("500 reads and writes", "write") is None
+
+
+def test_quantity_near_matches_keywords_at_word_starts():
+    assert quantity_near("about 2 million items processed", "ms") is None
+    assert quantity_near("spread across 200k writes", "read") is None
+    assert quantity_near("spread across 200k writes", "write").value == 200000
+    assert quantity_near("each call takes 200ms", "ms").value == 200
+
+
+def test_parse_many_aligns_with_answers():
+    answers = ["5k reads per second", "some text", "5k reads per second", "2 million"]
+    results = parse_many(answers, "read")
+    assert [q and q.value for q in results] == [5000, None, 5000, None]
+    assert results[0] is results[2]
+    assert [q and q.value for q in parse_many(answers)] == [5000, None, 5000, 2000000]
@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import pytest
+
+from app.services.usage_pipeline import InFlightRuns, render_usage_file, usage_run_uid
+
+def test_render_usage_file_is_canonical():
+    """Test that key order does not change the rendered usage file"""
+    first = render_usage_file({
+        "aws_lambda_function.api": {"monthly_requests": 2000000},
+        "aws_instance.web": {"monthly_hours": 720, "operating_system": "linux"},
+    })
+    second = render_usage_file({
+        "aws_instance.web": {"operating_system": "linux", "monthly_hours": 720},
+        "aws_lambda_function.api": {"monthly_requests": 2000000},
+    })
+
+    assert first == second
+    assert json.loads(first) == {
+        "version": "0.1",
+        "resource_usage": {
+            "aws_instance.web": {"monthly_hours": 720, "operating_system": "linux"},
+            "aws_lambda_function.api": {"monthly_requests": 2000000},
+        }
+    }
+
+@pytest.mark.parametrize("usage", [
+    [],
+    {"aws_instance.web": 720},
+    {"": {"monthly_hours": 720}},
+    {"aws_instance.web": {"monthly_hours": object()}},
+])
+def test_render_usage_file_rejects_malformed_usage(usage):
+    """Test that usage must map resources to JSON-like parameters"""
+    with pytest.raises(ValueError):
+        render_usage_file(usage)
+
+def test_usage_run_uid_depends_on_every_input():
+    """Test that the run uid changes with the tree, usage and salt"""
+    body = render_usage_file({"aws_instance.web": {"monthly_hours": 720}})
+    uid = usage_run_uid("tree", body, salt="v0.10")
+
+    assert usage_run_uid("tree", body, salt="v0.10") == uid
+    assert len({uid, usage_run_uid("other", body, salt="v0.10"),
+                usage_run_uid("tree", body + " ", salt="v0.10"), usage_run_uid("tree", body, salt="v0.11")}) == 4
+
+@pytest.mark.asyncio
+async def test_in_flight_runs_are_shared():
+    """Test that concurrent runs with one key do the work once"""
+    runs = InFlightRuns()
+    calls = []
+
+    async def work(is_disconnected):
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    results = await asyncio.gather(*(runs.run("key", work) for _ in range(3)))
+
+    assert calls == [1]
+    assert sorted(results) == [("result", False), ("result", True), ("result", True)]
+    assert runs.stats() == {"in_flight": 0, "started": 1, "joined": 2}
+
+@pytest.mark.asyncio
+async def test_in_flight_failures_reach_every_caller():
+    """Test that a failed run fails its joiners and is not remembered"""
+    runs = InFlightRuns()
+
+    async def work(is_disconnected):
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(runs.run("key", work), runs.run("key", work), return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert runs.stats()["in_flight"] == 0
+
+@pytest.mark.asyncio
+async def test_in_flight_runs_cancel_only_when_every_caller_left():
+    """Test that the shared disconnect check needs every caller gone"""
+    runs = InFlightRuns()
+    gone = {"first": False, "second": False}
+    checks = []
+
+    async def work(is_disconnected):
+        await asyncio.sleep(0.01)
+        gone["first"] = True
+        checks.append(await is_disconnected())
+        gone["second"] = True
+        checks.append(await is_disconnected())
+        return "result"
+
+    def caller(name):
+        async def is_disconnected():
+            return gone[name]
+        return runs.run("key", work, is_disconnected)
+
+    results = await asyncio.gather(caller("first"), caller("second"))
+
+    assert checks == [False, True]
+    assert results == [("result", False), ("result", True)]
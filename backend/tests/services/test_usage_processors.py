@@ -0,0 +1,157 @@
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.services.usage_processors import RuleProcessor, UsageProcessorRegistry, default_registry
+from app.services.usage_service import UsageService
+
+
+@pytest.fixture
+def rules_dir(tmp_path):
+    (tmp_path / "aws.json").write_text(json.dumps({
+        "aws_sqs_queue": {"monthly_requests": {"default": 5}}
+    }))
+    (tmp_path / "google.json").write_text("not json, never read by aws lookups")
+    return tmp_path
+
+
+def test_registry_loads_only_the_provider_file(rules_dir):
+    registry = UsageProcessorRegistry(rules_dir, entry_point_group=None)
+    assert registry.get("aws_sqs_queue")("10 per second") == {"monthly_requests": 25920000}
+    assert registry.get("aws_sqs_queue")("no idea") == {"monthly_requests": 5}
+    assert registry.get("aws_unknown_type") is None
+    assert registry.get("azurerm_unknown_type") is None
+    assert registry.get(None) is None
+
+
+def test_registry_register_and_plugins(rules_dir, monkeypatch):
+    plugin = MagicMock(return_value={"monthly_requests": 1})
+    entry_point = MagicMock()
+    entry_point.name = "aws_sqs_queue"
+    entry_point.load.return_value = plugin
+    monkeypatch.setattr("app.services.usage_processors._entry_points", lambda group: [entry_point])
+
+    registry = UsageProcessorRegistry(rules_dir, entry_point_group="test")
+    # Plugins win over built-in rules and are imported on first use
+    assert registry.get("aws_sqs_queue") is plugin
+    assert registry.get("aws_sqs_queue") is plugin
+    entry_point.load.assert_called_once()
+
+    custom = MagicMock(return_value={})
+    registry.register("aws_custom", custom)
+    assert registry.get("aws_custom") is custom
+
+
+def test_registry_survives_broken_plugins(rules_dir, monkeypatch):
+    broken = MagicMock()
+    broken.name = "aws_sqs_queue"
+    broken.load.side_effect = ImportError("no module named plugin")
+    monkeypatch.setattr("app.services.usage_processors._entry_points", lambda group: [broken])
+
+    registry = UsageProcessorRegistry(rules_dir, entry_point_group="test")
+    # Falls back to the built-in rules
+    assert registry.get("aws_sqs_queue")("3 requests") == {"monthly_requests": 3}
+
+
+def test_entry_points_before_python_3_10(monkeypatch):
+    from importlib import metadata
+    from app.services import usage_processors
+
+    entry_point = MagicMock()
+    monkeypatch.setattr(usage_processors.sys, "version_info", (3, 9, 18))
+    monkeypatch.setattr(metadata, "entry_points", lambda: {"ccp.usage_processors": [entry_point]})
+    assert usage_processors._entry_points("ccp.usage_processors") == [entry_point]
+    assert usage_processors._entry_points("other") == []
+
+
+def test_rule_processor_keywords_units_and_nesting():
+    processor = RuleProcessor("google_storage_bucket", {
+        "nested.storage_gb": {"keywords": ["storage"], "kind": "level"},
+        "monthly_queries_tb": {"keywords": ["query", "queries"], "unit": "TB"},
+        "monthly_requests": {}
+    })
+    assert processor("2 TB storage, 512GB of queries a day, 2 million requests") == {
+        "nested": {"storage_gb": 2048},
+        "monthly_queries_tb": 15,
+        "monthly_requests": 2000000
+    }
+
+    with pytest.raises(ValueError):
+        RuleProcessor("aws_x", {"key": {"kind": "bogus"}})
+
+
+def test_rule_processor_skips_claimed_quantities():
+    processor = RuleProcessor("aws_lambda_function", {
+        "monthly_requests": {"default": 1000000},
+        "request_duration_ms": {"keywords": ["ms"], "kind": "level"}
+    })
+    assert processor("200ms per request, 2 million requests") == {
+        "monthly_requests": 2000000,
+        "request_duration_ms": 200
+    }
+    assert processor("not sure") == {"monthly_requests": 1000000}
+
+    # A keyword rule does not take a quantity another keyword rule took
+    processor = RuleProcessor("aws_dynamodb_table", {
+        "monthly_read_request_units": {"keywords": ["read"]},
+        "monthly_write_request_units": {"keywords": ["write"], "default": 7}
+    })
+    assert processor("500 read/write units") == {
+        "monthly_read_request_units": 500,
+        "monthly_write_request_units": 7
+    }
+
+
+@pytest.mark.parametrize("resource_type, answer, expected", [
+    ("aws_instance", "8 hours a day", {"monthly_hours": 240}),
+    ("aws_s3_bucket", "1 TB storage, 10k uploads and 1 million downloads", {
+        "standard": {
+            "storage_gb": 1024,
+            "monthly_tier_1_requests": 10000,
+            "monthly_tier_2_requests": 1000000
+        }
+    }),
+    ("aws_nat_gateway", "about 20GB a day", {"monthly_data_processed_gb": 600}),
+    ("azurerm_function_app", "3 million executions at 300ms with 512MB memory", {
+        "monthly_executions": 3000000,
+        "execution_duration_ms": 300,
+        "memory_mb": 512
+    }),
+    ("azurerm_storage_account", "500GB storage, 1M reads and 100k writes", {
+        "storage_gb": 500,
+        "monthly_read_operations": 1000000,
+        "monthly_write_operations": 100000
+    }),
+    ("google_cloudfunctions_function", "50 invocations per second", {
+        "monthly_function_invocations": 129600000
+    }),
+    ("google_pubsub_topic", "2 TB of messages", {"monthly_message_data_tb": 2}),
+    # Keywords inside other words ("ms" in "items", "read" in "spread")
+    ("aws_lambda_function", "About 2 million items processed", {"monthly_requests": 2000000}),
+    ("aws_dynamodb_table", "spread across 200k writes", {
+        "monthly_read_request_units": 1000000,
+        "monthly_write_request_units": 200000,
+        "storage_gb": 10
+    }),
+])
+def test_builtin_rules(resource_type, answer, expected):
+    assert default_registry.get(resource_type)(answer) == expected
+
+
+def test_builtin_rules_cover_every_provider():
+    types = default_registry.supported_types()
+    for prefix in ("aws_", "azurerm_", "google_"):
+        assert sum(t.startswith(prefix) for t in types) >= 10
+
+
+def test_usage_service_uses_registry(rules_dir):
+    service = UsageService(UsageProcessorRegistry(rules_dir, entry_point_group=None))
+    resources = [
+        {"name": "aws_sqs_queue.q", "resource_type": "aws_sqs_queue"},
+        {"name": "aws_other.x", "resource_type": "aws_other"}
+    ]
+    assert service.generate_usage_from_answers(resources, ["1k", "2k"]) == {
+        "aws_sqs_queue.q": {"monthly_requests": 1000},
+        "aws_other.x": {}
+    }
@@ -1,5 +1,5 @@
 import pytest
-from app.services.usage_service import UsageService
+from app.services.usage_service import UsageService, WorkerPool
 
 class TestUsageService:
     
@@ -133,4 +133,83 @@ class TestUsageService:
         
         # Test with multiple keywords
         assert usage_service._extract_numeric_value_near_keyword(
-            "50GB of storage space", "storage", "gb") == 50
\ No newline at end of file
+            "50GB of storage space", "storage", "gb") == 50
+
+BATCH_SETS = [
+    {"resources": [{"name": "aws_lambda_function.f", "resource_type": "aws_lambda_function"}],
+     "answers": [f"{n}k requests"]}
+    for n in range(1, 6)
+] + [{"resources": None, "answers": ["broken"]}]
+
+
+@pytest.mark.asyncio
+async def test_stream_usage_batch_in_process():
+    results = [item async for item in UsageService().stream_usage_batch(BATCH_SETS)]
+    assert [index for index, _ in results] == list(range(6))
+    assert results[2][1] == {"usage": {"aws_lambda_function.f": {"monthly_requests": 3000}}}
+    assert "error" in results[5][1]
+
+
+def spawn_pool(workers):
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    return WorkerPool(lambda: ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")))
+
+
+@pytest.mark.asyncio
+async def test_stream_usage_batch_process_pool():
+    pool = spawn_pool(2)
+    try:
+        results = dict([item async for item in UsageService().stream_usage_batch(BATCH_SETS, pool, chunk_size=2)])
+    finally:
+        pool.shutdown()
+    assert sorted(results) == list(range(6))
+    assert results[4] == {"usage": {"aws_lambda_function.f": {"monthly_requests": 5000}}}
+    assert "error" in results[5]
+
+
+@pytest.mark.asyncio
+async def test_stream_usage_batch_replaces_dead_workers():
+    import os
+    import signal
+    from concurrent.futures.process import BrokenProcessPool
+
+    pool = spawn_pool(1)
+    try:
+        [item async for item in UsageService().stream_usage_batch(BATCH_SETS, pool)]
+        executor = pool.executor
+        for pid in list(executor._processes):
+            os.kill(pid, signal.SIGKILL)
+        with pytest.raises(BrokenProcessPool):
+            executor.submit(int).result(timeout=30)
+
+        results = dict([item async for item in UsageService().stream_usage_batch(BATCH_SETS, pool, chunk_size=2)])
+        assert pool.executor is not executor
+    finally:
+        pool.shutdown()
+    assert results[4] == {"usage": {"aws_lambda_function.f": {"monthly_requests": 5000}}}
+    assert "error" in results[5]
+
+
+@pytest.mark.asyncio
+async def test_stream_usage_batch_reports_failed_chunks(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+
+    def crash(sets):
+        if sets[0]["answers"] == ["1k requests"]:
+            raise RuntimeError("worker died")
+        if sets[0]["answers"] == ["4k requests"]:
+            raise BrokenProcessPool("pool broken")
+        return [{"usage": {}} for _ in sets]
+
+    monkeypatch.setattr("app.services.usage_service.generate_usage_chunk", crash)
+    pool = WorkerPool(lambda: ThreadPoolExecutor(max_workers=2))
+    executor = pool.executor
+    results = dict([item async for item in UsageService().stream_usage_batch(BATCH_SETS, pool, chunk_size=3)])
+    # The broken executor was swapped out for later batches
+    assert pool.executor is not executor
+    pool.shutdown()
+    assert results[0] == results[2] == {"error": "worker died"}
+    assert results[3] == results[5] == {"error": "pool broken"}
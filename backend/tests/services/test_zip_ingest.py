@@ -0,0 +1,80 @@
+import io
+import zipfile
+
+import pytest
+
+from app.services.zip_ingest import ZipLimitError, ingest_zip, is_terraform_relevant
+
+def make_zip(entries):
+    """Build an in-memory zip archive from a name -> content mapping"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, content in entries.items():
+            zf.writestr(name, content)
+    buffer.seek(0)
+    return buffer
+
+@pytest.mark.parametrize("name, expected", [
+    ("main.tf", True),
+    ("modules/db/outputs.tf", True),
+    ("prod.tfvars", True),
+    ("stack.tf.json", True),
+    (".terraform.lock.hcl", True),
+    ("infracost.yml", True),
+    (".terraform/providers/registry/aws/terraform-provider-aws", False),
+    ("modules/db/.terraform/modules/modules.json", False),
+    ("README.md", False),
+    ("scripts/deploy.sh", False),
+])
+def test_is_terraform_relevant(name, expected):
+    """Test the archive member filter"""
+    assert is_terraform_relevant(name) is expected
+
+def test_ingest_zip_filters_members(tmp_path):
+    """Test that only Terraform-relevant members are extracted"""
+    archive = make_zip({
+        "main.tf": "resource {}",
+        "modules/db/main.tf": "resource {}",
+        ".terraform/providers/aws": b"\0" * 4096,
+        "docs/README.md": "docs",
+        "estimate.json": "[]",
+    })
+
+    stats = ingest_zip(archive, tmp_path)
+
+    assert stats["extracted"] == 3
+    assert stats["skipped"] == 2
+    assert (tmp_path / "modules" / "db" / "main.tf").exists()
+    assert (tmp_path / "previous_estimate.json").read_text() == "[]"
+    assert not (tmp_path / ".terraform").exists()
+    assert not (tmp_path / "docs").exists()
+
+def test_ingest_zip_entry_limit(tmp_path):
+    """Test that archives with too many entries are rejected"""
+    archive = make_zip({f"file{i}.tf": "" for i in range(5)})
+    with pytest.raises(ZipLimitError):
+        ingest_zip(archive, tmp_path, max_entries=4)
+
+def test_ingest_zip_size_limit(tmp_path):
+    """Test that highly compressible payloads are rejected before extraction"""
+    archive = make_zip({"bomb.tf": b"0" * (1024 * 1024)})
+    with pytest.raises(ZipLimitError):
+        ingest_zip(archive, tmp_path, max_bytes=64 * 1024)
+    assert not (tmp_path / "bomb.tf").exists()
+
+def test_ingest_zip_skips_oversized_irrelevant_members(tmp_path):
+    """Test that skipped members do not count against the size limit"""
+    archive = make_zip({"main.tf": "resource {}", ".terraform/provider": b"0" * (1024 * 1024)})
+    stats = ingest_zip(archive, tmp_path, max_bytes=64 * 1024)
+    assert stats["extracted"] == 1
+
+def test_ingest_zip_rejects_path_traversal(tmp_path):
+    """Test that members escaping the destination are rejected"""
+    archive = make_zip({"../evil.tf": "resource {}"})
+    with pytest.raises(ValueError, match="Unsafe path"):
+        ingest_zip(archive, tmp_path / "dest")
+
+def test_ingest_zip_invalid_archive(tmp_path):
+    """Test that non-zip uploads raise ValueError"""
+    with pytest.raises(ValueError, match="Invalid zip archive"):
+        ingest_zip(io.BytesIO(b"not a zip"), tmp_path)
@@ -198,6 +198,89 @@ export async function downloadEstimate(uid, format = 'json') {
   return response.json();
 }
 
+/**
+ * List one page of an estimate's resources
+ * @param {string} uid - Estimate UID
+ * @param {Object} params - Filters: resource_type, name_prefix, min_cost,
+ *   max_cost, sort, fields, limit and cursor (next_cursor of the last page)
+ */
+export async function listEstimateResources(uid, params = {}) {
+  const query = new URLSearchParams(
+    Object.entries(params).filter(([, value]) => value !== undefined && value !== null)
+  );
+  const response = await fetch(`${API_URL}/estimates/${uid}/resources?${query}`);
+
+  if (!response.ok) {
+    const error = await response.json();
+    throw new Error(error.error || 'Failed to list resources');
+  }
+
+  return response.json();
+}
+
+/**
+ * Recompute an estimate's costs with usage overrides
+ * @param {string} uid - Estimate UID
+ * @param {Array} overrides - Overrides such as { index, usage } (percent of
+ *   estimated usage) or { resource, component, monthlyQuantity }
+ */
+export async function repriceEstimate(uid, overrides) {
+  const response = await fetch(`${API_URL}/estimates/${uid}/reprice`, {
+    method: 'POST',
+    headers: getApiHeaders(),
+    body: JSON.stringify({ overrides }),
+  });
+
+  if (!response.ok) {
+    const error = await response.json();
+    throw new Error(error.error || 'Failed to reprice estimate');
+  }
+
+  return response.json();
+}
+
+/**
+ * Price an estimate's Terraform again with generated usage
+ * @param {string} uid - Estimate UID
+ * @param {Object} usage - Resource name -> usage parameters
+ */
+export async function priceWithUsage(uid, usage) {
+  const response = await fetch(`${API_URL}/estimates/${uid}/usage`, {
+    method: 'POST',
+    headers: getApiHeaders(),
+    body: JSON.stringify({ usage }),
+  });
+
+  if (!response.ok) {
+    const error = await response.json();
+    throw new Error(error.error || 'Failed to price usage');
+  }
+
+  return response.json();
+}
+
+/**
+ * Simulate an estimate's monthly cost under ranges of usage
+ * @param {string} uid - Estimate UID
+ * @param {Object} ranges - Resource name -> usage key -> number or
+ *   { min, likely, max } range
+ * @param {Object} options - Optional samples and seed
+ */
+export async function simulateEstimate(uid, ranges, options = {}) {
+  const response = await fetch(`${API_URL}/estimates/${uid}/simulate`, {
+    method: 'POST',
+    headers: getApiHeaders(),
+    body: JSON.stringify({ ranges, ...options }),
+  });
+
+  if (!response.ok) {
+    const error = await response.json();
+    throw new Error(error.error || 'Failed to simulate estimate');
+  }
+
+  return response.json();
+}
+
 /**
  * Compare two estimates
  * @param {string} baseline - Baseline estimate UID
@@ -214,6 +297,22 @@ export async function compareEstimates(baseline, proposed) {
   return response.json();
 }
 
+/**
+ * Compare an ordered series of estimates
+ * @param {Array<string>} uids - Estimate UIDs in series order
+ * @param {boolean} changedOnly - Leave out resources whose cost never changes
+ */
+export async function compareSeries(uids, changedOnly = false) {
+  const response = await fetch(`${API_URL}/compare/series?uids=${uids.join(',')}&changed_only=${changedOnly}`);
+
+  if (!response.ok) {
+    const error = await response.json();
+    throw new Error(error.error || 'Failed to compare estimates');
+  }
+
+  return response.json();
+}
+
 /**
  * Compare with adjustments
  * @param {string} uid - Estimate UID